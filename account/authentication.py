@@ -0,0 +1,183 @@
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from . import blacklist
+from .lru import TTLCache
+
+# Состояние пользователей (активен ли, is_staff, is_superuser, права) для
+# аутентификации без запроса к БД на каждый запрос. Сбрасывается сигналами
+# при изменении пользователя в этом процессе, в остальных — по истечении
+# TTL: снятые права и деактивация вступают в силу не позже чем через TTL.
+user_state_cache = TTLCache(
+    maxsize=settings.JWT_USER_STATE_CACHE_SIZE, ttl=settings.JWT_USER_STATE_CACHE_TTL
+)
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication с асинхронным методом для нативных async view.
+    Разбор и проверка подписи токена — чистый CPU, пользователь читается
+    через async ORM (aget), без перехода в поток.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+
+class ClaimsUser(TokenUser):
+    """
+    Лёгкий пользователь без строки User из БД: id и username из claims
+    access-токена, активность и права — из кэша состояния
+    StatelessJWTAuthentication. Привилегии в токен не кладутся, иначе они
+    жили бы весь срок токена и переносились бы при каждом обновлении.
+    """
+
+    def __init__(self, token, state):
+        super().__init__(token)
+        self.state = state
+
+    @cached_property
+    def is_active(self):
+        return self.state['is_active']
+
+    @cached_property
+    def is_staff(self):
+        return self.state['is_staff']
+
+    @cached_property
+    def is_superuser(self):
+        return self.state['is_superuser']
+
+    @cached_property
+    def permissions(self):
+        return self.state['perms']
+
+    def get_all_permissions(self, obj=None):
+        return set(self.permissions) if self.is_active else set()
+
+    def has_perm(self, perm, obj=None):
+        return self.is_active and (self.is_superuser or perm in self.permissions)
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, module):
+        return self.is_active and (
+            self.is_superuser or any(perm.startswith(module + '.') for perm in self.permissions)
+        )
+
+
+class StatelessJWTAuthentication(AsyncJWTAuthentication):
+    """
+    JWT-аутентификация без чтения пользователя из БД на каждый запрос.
+
+    Пользователь строится из claims токена и состояния из user_state_cache
+    (ClaimsUser). Удаление, деактивация и смена прав пользователя
+    проверяются по этому состоянию: в БД идём только при промахе, не чаще
+    раза в JWT_USER_STATE_CACHE_TTL секунд на пользователя. Отозванные
+    токены отсекает account.blacklist (обычно без запроса к БД).
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        state = user_state_cache.get(user_id)
+        if state is None:
+            state = self.load_state(user_id)
+        self.check_state(state)
+        if blacklist.is_revoked(validated_token):
+            raise AuthenticationFailed(_('Token is blacklisted'), code='token_revoked')
+        return ClaimsUser(validated_token, state)
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        state = user_state_cache.get(user_id)
+        if state is None:
+            state = await self.aload_state(user_id)
+        self.check_state(state)
+        if await blacklist.ais_revoked(validated_token):
+            raise AuthenticationFailed(_('Token is blacklisted'), code='token_revoked')
+        return ClaimsUser(validated_token, state)
+
+    def get_user_id(self, validated_token):
+        try:
+            # simplejwt кладёт id строкой; ключ кэша всегда строка
+            return str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    def load_state(self, user_id):
+        row = self.state_queryset(user_id).first()
+        perms = list(self.perms_queryset(row)) if self.needs_perms(row) else []
+        return self.remember_state(user_id, row, perms)
+
+    async def aload_state(self, user_id):
+        row = await self.state_queryset(user_id).afirst()
+        perms = [perm async for perm in self.perms_queryset(row)] if self.needs_perms(row) else []
+        return self.remember_state(user_id, row, perms)
+
+    def state_queryset(self, user_id):
+        return self.user_model.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).values_list('pk', 'is_active', 'is_staff', 'is_superuser')
+
+    def needs_perms(self, row):
+        # Неактивному пользователю права не нужны, суперпользователю has_perm и так вернёт True
+        return row is not None and row[1] and not row[3]
+
+    def perms_queryset(self, row):
+        """
+        Права пользователя и его групп, как у ModelBackend.get_all_permissions.
+        """
+        user_field = self.user_model._meta.get_field('user_permissions').related_query_name()
+        group_field = self.user_model._meta.get_field('groups').related_query_name()
+        return Permission.objects.filter(
+            Q(**{user_field: row[0]}) | Q(**{f'group__{group_field}': row[0]})
+        ).values_list('content_type__app_label', 'codename').order_by().distinct()
+
+    def remember_state(self, user_id, row, perms):
+        state = {
+            'exists': row is not None,
+            'is_active': bool(row and row[1]),
+            'is_staff': bool(row and row[2]),
+            'is_superuser': bool(row and row[3]),
+            'perms': frozenset(f'{app_label}.{codename}' for app_label, codename in perms),
+        }
+        user_state_cache.set(user_id, state)
+        return state
+
+    def check_state(self, state):
+        if not state['exists']:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not state['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+
+def forget_user_state(user_id):
+    user_state_cache.delete(str(user_id))
@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import hashing
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend, который проверяет пароль в пуле account.hashing. В потоке
+    запроса остаются только чтение пользователя и, если хэш устарел,
+    UPDATE с новым хэшем.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Хэшируем и для несуществующего логина: время ответа не
+            # должно выдавать, есть ли такой пользователь
+            hashing.make_password(password)
+            return None
+        is_correct, upgraded = hashing.check_password(password, user.password)
+        if not is_correct:
+            return None
+        if upgraded is not None:
+            user.password = upgraded
+            user.save(update_fields=['password'])
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,242 @@
+"""
+Отзыв JWT по jti без таблиц outstanding/blacklisted из token_blacklist.
+
+В БД хранятся только отозванные токены (RevokedToken): 128-битный хэш jti
+и срок действия токена. После истечения срока строка не нужна — такой
+токен и так не пройдёт проверку, поэтому таблица ограничена токенами,
+отозванными за последний REFRESH_TOKEN_LIFETIME. Истёкшие строки удаляет
+фоновая задача prune_revoked_tokens (tasks/jobs.py), которую revoke()
+ставит в очередь не чаще раза в TOKEN_BLACKLIST_PRUNE_INTERVAL секунд.
+
+Перед БД стоит фильтр Блума в памяти процесса: проверка «токен не отозван»
+обычно обходится без запроса; фильтр растёт вместе с числом отзывов, так
+что доля ложных срабатываний не зависит от нагрузки. Фильтры разбиты по дню
+истечения токена: проверяется только фильтр дня из claim exp, а фильтры
+прошедших дней выбрасываются целиком. Отзывы из других процессов фильтр
+догружает из БД не реже раза в TOKEN_BLACKLIST_SYNC_INTERVAL секунд. При
+ротации refresh-токенов старый токен отзывается INSERT по первичному ключу,
+поэтому повторное использование отклоняется сразу во всех процессах.
+Access-токены отзываются при выходе так же и проверяются при каждой
+аутентификации (account/authentication.py).
+"""
+import hashlib
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from tasks import jobs
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """
+    Фильтр Блума на `capacity` элементов с долей ложных срабатываний
+    `error_rate`. Элементы — 16-байтовые хэши; позиции битов получаются
+    двойным хэшированием из двух половин хэша.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.count = 0
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, digest):
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:16], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, digest):
+        for position in self.positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(digest))
+
+
+class ScalableBloomFilter:
+    """
+    Растущий фильтр Блума: когда текущий фильтр заполнен до ёмкости,
+    добавляется новый, вдвое больше и с вдвое меньшей долей ложных
+    срабатываний. Суммарная доля не превышает `error_rate`, сколько бы
+    элементов ни пришло, а память растёт вместе с числом элементов.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.filters = []
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def add(self, digest):
+        # Повторные добавления (перечитывание при синхронизации) не занимают ёмкость
+        if digest in self:
+            return
+        if not self.filters or self.filters[-1].count >= self.filters[-1].capacity:
+            stage = len(self.filters)
+            self.filters.append(BloomFilter(
+                self.capacity * 2 ** stage, self.error_rate / 2 ** (stage + 1),
+            ))
+        self.filters[-1].add(digest)
+
+    def __contains__(self, digest):
+        return any(digest in bloom for bloom in self.filters)
+
+
+class RevocationList:
+    """
+    Фильтры Блума отозванных токенов, по одному на интервал истечения
+    TOKEN_BLACKLIST_PARTITION_SECONDS. Новый интервал начинается с ёмкости
+    самого заполненного из текущих (не меньше TOKEN_BLACKLIST_BLOOM_CAPACITY),
+    дальше фильтр растёт сам.
+    """
+
+    def __init__(self):
+        self.partitions = {}
+        self.synced_at = None
+        self.next_sync = 0.0
+        self.lock = threading.Lock()
+
+    def partition(self, expires):
+        return int(expires // settings.TOKEN_BLACKLIST_PARTITION_SECONDS)
+
+    def add(self, digest, expires):
+        key = self.partition(expires)
+        with self.lock:
+            bloom = self.partitions.get(key)
+            if bloom is None:
+                capacity = max([settings.TOKEN_BLACKLIST_BLOOM_CAPACITY, *map(len, self.partitions.values())])
+                bloom = self.partitions[key] = ScalableBloomFilter(
+                    capacity, settings.TOKEN_BLACKLIST_BLOOM_ERROR_RATE,
+                )
+            bloom.add(digest)
+
+    def might_contain(self, digest, expires):
+        bloom = self.partitions.get(self.partition(expires))
+        return bloom is not None and digest in bloom
+
+    def sync_due(self):
+        return time.monotonic() >= self.next_sync
+
+    def sync(self, force=False):
+        """
+        Догружает отзывы, сделанные после прошлой синхронизации (при первом
+        вызове — все действующие), и выбрасывает фильтры истёкших интервалов.
+        """
+        if not force and not self.sync_due():
+            return
+        # Отзыв, закоммиченный позже, может иметь более раннее revoked_at:
+        # перечитываем с запасом, повторное добавление в фильтр безвредно
+        started = timezone.now() - timedelta(seconds=settings.TOKEN_BLACKLIST_SYNC_OVERLAP)
+        rows = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        if self.synced_at is not None:
+            rows = rows.filter(revoked_at__gte=self.synced_at)
+        for jti_hash, expires_at in rows.values_list('jti_hash', 'expires_at').iterator(chunk_size=10000):
+            self.add(jti_hash.bytes, expires_at.timestamp())
+        current = self.partition(time.time())
+        with self.lock:
+            for key in [key for key in self.partitions if key < current]:
+                del self.partitions[key]
+        self.synced_at = started
+        self.next_sync = time.monotonic() + settings.TOKEN_BLACKLIST_SYNC_INTERVAL
+
+    def clear(self):
+        with self.lock:
+            self.partitions.clear()
+            self.synced_at = None
+            self.next_sync = 0.0
+
+
+revocations = RevocationList()
+_next_prune = 0.0
+
+
+@receiver(setting_changed)
+def reset_revocations(setting, **kwargs):
+    if setting.startswith('TOKEN_BLACKLIST_'):
+        revocations.clear()
+
+
+def token_digest(token):
+    return hashlib.blake2b(str(token[api_settings.JTI_CLAIM]).encode(), digest_size=16).digest()
+
+
+def revoke(token):
+    """
+    Отзывает токен. Возвращает False, если он уже был отозван: при
+    одновременной ротации одного токена новую пару получит только один
+    запрос.
+    """
+    digest = token_digest(token)
+    try:
+        with transaction.atomic():
+            RevokedToken.objects.create(
+                jti_hash=uuid.UUID(bytes=digest),
+                expires_at=datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc),
+            )
+            schedule_prune()
+        revoked = True
+    except IntegrityError:
+        revoked = False
+    revocations.add(digest, token['exp'])
+    return revoked
+
+
+def is_revoked(token):
+    revocations.sync()
+    digest = token_digest(token)
+    if not revocations.might_contain(digest, token['exp']):
+        return False
+    return RevokedToken.objects.filter(jti_hash=uuid.UUID(bytes=digest)).exists()
+
+
+async def ais_revoked(token):
+    """
+    is_revoked() для async view: в БД идёт только догрузка фильтра и
+    проверка при срабатывании фильтра.
+    """
+    if revocations.sync_due():
+        await sync_to_async(revocations.sync)()
+    digest = token_digest(token)
+    if not revocations.might_contain(digest, token['exp']):
+        return False
+    return await RevokedToken.objects.filter(jti_hash=uuid.UUID(bytes=digest)).aexists()
+
+
+def schedule_prune():
+    global _next_prune
+    now = time.monotonic()
+    if now >= _next_prune:
+        _next_prune = now + settings.TOKEN_BLACKLIST_PRUNE_INTERVAL
+        jobs.enqueue('prune_revoked_tokens')
+
+
+@jobs.register('prune_revoked_tokens')
+def prune_revoked_tokens(chunk_size=None):
+    """
+    Удаляет истёкшие записи пачками по индексу expires_at. Возвращает число
+    удалённых строк.
+    """
+    chunk_size = chunk_size or settings.TOKEN_BLACKLIST_PRUNE_CHUNK_SIZE
+    deleted = 0
+    while True:
+        expired = RevokedToken.objects.filter(expires_at__lte=timezone.now()).order_by('expires_at')
+        pks = list(expired.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return deleted
+        # Без сигналов и связей Django удаляет одним DELETE ... WHERE pk IN
+        deleted += RevokedToken.objects.filter(pk__in=pks).delete()[0]
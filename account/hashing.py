@@ -0,0 +1,144 @@
+"""
+Хэширование паролей вне потока запроса.
+
+ScryptPasswordHasher и Argon2PasswordHasher — стандартные хэшеры Django с
+параметрами из settings.PASSWORD_SCRYPT и settings.PASSWORD_ARGON2. Имена
+алгоритмов те же, поэтому старые хэши проверяются как обычно, а хэш с
+другими параметрами (или другим алгоритмом, например PBKDF2) Django
+считает устаревшим и перехэширует при следующем входе.
+
+HashingPool выполняет хэширование в ограниченном пуле потоков: hashlib и
+argon2-cffi отпускают GIL, так что хэши считаются параллельно, но заняты
+ими не больше PASSWORD_HASH_WORKERS ядер на процесс. Если и очередь пула
+(PASSWORD_HASH_QUEUE) заполнена, запрос сразу получает 503 с Retry-After.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT['work_factor']
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT['block_size']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT['parallelism']
+
+    @property
+    def maxmem(self):
+        return settings.PASSWORD_SCRYPT['maxmem']
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2['time_cost']
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2['memory_cost']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2['parallelism']
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервер перегружен проверкой паролей, повторите запрос позже.'
+    default_code = 'hashing_busy'
+
+    def __init__(self):
+        super().__init__()
+        # exception_handler DRF выставляет Retry-After из exc.wait
+        self.wait = settings.CONCURRENCY_RETRY_AFTER
+
+
+class HashingPool:
+    """
+    Пул из `workers` потоков; ещё `queue_size` вызовов могут ждать в
+    очереди, сверх этого run() сразу бросает HashingBusy.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy()
+
+        def call():
+            try:
+                return fn(*args)
+            finally:
+                self.slots.release()
+        try:
+            future = self.executor.submit(call)
+        except BaseException:
+            self.slots.release()
+            raise
+        return future.result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE)
+        return _pool
+
+
+@receiver(setting_changed)
+def reset_pool(setting, **kwargs):
+    global _pool
+    if setting.startswith('PASSWORD_HASH_') and _pool is not None:
+        with _pool_lock:
+            _pool.shutdown()
+            _pool = None
+
+
+def verify_password(raw_password, encoded):
+    """
+    Проверяет пароль по хэшу. Возвращает (верен ли пароль, новый хэш или
+    None): новый хэш считается, если `encoded` сделан другим алгоритмом
+    или с другими параметрами, чем у предпочтительного хэшера.
+    """
+    upgraded = []
+    is_correct = hashers.check_password(
+        raw_password, encoded, setter=lambda raw: upgraded.append(hashers.make_password(raw)),
+    )
+    return is_correct, upgraded[0] if upgraded else None
+
+
+def make_password(raw_password):
+    """
+    make_password() Django в пуле хэширования.
+    """
+    return get_pool().run(hashers.make_password, raw_password)
+
+
+def check_password(raw_password, encoded):
+    """
+    verify_password() в пуле хэширования.
+    """
+    return get_pool().run(verify_password, raw_password, encoded)
@@ -0,0 +1,57 @@
+import secrets
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from account.authentication import StatelessJWTAuthentication, user_state_cache
+from account.serializers import ClaimsTokenObtainPairSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Микро-бенчмарк аутентификации: время и число SQL-запросов на запрос '
+        'для стандартной JWTAuthentication и StatelessJWTAuthentication. '
+        'Временный пользователь без пароля удаляется после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        # Пароль не нужен: create_user без пароля делает его непригодным для входа
+        user = User.objects.create_user(username=f'bench-auth-{secrets.token_hex(8)}')
+        try:
+            self.run(user, options['requests'])
+        finally:
+            user.delete()
+
+    def run(self, user, count):
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        factory = RequestFactory()
+        user_state_cache.clear()
+
+        self.stdout.write(f"{'backend':<30}{'us/request':>12}{'queries/request':>18}")
+        for name, backend in (
+            ('JWTAuthentication', JWTAuthentication()),
+            ('StatelessJWTAuthentication', StatelessJWTAuthentication()),
+        ):
+            requests = [
+                Request(factory.get('/api/tasks/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+                for _ in range(count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for request in requests:
+                    backend.authenticate(request)
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{name:<30}{elapsed / count * 1e6:>12.1f}{len(queries) / count:>18.4f}'
+            )
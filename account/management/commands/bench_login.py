@@ -0,0 +1,67 @@
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from account.hashing import verify_password
+
+User = get_user_model()
+
+HASHERS = [
+    ('pbkdf2 (Django)', 'django.contrib.auth.hashers.PBKDF2PasswordHasher'),
+    ('scrypt', 'account.hashing.ScryptPasswordHasher'),
+    ('argon2', 'account.hashing.Argon2PasswordHasher'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Пропускная способность входа по хэшерам паролей: PBKDF2 Django по '
+        'умолчанию против scrypt и argon2 с параметрами из настроек. '
+        'logins/s/core — последовательные authenticate() в одном потоке, '
+        'logins/s — проверки пароля в --workers потоках. Временный пользователь '
+        'со случайными именем и паролем удаляется после замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=50)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        password = secrets.token_urlsafe(16)
+        user = User.objects.create_user(username=f'bench-login-{secrets.token_hex(8)}')
+        try:
+            self.run(user, password, options['logins'], options['workers'])
+        finally:
+            user.delete()
+
+    def run(self, user, password, count, workers):
+        self.stdout.write(f"{'hasher':<18}{'ms/login':>10}{'logins/s/core':>16}{f'logins/s x{workers}':>16}")
+        for name, path in HASHERS:
+            if name == 'argon2' and not find_spec('argon2'):
+                self.stdout.write(f'{name:<18}  пропущен: argon2-cffi не установлен')
+                continue
+            # Хэшер предпочтительный и единственный: вход не перехэширует пароль
+            with override_settings(PASSWORD_HASHERS=[path], PASSWORD_HASH_WORKERS=1):
+                user.password = make_password(password)
+                user.save(update_fields=['password'])
+
+                started = time.perf_counter()
+                for _ in range(count):
+                    authenticate(username=user.username, password=password)
+                single = time.perf_counter() - started
+
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    started = time.perf_counter()
+                    list(pool.map(verify_password, [password] * count, [user.password] * count))
+                    parallel = time.perf_counter() - started
+
+            self.stdout.write(
+                f'{name:<18}{single / count * 1000:>10.1f}{count / single:>16.1f}{count / parallel:>16.1f}'
+            )
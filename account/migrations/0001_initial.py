@@ -0,0 +1,31 @@
+# Generated by Django 4.2.18 on 2026-10-16 23:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="RevokedToken",
+            fields=[
+                ("jti_hash", models.UUIDField(primary_key=True, serialize=False)),
+                ("expires_at", models.DateTimeField()),
+                ("revoked_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["expires_at"], name="revoked_token_expires_idx"
+                    ),
+                    models.Index(
+                        fields=["revoked_at"], name="revoked_token_revoked_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -1,3 +1,19 @@
 from django.db import models
 
-# Create your models here.
+
+class RevokedToken(models.Model):
+    """
+    Отозванный JWT (account/blacklist.py). Вместо jti хранится его
+    128-битный хэш, строка нужна только до истечения срока токена.
+    """
+    jti_hash = models.UUIDField(primary_key=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Удаление истёкших записей
+            models.Index(fields=['expires_at'], name='revoked_token_expires_idx'),
+            # Догрузка новых отзывов в фильтры Блума других процессов
+            models.Index(fields=['revoked_at'], name='revoked_token_revoked_idx'),
+        ]
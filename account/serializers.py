@@ -1,5 +1,13 @@
 from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import blacklist, hashing
+from .authentication import StatelessJWTAuthentication
 
 User = get_user_model()
 
@@ -11,9 +19,80 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ('username', 'password', 'email')
 
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data.get('email'),
-            password=validated_data['password']
+        # То же, что create_user, но хэш считается в пуле account.hashing
+        user = User(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data.get('email')),
         )
+        user.password = hashing.make_password(validated_data['password'])
+        user.save()
         return user
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Кладёт в токены имя пользователя, нужное StatelessJWTAuthentication,
+    чтобы не читать User из БД на каждый запрос. Активность и права
+    берутся из кэша состояния, а не из токена.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.get_username()
+        return token
+
+
+class BlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Обновление пары токенов с проверкой отзыва по account.blacklist.
+    Пользователь проверяется по кэшу состояния StatelessJWTAuthentication,
+    а не чтением User из БД.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        StatelessJWTAuthentication().get_user(refresh)
+
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            # Отзыв и проверка одним INSERT: повторно использовать старый
+            # токен не получится, даже если запросы пришли одновременно
+            if not blacklist.revoke(refresh):
+                raise TokenError(_('Token is blacklisted'))
+        elif blacklist.is_revoked(refresh):
+            raise TokenError(_('Token is blacklisted'))
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    """
+    Отзывает refresh-токен (выход) и access-токен из поля `access` или
+    заголовка Authorization. Истёкший access-токен отзывать не нужно.
+    """
+    refresh = serializers.CharField(write_only=True)
+    access = serializers.CharField(write_only=True, required=False)
+
+    def validate(self, attrs):
+        blacklist.revoke(RefreshToken(attrs['refresh']))
+        raw_access = attrs.get('access') or self.access_from_header()
+        if raw_access:
+            try:
+                blacklist.revoke(AccessToken(raw_access))
+            except TokenError:
+                pass
+        return {}
+
+    def access_from_header(self):
+        request = self.context.get('request')
+        if request is None:
+            return None
+        authentication = StatelessJWTAuthentication()
+        header = authentication.get_header(request)
+        return header and authentication.get_raw_token(header)
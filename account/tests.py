@@ -1,3 +1,337 @@
-from django.test import TestCase
+import io
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from todo_project import throttling
+
+from . import blacklist
+from .authentication import ClaimsUser, StatelessJWTAuthentication, user_state_cache
+from .hashing import HashingBusy, HashingPool
+from .models import RevokedToken
+
+User = get_user_model()
+
+
+class StatelessJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        throttling.get_store().clear()
+        user_state_cache.clear()
+        blacklist.revocations.clear()
+
+    def login(self):
+        response = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'testuser', 'password': 'testpassword'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['access']
+
+    def test_token_contains_user_claims(self):
+        """
+        Тест claims токена: имя пользователя есть, привилегий нет — они
+        переносились бы при каждом обновлении токена.
+        """
+        token = AccessToken(self.login())
+        self.assertEqual(token['username'], 'testuser')
+        for claim in ('is_active', 'is_staff', 'is_superuser', 'perms'):
+            self.assertNotIn(claim, token)
+
+    def test_privileges_come_from_user_state(self):
+        """
+        Тест прав: is_staff и права берутся из кэша состояния и пропадают
+        после его обновления, хотя токен тот же.
+        """
+        self.user.is_staff = True
+        self.user.save()
+        self.user.user_permissions.add(Permission.objects.get(codename='view_task'))
+        token = AccessToken(self.login())
+        user = StatelessJWTAuthentication().get_user(token)
+        self.assertTrue(user.is_staff)
+        self.assertTrue(user.has_perm('tasks.view_task'))
+
+        # Права меняются без сигнала post_save пользователя: действует кэш до TTL
+        self.user.user_permissions.clear()
+        self.assertTrue(StatelessJWTAuthentication().get_user(token).has_perm('tasks.view_task'))
+        User.objects.filter(pk=self.user.pk).update(is_staff=False)
+        user_state_cache.clear()
+        user = StatelessJWTAuthentication().get_user(token)
+        self.assertFalse(user.is_staff)
+        self.assertFalse(user.has_perm('tasks.view_task'))
+
+    def test_revoked_access_token_is_rejected(self):
+        """
+        Тест отзыва access-токена по jti.
+        """
+        access = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        url = reverse('task-list')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        blacklist.revoke(AccessToken(access))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_authenticated_reads_skip_user_lookup(self):
+        """
+        Тест аутентификации без запросов к БД: после первого запроса
+        пользователь строится из токена и кэша состояния.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.login()}')
+        url = reverse('task-list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.wsgi_request.user, ClaimsUser)
+        self.assertFalse(any('auth_user' in query['sql'] for query in warm.captured_queries))
+
+    def test_deactivated_user_is_rejected(self):
+        """
+        Тест отзыва доступа: деактивированный пользователь больше не проходит
+        аутентификацию, хотя токен ещё действителен.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.login()}')
+        url = reverse('task-list')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(THROTTLE_BUCKETS={'auth': ('1/min', 20)}, THROTTLE_COSTS={'login': 10, 'register': 10})
+class LoginThrottleTests(APITestCase):
+    def setUp(self):
+        User.objects.create_user(username='testuser', password='testpassword')
+
+    def test_login_is_cost_weighted(self):
+        """
+        Тест лимита входа: вход стоит 10 токенов, ведро на 20 — третья
+        попытка (даже с неверным паролем) получает 429 с Retry-After.
+        """
+        url = reverse('token_obtain_pair')
+        self.assertEqual(self.client.post(url, {'username': 'testuser', 'password': 'wrong'}).status_code, 401)
+        self.assertEqual(self.client.post(url, {'username': 'testuser', 'password': 'testpassword'}).status_code, 200)
+        response = self.client.post(url, {'username': 'testuser', 'password': 'testpassword'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        # Регистрация тратит то же ведро
+        response = self.client.post(reverse('register'), {'username': 'new', 'password': 'password123'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+@override_settings(
+    PASSWORD_HASHERS=[
+        'account.hashing.ScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    ],
+    PASSWORD_SCRYPT={'work_factor': 2 ** 10, 'block_size': 8, 'parallelism': 1, 'maxmem': 0},
+)
+class PasswordHashingTests(APITestCase):
+    def setUp(self):
+        throttling.get_store().clear()
+
+    def login(self, username, password):
+        return self.client.post(reverse('token_obtain_pair'), {'username': username, 'password': password})
+
+    def test_register_uses_preferred_hasher(self):
+        """
+        Тест регистрации: пароль хэшируется предпочтительным хэшером, с ним
+        можно войти.
+        """
+        response = self.client.post(reverse('register'), {'username': 'new', 'password': 'password123'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(identify_hasher(User.objects.get(username='new').password).algorithm, 'scrypt')
+        self.assertEqual(self.login('new', 'password123').status_code, status.HTTP_200_OK)
+
+    def test_legacy_hash_is_upgraded_on_login(self):
+        """
+        Тест перехэширования: хэш PBKDF2 заменяется на scrypt при успешном
+        входе и не меняется при неверном пароле.
+        """
+        user = User.objects.create(username='legacy', password=make_password('oldpassword', hasher='pbkdf2_sha256'))
+        self.assertEqual(self.login('legacy', 'wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).algorithm, 'pbkdf2_sha256')
+
+        self.assertEqual(self.login('legacy', 'oldpassword').status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).algorithm, 'scrypt')
+        self.assertEqual(self.login('legacy', 'oldpassword').status_code, status.HTTP_200_OK)
+
+    def test_hash_with_old_parameters_is_upgraded(self):
+        """
+        Тест смены параметров: хэш scrypt с другим work_factor перехэшируется.
+        """
+        user = User.objects.create_user(username='tuned', password='password123')
+        with self.settings(PASSWORD_SCRYPT={'work_factor': 2 ** 11, 'block_size': 8, 'parallelism': 1, 'maxmem': 0}):
+            self.assertEqual(self.login('tuned', 'password123').status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertIn('$2048$', user.password)
+
+    def test_pool_rejects_when_full(self):
+        """
+        Тест ограничения пула: при занятом потоке и пустой очереди вызов
+        сразу получает HashingBusy (503), после освобождения проходит.
+        """
+        pool = HashingPool(workers=1, queue_size=0)
+        started, release = threading.Event(), threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=pool.run, args=(blocking,))
+        worker.start()
+        started.wait(5)
+        with self.assertRaises(HashingBusy) as raised:
+            pool.run(len, 'x')
+        self.assertEqual(raised.exception.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        release.set()
+        worker.join()
+        self.assertEqual(pool.run(len, 'xy'), 2)
+        pool.shutdown()
+
+
+class BenchmarkCommandTests(APITestCase):
+    def test_bench_commands_remove_their_users(self):
+        """
+        Тест bench_auth и bench_login: временные пользователи удаляются после
+        замера.
+        """
+        User.objects.create_user(username='bench-login', password='password123')
+        call_command('bench_auth', '--requests', '2', stdout=io.StringIO())
+        call_command('bench_login', '--logins', '1', '--workers', '1', stdout=io.StringIO())
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['bench-login'])
+        self.assertTrue(User.objects.get().check_password('password123'))
+
+
+class TokenBlacklistTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        throttling.get_store().clear()
+        blacklist.revocations.clear()
+
+    def refresh(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': token})
+
+    def test_rotated_token_cannot_be_reused(self):
+        """
+        Тест ротации: обмен refresh-токена даёт новую пару, повторный обмен
+        старого токена отклоняется.
+        """
+        token = str(RefreshToken.for_user(self.user))
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['refresh'], token)
+        self.assertEqual(self.refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, status.HTTP_200_OK)
+        self.assertEqual(RevokedToken.objects.count(), 2)
+
+    @mock.patch.object(api_settings, 'ROTATE_REFRESH_TOKENS', False)
+    def test_logout_revokes_refresh_token(self):
+        """
+        Тест выхода: отозванный refresh-токен нельзя обменять, неотозванный
+        проверяется без запроса к таблице отзывов.
+        """
+        revoked, kept = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        response = self.client.post(reverse('token_revoke'), {'refresh': str(revoked)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.refresh(str(revoked)).status_code, status.HTTP_401_UNAUTHORIZED)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(blacklist.is_revoked(kept))
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(self.refresh(str(kept)).status_code, status.HTTP_200_OK)
+
+    def test_logout_revokes_access_token(self):
+        """
+        Тест выхода: access-токен из заголовка Authorization отзывается
+        вместе с refresh-токеном, истёкший access-токен выходу не мешает.
+        """
+        refresh = RefreshToken.for_user(self.user)
+        access = str(refresh.access_token)
+        url = reverse('task-list')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {access}').status_code, status.HTTP_200_OK)
+        response = self.client.post(
+            reverse('token_revoke'), {'refresh': str(refresh)}, HTTP_AUTHORIZATION=f'Bearer {access}'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {access}').status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+        expired = AccessToken.for_user(self.user)
+        expired.set_exp(lifetime=-timedelta(seconds=1))
+        response = self.client.post(
+            reverse('token_revoke'), {'refresh': str(RefreshToken.for_user(self.user)), 'access': str(expired)}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_revocations_from_other_processes_are_synced(self):
+        """
+        Тест синхронизации: отзыв, записанный в БД другим процессом, виден
+        после догрузки фильтра.
+        """
+        token = RefreshToken.for_user(self.user)
+        self.assertFalse(blacklist.is_revoked(token))
+        RevokedToken.objects.create(
+            jti_hash=uuid.UUID(bytes=blacklist.token_digest(token)),
+            expires_at=datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc),
+        )
+        self.assertFalse(blacklist.is_revoked(token))
+        blacklist.revocations.sync(force=True)
+        self.assertTrue(blacklist.is_revoked(token))
+
+    def test_prune_removes_expired_entries(self):
+        """
+        Тест очистки: удаляются только записи с истёкшим сроком.
+        """
+        now = timezone.now()
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti_hash=uuid.uuid4(), expires_at=now - timedelta(minutes=i + 1)) for i in range(5)]
+            + [RevokedToken(jti_hash=uuid.uuid4(), expires_at=now + timedelta(days=1))]
+        )
+        self.assertEqual(blacklist.prune_revoked_tokens(chunk_size=2), 5)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """
+        Тест фильтра Блума: все добавленные элементы находятся, доля ложных
+        срабатываний близка к заданной.
+        """
+        bloom = blacklist.BloomFilter(capacity=1000, error_rate=0.01)
+        added = [uuid.uuid4().bytes for _ in range(1000)]
+        for digest in added:
+            bloom.add(digest)
+        self.assertTrue(all(digest in bloom for digest in added))
+        false_positives = sum(uuid.uuid4().bytes in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_scalable_bloom_filter_grows(self):
+        """
+        Тест растущего фильтра: при переполнении добавляются новые фильтры,
+        доля ложных срабатываний остаётся в пределах заданной.
+        """
+        bloom = blacklist.ScalableBloomFilter(capacity=100, error_rate=0.01)
+        added = [uuid.uuid4().bytes for _ in range(3000)]
+        for digest in added:
+            bloom.add(digest)
+        count = len(bloom)
+        bloom.add(added[0])
+        self.assertEqual(len(bloom), count)
+        self.assertEqual([f.capacity for f in bloom.filters], [100, 200, 400, 800, 1600])
+        self.assertTrue(all(digest in bloom for digest in added))
+        false_positives = sum(uuid.uuid4().bytes in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
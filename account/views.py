@@ -1,13 +1,39 @@
+from django.conf import settings
 from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import RegisterSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenViewBase
+from .serializers import RegisterSerializer, TokenRevokeSerializer
 
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
+    # Хэширование пароля дорогое: общая с входом область лимитов по IP
+    throttle_scope = 'auth'
+
+    def get_throttle_cost(self, request):
+        return settings.THROTTLE_COSTS['register']
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class LoginView(TokenObtainPairView):
+    """
+    Выдача пары JWT по логину и паролю с лимитом области 'auth'.
+    """
+    throttle_scope = 'auth'
+
+    def get_throttle_cost(self, request):
+        return settings.THROTTLE_COSTS['login']
+
+
+class LogoutView(TokenViewBase):
+    """
+    Выход: refresh-токен из тела запроса больше нельзя обменять на новую
+    пару, а access-токен (поле `access` или заголовок Authorization) больше
+    не проходит аутентификацию (account.blacklist).
+    """
+    serializer_class = TokenRevokeSerializer
@@ -0,0 +1,111 @@
+"""
+Нативные async-версии эндпоинтов чтения (список и детальная задача,
+список комментариев) для работы под ASGI без пула потоков на каждый запрос.
+
+Живут рядом с синхронными DRF viewset'ами под префиксом /api/async/ и
+возвращают те же данные: используются те же фильтры, пагинация и
+сериализаторы, а запросы к БД выполняются через async ORM.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.http import http_date
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.request import Request
+
+from account.authentication import StatelessJWTAuthentication
+from todo_project.routers import ReplicaReadMixin, replica_reads
+
+from .cache import not_modified_since
+from .exceptions import custom_exception_handler
+from .models import Task
+from .pagination import approximate_count
+from .renderers import FastJSONRenderer
+from .serializers import CommentSerializer
+from .views import TaskViewSet, CommentViewSet
+
+authentication = StatelessJWTAuthentication()
+
+
+def render(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def api_view(viewset_class, action):
+    """
+    Оборачивает async-обработчик: аутентификация по JWT, права и лимиты
+    запросов viewset (permission_classes, throttle_classes), экземпляр
+    viewset для фильтров и пагинации, единый формат ошибок. Обработчик
+    возвращает данные ответа или готовый HttpResponse.
+    """
+    def decorator(handler):
+        async def view(request, **kwargs):
+            drf_request = Request(request)
+            try:
+                if request.method != 'GET':
+                    return HttpResponse(status=405, headers={'Allow': 'GET'})
+                result = await authentication.aauthenticate(request)
+                if result is None:
+                    raise NotAuthenticated()
+                drf_request.user, drf_request.auth = result
+                viewset = viewset_class(request=drf_request, action=action, format_kwarg=None, kwargs=kwargs)
+                # Как APIView.initial(); хранилище лимитов может ходить в Redis
+                await sync_to_async(check_access)(viewset, drf_request)
+                if issubclass(viewset_class, ReplicaReadMixin):
+                    with replica_reads():
+                        result = await handler(drf_request, viewset, **kwargs)
+                else:
+                    result = await handler(drf_request, viewset, **kwargs)
+                return result if isinstance(result, HttpResponse) else render(result)
+            except APIException as exc:
+                response = custom_exception_handler(exc, {'view': handler, 'request': drf_request})
+                rendered = render(response.data, status=response.status_code)
+                # Retry-After (429), WWW-Authenticate (401)
+                for header, value in response.items():
+                    rendered[header] = value
+                return rendered
+        return view
+    return decorator
+
+
+def check_access(viewset, request):
+    viewset.check_permissions(request)
+    viewset.check_throttles(request)
+
+
+async def paginate(viewset, queryset, request):
+    paginator = viewset.paginator
+    page_queryset = paginator.get_page_queryset(queryset, request, viewset)
+    if paginator.include_count:
+        paginator.count = await sync_to_async(approximate_count)(queryset)
+    return paginator, paginator.build_page([obj async for obj in page_queryset])
+
+
+@api_view(TaskViewSet, 'list')
+async def task_list(request, viewset):
+    queryset = viewset.filter_queryset(viewset.get_queryset())
+    paginator, page = await paginate(viewset, queryset, request)
+    data = viewset.get_serializer(page, many=True).data
+    return paginator.get_paginated_response(data).data
+
+
+@api_view(TaskViewSet, 'retrieve')
+async def task_detail(request, viewset, pk):
+    try:
+        task = await viewset.get_queryset().aget(pk=pk)
+    except Task.DoesNotExist:
+        raise NotFound()
+    last_modified = int(task.last_activity_at.timestamp())
+    if not_modified_since(request, last_modified):
+        response = HttpResponse(status=304)
+    else:
+        response = render(viewset.get_serializer(task).data)
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+@api_view(CommentViewSet, 'list')
+async def comment_list(request, viewset):
+    queryset = viewset.filter_queryset(viewset.get_queryset())
+    paginator, page = await paginate(viewset, queryset, request)
+    data = CommentSerializer(page, many=True, context={'request': request}).data
+    return paginator.get_paginated_response(data).data
@@ -0,0 +1,219 @@
+"""
+Массовые операции для viewset'ов: создание, частичное обновление и
+удаление массивом за один HTTP-запрос.
+"""
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import get_error_detail
+from rest_framework.response import Response
+
+from . import changelog, counters
+from .cache import invalidate_tasks
+from .models import ChangeLogEntry
+
+logger = logging.getLogger(__name__)
+
+# Текст ошибки БД (имена ограничений, таблиц, фрагменты SQL) клиенту не отдаём
+WRITE_ERROR = 'Не удалось сохранить элемент: ошибка базы данных.'
+
+
+class PreloadedObjects:
+    """
+    Подменяет queryset поля PrimaryKeyRelatedField на время массовой
+    валидации: все связанные объекты загружены одним запросом заранее,
+    а get(pk=...) ищет в словаре.
+    """
+
+    def __init__(self, model, objects):
+        self.model = model
+        self.objects = objects
+
+    def get(self, pk):
+        pk = self.model._meta.pk.to_python(pk)
+        try:
+            return self.objects[pk]
+        except KeyError:
+            raise self.model.DoesNotExist
+
+
+def preload_related_fields(serializer, items):
+    """
+    Для каждого поля-ссылки сериализатора загружает все упомянутые в items
+    объекты одним запросом вместо запроса на каждый элемент.
+    """
+    for name, field in serializer.fields.items():
+        if not isinstance(field, serializers.PrimaryKeyRelatedField) or field.read_only:
+            continue
+        queryset = field.get_queryset()
+        pks = set()
+        for item in items:
+            try:
+                pks.add(queryset.model._meta.pk.to_python(item.get(name)))
+            except (AttributeError, DjangoValidationError):
+                continue
+        pks.discard(None)
+        field.queryset = PreloadedObjects(queryset.model, queryset.in_bulk(pks))
+
+
+class BulkModelMixin:
+    """
+    Добавляет к ModelViewSet эндпоинт `<prefix>/bulk/`:
+
+    - POST — создание массива объектов через bulk_create;
+    - PATCH — частичное обновление массива объектов с `id` через bulk_update;
+    - DELETE — удаление объектов по `{"ids": [...]}`.
+
+    Все элементы валидируются за один проход, запись идёт пачками по
+    BULK_BATCH_SIZE в отдельных транзакциях вместе со счётчиками задач
+    (tasks/counters.py) и журналом изменений (tasks/changelog.py). Ошибки возвращаются по
+    индексу элемента: `{"index": 3, "errors": {...}}`.
+    """
+    # Атрибут объекта с id задачи, чей кэш нужно сбросить после записи
+    bulk_task_attr = 'pk'
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'detail': 'Ожидается массив объектов.'})
+        if len(items) > settings.BULK_MAX_ITEMS:
+            raise ValidationError({'detail': f'Не больше {settings.BULK_MAX_ITEMS} объектов за запрос.'})
+        if request.method == 'POST':
+            return self.bulk_create(items)
+        return self.bulk_update(items)
+
+    def bulk_create(self, items):
+        model = self.get_queryset().model
+        child = self.get_serializer()
+        preload_related_fields(child, items)
+
+        valid, errors = [], []
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, model(**child.run_validation(item))))
+            except ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+
+        written = self.write_in_batches(valid, errors, self.perform_bulk_create)
+        return self.bulk_response(written, errors, status.HTTP_201_CREATED)
+
+    def bulk_update(self, items):
+        model = self.get_queryset().model
+        pk_name = model._meta.pk.name
+        ids = set()
+        for item in items:
+            try:
+                ids.add(model._meta.pk.to_python(item.get(pk_name)))
+            except (AttributeError, DjangoValidationError):
+                continue
+        ids.discard(None)
+        instances = self.get_queryset().in_bulk(ids)
+        child = self.get_serializer(partial=True)
+        preload_related_fields(child, items)
+
+        valid, errors, fields = [], [], set()
+        for index, item in enumerate(items):
+            try:
+                instance = instances[model._meta.pk.to_python(item.get(pk_name))]
+            except (AttributeError, KeyError, DjangoValidationError):
+                errors.append({'index': index, 'errors': {pk_name: ['Объект не найден.']}})
+                continue
+            child.instance = instance
+            try:
+                validated = child.run_validation(item)
+            except ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+                continue
+            for attr, value in validated.items():
+                setattr(instance, attr, value)
+            fields.update(validated)
+            valid.append((index, instance))
+
+        # bulk_update не вызывает save(), поэтому auto_now проставляем сами
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                for _, instance in valid:
+                    setattr(instance, field.attname, now)
+                fields.add(field.name)
+
+        written = self.write_in_batches(
+            valid, errors, lambda objs: self.perform_bulk_update(objs, sorted(fields))
+        ) if fields else [obj for _, obj in valid]
+        return self.bulk_response(written, errors, status.HTTP_200_OK)
+
+    def bulk_destroy(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not ids:
+            raise ValidationError({'ids': ['Ожидается непустой массив идентификаторов.']})
+        try:
+            ids = [self.get_queryset().model._meta.pk.to_python(pk) for pk in ids]
+        except DjangoValidationError as exc:
+            raise ValidationError({'ids': get_error_detail(exc)})
+        deleted, _ = self.perform_bulk_destroy(self.get_queryset().filter(pk__in=ids))
+        return Response({'deleted': deleted})
+
+    def perform_bulk_destroy(self, queryset):
+        # Сигналы удаления копят изменения счётчиков и журнала и применяют их разом
+        with transaction.atomic(), counters.batched(), changelog.batched():
+            return queryset.delete()
+
+    def perform_bulk_create(self, objs):
+        # bulk_create не отправляет сигналы, счётчики обновляем сами
+        type(objs[0]).objects.bulk_create(objs)
+        for obj in objs:
+            counters.created(obj)
+        changelog.record(objs, ChangeLogEntry.UPSERT)
+
+    def perform_bulk_update(self, objs, fields):
+        model = type(objs[0])
+        previous = {}
+        if counters.tracked_field(model) in fields:
+            previous = counters.lock_states(model, [obj.pk for obj in objs])
+        model.objects.bulk_update(objs, fields)
+        for obj in objs:
+            counters.changed(obj, previous.get(obj.pk))
+        # Для комментариев и файлов previous — прежние задачи, их тоже отмечаем
+        moved_from = previous.values() if counters.tracked_field(model) == 'task' else ()
+        changelog.record(objs, ChangeLogEntry.UPSERT, task_ids=moved_from)
+
+    def write_in_batches(self, valid, errors, write):
+        """
+        Записывает объекты пачками; ошибка БД в пачке помечает все её элементы.
+        """
+        written = []
+        batch_size = settings.BULK_BATCH_SIZE
+        for start in range(0, len(valid), batch_size):
+            batch = valid[start:start + batch_size]
+            objects = [obj for _, obj in batch]
+            try:
+                with transaction.atomic(), counters.batched(), changelog.batched():
+                    write(objects)
+            except DatabaseError:
+                logger.exception('Массовая запись %s: ошибка БД в пачке с элемента %s', self.basename, batch[0][0])
+                errors.extend({'index': index, 'errors': {'detail': [WRITE_ERROR]}} for index, _ in batch)
+                continue
+            written.extend(objects)
+        if written:
+            invalidate_tasks({getattr(obj, self.bulk_task_attr) for obj in written})
+        errors.sort(key=lambda error: error['index'])
+        return written
+
+    def bulk_response(self, written, errors, success_status):
+        if errors:
+            response_status = status.HTTP_207_MULTI_STATUS if written else status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = success_status
+        return Response({
+            'ids': [obj.pk for obj in written],
+            'errors': errors,
+        }, status=response_status)
@@ -0,0 +1,217 @@
+"""
+Кэш сериализованных ответов TaskViewSet.
+
+Хранилище — кэш Django с алиасом settings.TASK_CACHE_ALIAS (LocMemCache
+в разработке и тестах, RedisCache в production). Детальная задача лежит
+под ключом `tasks:detail:<id>`, страницы списка — под ключом, в который
+входит "поколение" списков: любое изменение задачи, комментария или файла
+удаляет запись задачи и увеличивает поколение (см. tasks/signals.py).
+
+Изменения пишутся в транзакции, поэтому кэш сбрасывается дважды: сразу и
+после коммита — иначе GET между сбросом и коммитом закэшировал бы старую
+строку на весь TTL. С репликами чтения (DATABASE_REPLICAS) после коммита
+кэш ещё TASK_CACHE_REPLICA_LAG секунд не заполняется: отстающая реплика
+может отдавать старые данные.
+"""
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router, transaction
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Task
+
+LIST_GENERATION_KEY = 'tasks:list:generation'
+# Пока ключ есть, страницы списка не кэшируются (см. replica_lag)
+LIST_DIRTY_KEY = 'tasks:list:dirty'
+# Значение ключа задачи, которую пока нельзя кэшировать
+DIRTY = 'dirty'
+
+
+def get_cache():
+    alias = getattr(settings, 'TASK_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def detail_key(task_id):
+    return f'tasks:detail:{task_id}'
+
+
+def list_key(cache, request):
+    generation = cache.get_or_set(LIST_GENERATION_KEY, 1, timeout=None)
+    digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'tasks:list:{generation}:{digest}'
+
+
+def make_etag(data):
+    """
+    ETag представления. У задачи он начинается с версии — `"<version>-<md5>"`,
+    поэтому ETag из GET подходит для If-Match в PUT/PATCH (см. etag_versions);
+    md5 содержимого меняется и при изменении комментариев и файлов.
+    """
+    encoded = json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()
+    digest = hashlib.md5(encoded).hexdigest()
+    if isinstance(data, dict) and isinstance(data.get('version'), int):
+        return f"{data['version']}-{digest}"
+    return digest
+
+
+def etag_versions(if_match):
+    """
+    Версии задачи из заголовка If-Match; None для `*`. Понимает и ETag из
+    make_etag, и просто `"<version>"`.
+    """
+    if if_match.strip() == '*':
+        return None
+    versions = set()
+    for tag in parse_etags(if_match):
+        version = tag.strip('"').partition('-')[0]
+        if version.isdigit():
+            versions.add(int(version))
+    return versions
+
+
+def make_entry(data, request, last_modified=None):
+    return {
+        'etag': make_etag(data),
+        'host': request.get_host(),
+        'data': data,
+        'last_modified': last_modified,
+    }
+
+
+def invalidate_task(task_id):
+    """
+    Удаляет кэш задачи и сбрасывает все закэшированные страницы списка.
+    """
+    invalidate_tasks([task_id])
+
+
+def invalidate_tasks(task_ids):
+    """
+    То же для набора задач (массовые операции, которые не шлют сигналы).
+    """
+    task_ids = list(task_ids)
+    clear(task_ids, lag=0)
+    using = router.db_for_write(Task)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(lambda: clear(task_ids, lag=replica_lag()), using=using)
+    elif replica_lag():
+        clear(task_ids, lag=replica_lag())
+
+
+def replica_lag():
+    return settings.TASK_CACHE_REPLICA_LAG if getattr(settings, 'DATABASE_REPLICAS', ()) else 0
+
+
+def clear(task_ids, lag):
+    """
+    Удаляет записи задач и сбрасывает страницы списка; при `lag` вместо
+    записей задач на `lag` секунд ставится метка DIRTY.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    if lag:
+        cache.set_many({detail_key(task_id): DIRTY for task_id in task_ids}, timeout=lag)
+        cache.set(LIST_DIRTY_KEY, True, timeout=lag)
+    else:
+        cache.delete_many([detail_key(task_id) for task_id in task_ids])
+    try:
+        cache.incr(LIST_GENERATION_KEY)
+    except ValueError:
+        cache.set(LIST_GENERATION_KEY, 1, timeout=None)
+
+
+def get_last_modified(task_id):
+    """
+    Время последнего изменения задачи (сама задача, её комментарии и
+    файлы) в секундах для Last-Modified; None, если задачи нет.
+    """
+    value = Task.objects.filter(pk=task_id).values_list('last_activity_at', flat=True).first()
+    return int(value.timestamp()) if value is not None else None
+
+
+def not_modified_since(request, last_modified):
+    # If-None-Match важнее If-Modified-Since (RFC 9110, 13.1.3)
+    if 'If-None-Match' in request.headers:
+        return False
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and last_modified <= since
+
+
+class TaskCacheMixin:
+    """
+    Кэширует ответы list/retrieve и отвечает 304 на If-None-Match без
+    обращения к сериализаторам. Детальная задача отдаётся с Last-Modified
+    и отвечает 304 на If-Modified-Since.
+    """
+
+    def list(self, request, *args, **kwargs):
+        cache = get_cache()
+        if cache is None:
+            return super().list(request, *args, **kwargs)
+        key = list_key(cache, request)
+        entry = cache.get(key)
+        if entry is None:
+            entry = make_entry(super().list(request, *args, **kwargs).data, request)
+            if not cache.get(LIST_DIRTY_KEY):
+                cache.set(key, entry)
+        return self.cached_response(request, entry)
+
+    def retrieve(self, request, *args, **kwargs):
+        cache = get_cache()
+        try:
+            task_id = uuid.UUID(str(kwargs[self.lookup_url_kwarg or self.lookup_field]))
+        except ValueError:
+            task_id = None
+        if task_id is None:
+            return super().retrieve(request, *args, **kwargs)
+        # Кэшируется только полный ответ: ?fields=, ?expand= и прочие
+        # параметры меняют его содержимое
+        cacheable = cache is not None and not request.query_params
+        entry = cache.get(detail_key(task_id)) if cacheable else None
+        if entry == DIRTY:
+            entry, cacheable = None, False
+        # Вложенные ссылки на файлы абсолютные, поэтому запись привязана к хосту
+        if entry is not None and entry['host'] != request.get_host():
+            entry = None
+        # Время изменения читаем до ответа: если задача изменится между
+        # ними, клиент получит её ещё раз, но не пропустит изменение
+        last_modified = entry.get('last_modified') if entry is not None else None
+        if last_modified is None:
+            last_modified = get_last_modified(task_id)
+        if last_modified is not None and not_modified_since(request, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['Last-Modified'] = http_date(last_modified)
+            return response
+        if entry is None:
+            response = super().retrieve(request, *args, **kwargs)
+            if not cacheable:
+                if response.status_code == status.HTTP_200_OK:
+                    response['ETag'] = quote_etag(make_etag(response.data))
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+                return response
+            entry = make_entry(response.data, request, last_modified)
+            cache.set(detail_key(task_id), entry)
+        response = self.cached_response(request, entry)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def cached_response(self, request, entry):
+        etag = quote_etag(entry['etag'])
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(entry['data'])
+        response['ETag'] = etag
+        return response
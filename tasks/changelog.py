@@ -0,0 +1,244 @@
+"""
+Журнал изменений для синхронизации клиентов (/api/tasks/changes/).
+
+Создание, изменение и удаление задач, комментариев и файлов пишется в
+ChangeLogEntry в той же транзакции: из сигналов моделей и явно из массовых
+операций. Изменение комментария или файла отмечает и задачу — у неё
+меняются счётчики и last_activity_at. При каскадном удалении задачи
+записывается только её tombstone: клиент удаляет комментарии и файлы
+задачи вместе с ней. Внутри `batched()` записи копятся и вставляются
+одним bulk_create.
+
+id записи выдаётся при INSERT, а транзакции коммитятся в другом порядке:
+запись с меньшим id может стать видимой позже записи с большим. Поэтому
+каждая запись хранит id своей транзакции (txid), журнал читается в порядке
+(txid, id) и только до горизонта — самой старой ещё не завершённой
+транзакции. Записи ниже горизонта уже не появятся, так что клиент с
+токеном (txid, id) последней прочитанной записи ничего не пропустит.
+
+Горизонт есть только в PostgreSQL. На других СУБД txid всегда 0, журнал
+читается по id без горизонта: SQLite пропускает одну пишущую транзакцию
+за раз, и id там выдаются в порядке коммитов; на прочих СУБД запись,
+закоммиченная позже соседней, может быть пропущена.
+
+Записи старше TASK_CHANGES_RETENTION_DAYS удаляет фоновая задача
+prune_changelog; позиция последней удалённой записи хранится в
+ChangeLogHorizon, и токен до неё отклоняется (TokenExpired).
+"""
+import contextvars
+import re
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Func, BigIntegerField, Max, Q
+from django.utils import timezone
+
+from . import jobs
+from .models import ChangeLogEntry, ChangeLogHorizon, Task, Comment, File
+
+KINDS = {Task: 'task', Comment: 'comment', File: 'file'}
+
+_batch = contextvars.ContextVar('changelog_batch', default=None)
+_next_prune = 0.0
+
+TOKEN_RE = re.compile(r'^(\d+)\.(\d+)$')
+
+# Id транзакций ниже горизонта (xmin снимка) завершены: закоммиченные
+# видны, откаченные не появятся. Запись собственной незавершённой
+# транзакции тоже выше горизонта
+HORIZON_SQL = 'SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint'
+
+
+class CurrentTransactionId(Func):
+    # Без PostgreSQL горизонта нет, см. horizon()
+    template = '0'
+    output_field = BigIntegerField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='pg_current_xact_id()::text::bigint', **extra_context)
+
+
+class TokenExpired(Exception):
+    pass
+
+
+def entry(kind, object_id, action):
+    return ChangeLogEntry(kind=kind, object_id=str(object_id), action=action, txid=CurrentTransactionId())
+
+
+def record(objs, action, task_ids=()):
+    """
+    Записывает изменение объектов `objs`. Для комментариев и файлов
+    задача тоже отмечается изменённой, как и задачи из `task_ids` (например,
+    прежняя задача перенесённого комментария).
+    """
+    entries = []
+    touched = set(task_ids)
+    for obj in objs:
+        kind = KINDS[type(obj)]
+        entries.append(entry(kind, obj.pk, action))
+        if kind != 'task':
+            touched.add(obj.task_id)
+    entries.extend(entry('task', task_id, ChangeLogEntry.UPSERT) for task_id in touched if task_id is not None)
+    save(entries)
+
+
+def record_ids(kind, object_ids, action):
+    """
+    То же по id, без экземпляров (массовое удаление через DELETE).
+    """
+    save([entry(kind, object_id, action) for object_id in object_ids])
+
+
+def save(entries):
+    batch = _batch.get()
+    if batch is not None:
+        batch.extend(entries)
+    elif entries:
+        ChangeLogEntry.objects.bulk_create(entries)
+        schedule_prune()
+
+
+@contextmanager
+def batched():
+    """
+    Копит записи журнала и вставляет их при выходе; повторные отметки
+    одного объекта схлопываются в последнюю.
+    """
+    if _batch.get() is not None:
+        yield
+        return
+    entries = []
+    token = _batch.set(entries)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+    latest = {}
+    for item in entries:
+        latest.pop((item.kind, item.object_id), None)
+        latest[item.kind, item.object_id] = item
+    if latest:
+        ChangeLogEntry.objects.bulk_create(latest.values())
+        schedule_prune()
+
+
+def format_token(txid, entry_id):
+    return f'{txid}.{entry_id}'
+
+
+def parse_token(token):
+    """
+    (txid, id) из токена или None, если токен некорректен.
+    """
+    match = TOKEN_RE.match(token)
+    return (int(match[1]), int(match[2])) if match else None
+
+
+def horizon(using):
+    """
+    Id самой старой незавершённой транзакции; None не на PostgreSQL.
+    """
+    if connections[using].vendor != 'postgresql':
+        return None
+    with connections[using].cursor() as cursor:
+        cursor.execute(HORIZON_SQL)
+        return cursor.fetchone()[0]
+
+
+def after(txid, entry_id):
+    return Q(txid__gt=txid) | Q(txid=txid, id__gt=entry_id)
+
+
+def current_token():
+    """
+    Токен, после которого придут все изменения, ещё не видимые сейчас.
+    Уже видимые записи выше горизонта тоже придут повторно — это безопасно.
+    """
+    using = router.db_for_read(ChangeLogEntry)
+    safe = horizon(using)
+    if safe is None:
+        return format_token(0, ChangeLogEntry.objects.using(using).aggregate(id=Max('id'))['id'] or 0)
+    return format_token(safe, 0)
+
+
+def changes_since(since, limit):
+    """
+    Читает до `limit` записей журнала после токена `since` = (txid, id) и
+    возвращает последнее действие по каждому объекту: {kind: {object_id:
+    action}}, следующий токен и признак, что записей больше. Бросает
+    TokenExpired, если записи после токена уже удалены очисткой.
+    """
+    using = router.db_for_read(ChangeLogEntry)
+    pruned = ChangeLogHorizon.objects.using(using).values_list('txid', 'entry_id').first()
+    if pruned is not None and since < pruned:
+        raise TokenExpired()
+    # Горизонт читается до записей: всё, что ниже него, к чтению уже закоммичено
+    safe = horizon(using)
+    entries = ChangeLogEntry.objects.using(using).filter(after(*since))
+    if safe is not None:
+        entries = entries.filter(txid__lt=safe)
+    rows = list(
+        entries.order_by('txid', 'id').values_list('txid', 'id', 'kind', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {kind: {} for kind in KINDS.values()}
+    for _, _, kind, object_id, action in rows:
+        latest[kind].pop(object_id, None)
+        latest[kind][object_id] = action
+    if rows:
+        next_token = format_token(*rows[-1][:2])
+    elif safe is None:
+        next_token = format_token(*since)
+    else:
+        # Ниже горизонта после токена записей нет и уже не будет
+        next_token = format_token(*max(since, (safe, 0)))
+    return latest, next_token, has_more
+
+
+def schedule_prune():
+    global _next_prune
+    now = time.monotonic()
+    if now >= _next_prune:
+        _next_prune = now + settings.TASK_CHANGES_PRUNE_INTERVAL
+        jobs.enqueue('prune_changelog')
+
+
+@jobs.register('prune_changelog')
+def prune_changelog(chunk_size=None):
+    """
+    Удаляет пачками записи журнала старше TASK_CHANGES_RETENTION_DAYS.
+    Граница — последняя такая запись в порядке (txid, id) ниже горизонта;
+    она сохраняется в ChangeLogHorizon до удаления, чтобы токены до неё
+    сразу отклонялись. Возвращает число удалённых строк.
+    """
+    chunk_size = chunk_size or settings.TASK_CHANGES_PRUNE_CHUNK_SIZE
+    cutoff = timezone.now() - timedelta(days=settings.TASK_CHANGES_RETENTION_DAYS)
+    expired = ChangeLogEntry.objects.filter(changed_at__lt=cutoff)
+    safe = horizon(router.db_for_write(ChangeLogEntry))
+    if safe is not None:
+        expired = expired.filter(txid__lt=safe)
+    txid = expired.aggregate(txid=Max('txid'))['txid']
+    if txid is None:
+        return 0
+    entry_id = expired.filter(txid=txid).aggregate(id=Max('id'))['id']
+    with transaction.atomic():
+        current = ChangeLogHorizon.objects.select_for_update().first()
+        if current is None:
+            ChangeLogHorizon.objects.create(txid=txid, entry_id=entry_id)
+        elif (current.txid, current.entry_id) < (txid, entry_id):
+            current.txid, current.entry_id = txid, entry_id
+            current.save()
+    deleted = 0
+    while True:
+        pks = list(
+            ChangeLogEntry.objects.filter(Q(txid__lt=txid) | Q(txid=txid, id__lte=entry_id))
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not pks:
+            return deleted
+        deleted += ChangeLogEntry.objects.filter(pk__in=pks).delete()[0]
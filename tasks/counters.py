@@ -0,0 +1,254 @@
+"""
+Денормализованные счётчики: Task.comments_count, Task.files_count,
+Task.last_activity_at и количество задач по статусам (TaskStatusSummary).
+
+Счётчики меняются только относительным UPDATE (`x = x + n`) в той же
+транзакции, что и изменение данных: из сигналов моделей (tasks/signals.py)
+и явно из массовых операций, которые сигналы не отправляют. Внутри
+`batched()` изменения копятся и применяются одним UPDATE на группу задач
+с одинаковой дельтой. Расхождения исправляет команда repair_counters.
+"""
+import contextvars
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db.models import Count, F, Max
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Task, TaskStatusSummary, Comment, File
+
+# Модель -> (счётчик задачи, поле времени создания)
+TASK_CHILDREN = {
+    Comment: ('comments_count', 'created_at'),
+    File: ('files_count', 'uploaded_at'),
+}
+
+_batch = contextvars.ContextVar('counter_batch', default=None)
+
+
+class CounterDeltas:
+    def __init__(self):
+        self.tasks = defaultdict(Counter)
+        self.activity = {}
+        self.statuses = Counter()
+
+    def add_task(self, task_id, field, delta, activity_at=None):
+        self.tasks[task_id][field] += delta
+        if activity_at is not None and (task_id not in self.activity or self.activity[task_id] < activity_at):
+            self.activity[task_id] = activity_at
+
+    def apply(self):
+        # Изменения пачки происходят в одной транзакции, поэтому время
+        # активности у всех задач общее (самое позднее): так задачи с
+        # одинаковой дельтой обновляются одним UPDATE
+        activity_at = max(self.activity.values(), default=None)
+        groups = defaultdict(list)
+        for task_id in self.tasks.keys() | self.activity.keys():
+            changes = tuple(sorted((field, delta) for field, delta in self.tasks[task_id].items() if delta))
+            groups[changes, task_id in self.activity].append(task_id)
+        for (changes, active), task_ids in groups.items():
+            values = {
+                field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, 0)
+                for field, delta in changes
+            }
+            if active:
+                values['last_activity_at'] = activity_at
+            if values:
+                # _base_manager: счётчики ведутся и у задач, ждущих очистки
+                Task._base_manager.filter(pk__in=task_ids).update(**values)
+        for status, delta in self.statuses.items():
+            if delta:
+                adjust_status(status, delta)
+
+
+def adjust_status(status, delta):
+    updated = TaskStatusSummary.objects.filter(status=status).update(count=F('count') + delta)
+    if not updated:
+        TaskStatusSummary.objects.get_or_create(status=status)
+        TaskStatusSummary.objects.filter(status=status).update(count=F('count') + delta)
+
+
+@contextmanager
+def batched():
+    """
+    Копит изменения счётчиков и применяет их при выходе. Использовать
+    внутри transaction.atomic(), чтобы счётчики менялись в той же транзакции.
+    """
+    if _batch.get() is not None:
+        yield _batch.get()
+        return
+    deltas = CounterDeltas()
+    token = _batch.set(deltas)
+    try:
+        yield deltas
+    finally:
+        _batch.reset(token)
+    deltas.apply()
+
+
+@contextmanager
+def _deltas():
+    batch = _batch.get()
+    if batch is not None:
+        yield batch
+        return
+    deltas = CounterDeltas()
+    yield deltas
+    deltas.apply()
+
+
+def tracked_state(obj):
+    """
+    Значение колонки, от которой зависят счётчики: статус задачи или
+    задача комментария/файла.
+    """
+    if isinstance(obj, Task):
+        return obj.status
+    if type(obj) in TASK_CHILDREN:
+        return obj.task_id
+    return None
+
+
+def tracked_field(model):
+    """
+    Поле модели, от которого зависят счётчики, или None.
+    """
+    if model is Task:
+        return 'status'
+    if model in TASK_CHILDREN:
+        return 'task'
+    return None
+
+
+def lock_states(model, pks):
+    """
+    Текущие (заблокированные до конца транзакции) значения отслеживаемой
+    колонки: нужны, чтобы посчитать дельту при изменении.
+    """
+    field = tracked_field(model)
+    if field is None or not pks:
+        return {}
+    column = model._meta.get_field(field).attname
+    return dict(model.objects.select_for_update().filter(pk__in=pks).values_list('pk', column))
+
+
+def lock_task_state(pk):
+    """
+    (статус, версия) задачи, заблокированной до конца транзакции, или None.
+    """
+    return Task.objects.select_for_update().filter(pk=pk).values_list('status', 'version').first()
+
+
+def created(obj):
+    with _deltas() as deltas:
+        if isinstance(obj, Task):
+            deltas.statuses[obj.status] += 1
+        elif type(obj) in TASK_CHILDREN:
+            field, time_field = TASK_CHILDREN[type(obj)]
+            deltas.add_task(obj.task_id, field, 1, getattr(obj, time_field) or timezone.now())
+
+
+def changed(obj, previous):
+    if previous is None or previous == tracked_state(obj):
+        return
+    with _deltas() as deltas:
+        if isinstance(obj, Task):
+            deltas.statuses[previous] -= 1
+            deltas.statuses[obj.status] += 1
+        elif type(obj) in TASK_CHILDREN:
+            field, _ = TASK_CHILDREN[type(obj)]
+            deltas.add_task(previous, field, -1, timezone.now())
+            deltas.add_task(obj.task_id, field, 1, timezone.now())
+
+
+def statuses_changed(previous, status):
+    """
+    Учитывает массовый перевод задач в `status`; `previous` — их прежние
+    статусы (см. lock_states).
+    """
+    with _deltas() as deltas:
+        for state in previous:
+            deltas.statuses[state] -= 1
+            deltas.statuses[status] += 1
+
+
+def statuses_deleted(statuses):
+    """
+    Учитывает массовое удаление задач с указанными статусами.
+    """
+    with _deltas() as deltas:
+        for status in statuses:
+            deltas.statuses[status] -= 1
+
+
+def deleted(obj):
+    with _deltas() as deltas:
+        if isinstance(obj, Task):
+            deltas.statuses[obj.status] -= 1
+        elif type(obj) in TASK_CHILDREN:
+            field, _ = TASK_CHILDREN[type(obj)]
+            # Удаление тоже активность: меняется ответ задачи (Last-Modified)
+            deltas.add_task(obj.task_id, field, -1, timezone.now())
+
+
+def status_summary():
+    """
+    Количество задач по статусам из TaskStatusSummary: чтение нескольких
+    строк вместо COUNT(*) по таблице задач.
+    """
+    counts = dict(TaskStatusSummary.objects.values_list('status', 'count'))
+    by_status = {status: counts.get(status, 0) for status, _ in Task.STATUS_CHOICES}
+    return {'total': sum(by_status.values()), 'by_status': by_status}
+
+
+def repair_tasks(task_ids, fix=True):
+    """
+    Пересчитывает счётчики указанных задач по комментариям и файлам и
+    возвращает id задач, где значения расходились. Вызывать в транзакции:
+    строки задач блокируются до подсчёта, поэтому параллельные изменения
+    применят свою дельту уже поверх исправленного значения.
+    """
+    tasks = list(
+        Task.objects.select_for_update().filter(pk__in=task_ids)
+        .only('id', 'updated_at', 'comments_count', 'files_count', 'last_activity_at')
+    )
+    actual = {task.pk: {'comments_count': 0, 'files_count': 0, 'last_activity_at': None} for task in tasks}
+    for model, (field, time_field) in TASK_CHILDREN.items():
+        rows = (
+            model.objects.filter(task_id__in=actual).order_by()
+            .values('task_id').annotate(total=Count('pk'), latest=Max(time_field))
+        )
+        for row in rows:
+            state = actual[row['task_id']]
+            state[field] = row['total']
+            if state['last_activity_at'] is None or row['latest'] > state['last_activity_at']:
+                state['last_activity_at'] = row['latest']
+
+    broken = []
+    for task in tasks:
+        state = actual[task.pk]
+        state['last_activity_at'] = max(filter(None, (task.updated_at, state['last_activity_at'])))
+        if (task.comments_count, task.files_count) != (state['comments_count'], state['files_count']) \
+                or task.last_activity_at is None or task.last_activity_at < state['last_activity_at']:
+            broken.append(task.pk)
+            # update() вместо save(): auto_now у last_activity_at перезаписал бы значение
+            if fix:
+                Task.objects.filter(pk=task.pk).update(**state)
+    return broken
+
+
+def repair_status_summary(fix=True):
+    """
+    Пересчитывает TaskStatusSummary одним GROUP BY по задачам и возвращает
+    статусы, где значение расходилось.
+    """
+    actual = dict(Task.objects.order_by().values('status').annotate(total=Count('pk')).values_list('status', 'total'))
+    stored = dict(TaskStatusSummary.objects.values_list('status', 'count'))
+    broken = []
+    for status in set(actual) | set(stored) | {status for status, _ in Task.STATUS_CHOICES}:
+        if stored.get(status) != actual.get(status, 0):
+            broken.append(status)
+            if fix:
+                TaskStatusSummary.objects.update_or_create(status=status, defaults={'count': actual.get(status, 0)})
+    return sorted(broken)
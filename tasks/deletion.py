@@ -0,0 +1,155 @@
+"""
+Удаление задач с большим числом комментариев и файлов.
+
+Для клиентов задача удаляется сразу: одна короткая транзакция помечает её
+удалённой (Task.deleted_at, такие задачи не видит Task.objects), уменьшает
+сводку по статусам, пишет tombstone в журнал изменений и ставит в очередь
+фоновую задачу `purge_deleted_tasks`. Та удаляет комментарии и файлы в БД
+пачками по DELETE_CHUNK_SIZE строк без загрузки объектов; каждая пачка —
+своя транзакция, в которой уменьшаются и счётчики задачи, так что
+прерванная очистка оставляет согласованное состояние и просто повторяется.
+Блобы удалённых файлов освобождает фоновая задача `release_blobs`, сами
+строки задач удаляются последними. До очистки API читает комментарии и
+файлы через visible(), которая скрывает строки помеченных задач.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import changelog, counters, jobs, uploads
+from .cache import invalidate_tasks
+from .models import ChangeLogEntry, Comment, File, Task, UploadSession
+
+
+@jobs.register('release_blobs')
+def release_blobs(names):
+    """
+    Удаляет блобы, на которые больше не ссылается ни одна строка File.
+    `names` — пары (поле File, имя блоба).
+    """
+    storage = File._meta.get_field('file').storage
+    for field, name in names:
+        if hasattr(storage, 'release'):
+            storage.release(name, field)
+
+
+def raw_delete(queryset):
+    """
+    DELETE по выборке без загрузки объектов и без сигналов. Возвращает
+    число строк (для заведомо пустой выборки запрос не выполняется).
+    """
+    return queryset._raw_delete(queryset.db) or 0
+
+
+def delete_children(model, task_ids, chunk_size):
+    """
+    Удаляет комментарии или файлы задач пачками и возвращает их число.
+    """
+    counter_field, _ = counters.TASK_CHILDREN[model]
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            queryset = model.objects.filter(task_id__in=task_ids).order_by()
+            if model is File:
+                rows = list(queryset.values_list('pk', 'task_id', 'file', 'thumbnail')[:chunk_size])
+                names = [[field, name] for row in rows for field, name in zip(('file', 'thumbnail'), row[2:]) if name]
+            else:
+                rows = list(queryset.values_list('pk', 'task_id')[:chunk_size])
+                names = []
+            if not rows:
+                return deleted
+            # DELETE без загрузки объектов и сигналов; журнал не нужен —
+            # клиенты удаляют комментарии и файлы вместе с задачей
+            deleted += raw_delete(model.objects.filter(pk__in=[row[0] for row in rows]))
+            with counters.batched() as deltas:
+                for task_id, count in Counter(row[1] for row in rows).items():
+                    deltas.add_task(task_id, counter_field, -count)
+            if names:
+                jobs.enqueue('release_blobs', {'names': names})
+
+
+def delete_tasks(task_ids, purge=True):
+    """
+    Помечает задачи удалёнными и ставит их очистку в очередь (с
+    `purge=False` очистку вызывает сам вызывающий, см. purge_tasks()).
+    Возвращает то же, что QuerySet.delete(): число удалённых задач и число
+    по моделям.
+    """
+    with transaction.atomic():
+        statuses = dict(Task.objects.select_for_update().filter(pk__in=list(task_ids)).values_list('pk', 'status'))
+        if not statuses:
+            return 0, {}
+        Task.objects.filter(pk__in=statuses).update(deleted_at=timezone.now())
+        counters.statuses_deleted(statuses.values())
+        changelog.record_ids('task', statuses, ChangeLogEntry.DELETE)
+        if purge:
+            jobs.enqueue('purge_deleted_tasks', {'task_ids': [str(pk) for pk in statuses]})
+    invalidate_tasks(list(statuses))
+    return len(statuses), {Task._meta.label: len(statuses)}
+
+
+def visible(model):
+    """
+    Комментарии или файлы задач, не помеченных удалёнными.
+    """
+    return model.objects.filter(task__deleted_at__isnull=True)
+
+
+@jobs.register('purge_deleted_tasks')
+def purge_deleted_tasks(task_ids, chunk_size=None):
+    """
+    Удаляет комментарии, файлы, незавершённые загрузки и строки помеченных
+    задач. Возвращает число удалённых строк по моделям.
+    """
+    chunk_size = chunk_size or settings.DELETE_CHUNK_SIZE
+    deleted = Counter()
+    for model in (Comment, File):
+        deleted[model._meta.label] += delete_children(model, task_ids, chunk_size)
+
+    with transaction.atomic():
+        pks = list(
+            Task._base_manager.select_for_update()
+            .filter(pk__in=task_ids, deleted_at__isnull=False).values_list('pk', flat=True)
+        )
+        # Строки задач заблокированы: дочищаем добавленное за время очистки
+        for model in (Comment, File):
+            deleted[model._meta.label] += delete_children(model, pks, chunk_size)
+        sessions = list(UploadSession.objects.filter(task_id__in=pks))
+        for session in sessions:
+            transaction.on_commit(lambda session=session: uploads.discard(session))
+        deleted[UploadSession._meta.label] += raw_delete(
+            UploadSession.objects.filter(pk__in=[session.pk for session in sessions])
+        )
+        deleted[Task._meta.label] += raw_delete(Task._base_manager.filter(pk__in=pks))
+    return {label: count for label, count in deleted.items() if count}
+
+
+def purge_tasks(queryset, batch_size=100, chunk_size=None):
+    """
+    Удаляет все задачи выборки пачками по `batch_size` задач (keyset по
+    первичному ключу) и дочищает задачи, очистка которых не завершилась
+    (например, задача очереди окончательно упала). Возвращает число
+    удалённых задач.
+    """
+    purged = 0
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        task_ids = list(batch.values_list('pk', flat=True)[:batch_size])
+        if not task_ids:
+            break
+        delete_tasks(task_ids, purge=False)
+        purged += purge_deleted_tasks(task_ids, chunk_size).get(Task._meta.label, 0)
+        last_pk = task_ids[-1]
+    while True:
+        pending = list(
+            Task._base_manager.filter(deleted_at__isnull=False).order_by('deleted_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pending:
+            return purged
+        purged += purge_deleted_tasks(pending, chunk_size).get(Task._meta.label, 0)
@@ -0,0 +1,81 @@
+"""
+Выборочные поля ответа: `?fields=id,title,status` и `?expand=comments,files`.
+
+Без параметров ответ прежний — все поля и вложенные связи. С `fields`
+выводятся только перечисленные поля; вложенные связи выводятся, если они
+перечислены в `fields` или в `expand`. Если задан только `expand`,
+выводятся все обычные поля и перечисленные связи. Набор полей задаёт и
+запрос к БД: читаются только нужные колонки, а связи предзагружаются
+только при выводе.
+"""
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_names(value):
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def select_fields(serializer_class, query_params):
+    """
+    Возвращает список выводимых полей в порядке сериализатора или None,
+    если клиент не ограничивал поля.
+    """
+    fields = parse_names(query_params.get(FIELDS_PARAM))
+    expand = parse_names(query_params.get(EXPAND_PARAM))
+    if fields is None and expand is None:
+        return None
+
+    declared = serializer_class().fields
+    relations = [name for name, field in declared.items() if isinstance(field, ListSerializer)]
+    errors = {}
+    unknown = [name for name in fields or () if name not in declared]
+    if unknown:
+        errors[FIELDS_PARAM] = [f'Неизвестные поля: {", ".join(unknown)}.']
+    unknown = [name for name in expand or () if name not in relations]
+    if unknown:
+        errors[EXPAND_PARAM] = [f'Раскрыть можно только: {", ".join(relations)}.']
+    if errors:
+        raise ValidationError(errors)
+
+    selected = set(fields) if fields is not None else set(declared) - set(relations)
+    selected.update(expand or ())
+    return [name for name in declared if name in selected]
+
+
+class DynamicFieldsMixin:
+    """
+    Оставляет в сериализаторе только поля из `context['fields']`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.context.get('fields')
+        if selected is not None:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+
+
+class FieldSelectionMixin:
+    """
+    Передаёт выбор полей из query-параметров в сериализатор для действий
+    чтения (`field_selection_actions`).
+    """
+    field_selection_actions = ('list', 'retrieve')
+
+    def get_field_selection(self):
+        if not hasattr(self, '_field_selection'):
+            self._field_selection = None
+            if self.action in self.field_selection_actions:
+                self._field_selection = select_fields(self.get_serializer_class(), self.request.query_params)
+        return self._field_selection
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_field_selection()
+        return context
@@ -0,0 +1,53 @@
+import operator
+from functools import reduce
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+
+class TaskSearchFilter(filters.SearchFilter):
+    """
+    Поиск задач по параметру ?search=...
+
+    На PostgreSQL используется поддерживаемая триггером колонка tsvector
+    (конфигурации russian и english) с GIN-индексом и ранжированием.
+    Поиск подстроки (`icontains`) остаётся запасным вариантом и идёт через
+    триграммные GIN-индексы. На других СУБД работает обычный SearchFilter.
+    """
+    search_configs = ('russian', 'english')
+    vector_field = 'search_vector'
+    rank_annotation = 'search_rank'
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        text = ' '.join(search_terms)
+        query = reduce(operator.or_, (
+            SearchQuery(text, config=config, search_type='websearch')
+            for config in self.search_configs
+        ))
+        # Каждое слово должно встретиться хотя бы в одном поле, как в SearchFilter
+        substring = reduce(operator.and_, (
+            reduce(operator.or_, (Q(**{f'{field}__icontains': term}) for field in search_fields))
+            for term in search_terms
+        ))
+        # ts_rank возвращает real: приводим к double precision, иначе ранг из
+        # курсора пагинации не совпадает с ранжированием в БД и строки с
+        # одинаковым рангом теряются между страницами
+        queryset = queryset.annotate(
+            **{self.rank_annotation: Cast(SearchRank(F(self.vector_field), query), FloatField())}
+        ).filter(Q(**{self.vector_field: query}) | substring)
+
+        # Явная сортировка клиента важнее релевантности
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('-' + self.rank_annotation)
+        return queryset
@@ -0,0 +1,275 @@
+"""
+Инструментирование запросов: общее время, время и число SQL-запросов,
+повторяющиеся запросы (N+1), время сериализации и рендеринга, размер ответа.
+
+Метрики собираются для доли запросов REQUEST_METRICS_SAMPLE_RATE, отдаются
+клиенту в заголовке Server-Timing и копятся в гистограммах по view,
+которые экспортирует эндпоинт /metrics в текстовом формате Prometheus.
+Реестр метрик живёт в памяти процесса: при нескольких воркерах каждый
+отдаёт свои значения.
+"""
+import contextvars
+import hmac
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Метрики текущего запроса; None — запрос не попал в выборку
+current_metrics = contextvars.ContextVar('request_metrics', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.statements = Counter()
+        self.phases = {'serialize': 0.0, 'render': 0.0}
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обёртка выполнения SQL (connection.execute_wrappers). Ставится на каждое
+    соединение при его создании и ничего не делает вне выборки.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+        metrics.statements[sql] += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(phase):
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.phases[phase] += time.perf_counter() - started
+
+
+class InstrumentedSerializerMixin:
+    """
+    Учитывает время построения serializer.data в фазе serialize.
+    """
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class InstrumentedListSerializer(InstrumentedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Минимальный реестр гистограмм и счётчиков с метками в формате
+    экспозиции Prometheus, без внешних зависимостей.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.help = {}
+
+    def observe(self, name, labels, value, buckets, help_text):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.help.setdefault(name, ('histogram', help_text))
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, labels, help_text, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.help.setdefault(name, ('counter', help_text))
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.help.clear()
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (kind, help_text) in sorted(self.help.items()):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                if kind == 'counter':
+                    for (metric, labels), value in sorted(self.counters.items()):
+                        if metric == name:
+                            lines.append(f'{name}{format_labels(labels)} {value}')
+                    continue
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{format_labels(labels, le=bound)} {cumulative}')
+                    lines.append(f'{name}_bucket{format_labels(labels, le="+Inf")} {histogram.count}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {histogram.sum}')
+                    lines.append(f'{name}_count{format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in pairs) + '}'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Ставится первым в MIDDLEWARE, чтобы общее время включало весь стек.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def sampled(self):
+        rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if view == 'metrics':
+            return response
+        size = None if response.streaming else len(response.content)
+
+        labels = {'view': view, 'method': request.method}
+        registry.inc(
+            'http_requests_sampled_total', {**labels, 'status': str(response.status_code)},
+            'Запросы, попавшие в выборку.',
+        )
+        registry.observe('http_request_duration_seconds', labels, total, DURATION_BUCKETS, 'Общее время запроса.')
+        registry.observe('http_request_db_seconds', labels, metrics.db_time, DURATION_BUCKETS, 'Время SQL-запросов.')
+        registry.observe('http_request_queries', labels, metrics.queries, QUERY_BUCKETS, 'SQL-запросов на запрос.')
+        registry.observe(
+            'http_request_serialize_seconds', labels, metrics.phases['serialize'], DURATION_BUCKETS,
+            'Время построения данных сериализатором.',
+        )
+        registry.observe(
+            'http_request_render_seconds', labels, metrics.phases['render'], DURATION_BUCKETS,
+            'Время рендеринга ответа в JSON.',
+        )
+        if size is not None:
+            registry.observe('http_response_size_bytes', labels, size, SIZE_BUCKETS, 'Размер тела ответа.')
+        duplicates = metrics.duplicates
+        if duplicates:
+            registry.inc('http_request_duplicate_queries_total', labels, 'Повторы одинаковых SQL-запросов.', duplicates)
+            if duplicates >= settings.REQUEST_METRICS_DUPLICATE_THRESHOLD:
+                sql, count = metrics.statements.most_common(1)[0]
+                logger.warning('%s %s: %d повторных SQL-запросов, чаще всего (%d раз): %s',
+                               request.method, view, duplicates, count, sql)
+
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={total * 1000:.2f}',
+                f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries, {duplicates} duplicate"',
+                f"serialize;dur={metrics.phases['serialize'] * 1000:.2f}",
+                f"render;dur={metrics.phases['render'] * 1000:.2f}",
+            ])
+        return response
+
+
+def metrics_view(request):
+    # Без METRICS_AUTH_TOKEN метрики закрыты: в них пути, нагрузка и время ответов
+    token = settings.METRICS_AUTH_TOKEN
+    supplied = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
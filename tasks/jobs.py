@@ -0,0 +1,134 @@
+"""
+Фоновая очередь задач в базе данных, без внешнего брокера.
+
+Задача (Job) ставится в очередь в той же транзакции, что и данные, которые
+она обрабатывает: воркер увидит её только после коммита. Воркеры (команда
+run_jobs) забирают готовые задачи через SELECT ... FOR UPDATE SKIP LOCKED,
+поэтому параллельные воркеры не ждут друг друга и не берут одну задачу
+дважды. Упавшая задача повторяется с экспоненциальной паузой, после
+`max_attempts` попыток остаётся в таблице со статусом failed. Задача,
+воркер которой завис или упал, снова становится доступной через
+JOB_LOCK_TIMEOUT секунд.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Имя задачи -> обработчик, см. register()
+HANDLERS = {}
+
+
+class Handler:
+    def __init__(self, func, name, max_attempts=None, on_failure=None):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.on_failure = on_failure
+
+
+def register(name=None, max_attempts=None, on_failure=None):
+    """
+    Регистрирует функцию как обработчик задач. Функция получает payload
+    именованными аргументами; `on_failure(payload, error)` вызывается, когда
+    попытки закончились.
+    """
+    def decorator(func):
+        HANDLERS[name or func.__name__] = Handler(func, name or func.__name__, max_attempts, on_failure)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    if name not in HANDLERS:
+        raise KeyError(f'Неизвестная фоновая задача: {name}')
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or HANDLERS[name].max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts):
+    """
+    Пауза перед следующей попыткой: экспоненциальная, с ограничением
+    сверху и случайным разбросом, чтобы упавшие вместе задачи не
+    повторялись одновременно.
+    """
+    delay = min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOB_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(worker, limit=1):
+    """
+    Забирает до `limit` готовых задач и помечает их выполняемыми.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_at__lt=stale))
+            .order_by('run_at', 'id')[:limit]
+        )
+        for job in jobs:
+            job.status = Job.RUNNING
+            job.locked_at = now
+            job.locked_by = worker
+            job.attempts += 1
+        Job.objects.bulk_update(jobs, ['status', 'locked_at', 'locked_by', 'attempts'])
+    return jobs
+
+
+def run(job):
+    """
+    Выполняет задачу: при успехе удаляет её, при ошибке планирует повтор
+    или помечает окончательно упавшей.
+    """
+    handler = HANDLERS.get(job.name)
+    try:
+        if handler is None:
+            raise KeyError(f'Неизвестная фоновая задача: {job.name}')
+        handler.func(**job.payload)
+    except Exception as exc:
+        job.last_error = traceback.format_exc()[-5000:]
+        job.locked_at = None
+        job.locked_by = ''
+        if job.attempts < job.max_attempts and handler is not None:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+            logger.warning('Задача %s #%s упала (попытка %s), повтор в %s', job.name, job.pk, job.attempts, job.run_at)
+        else:
+            job.status = Job.FAILED
+            logger.error('Задача %s #%s окончательно упала: %s', job.name, job.pk, exc)
+            if handler is not None and handler.on_failure is not None:
+                handler.on_failure(job.payload, exc)
+        job.save(update_fields=['status', 'run_at', 'locked_at', 'locked_by', 'last_error'])
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(worker, limit=None, stop=None):
+    """
+    Выполняет готовые задачи по одной, пока они есть (не больше `limit`
+    и пока не выставлено событие `stop`), и возвращает число выполненных.
+    """
+    done = 0
+    while (limit is None or done < limit) and not (stop is not None and stop.is_set()):
+        jobs = claim(worker)
+        if not jobs:
+            break
+        run(jobs[0])
+        done += 1
+    return done
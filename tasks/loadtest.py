@@ -0,0 +1,214 @@
+"""
+Нагрузочный прогон REST API: конкурентные клиенты, латентность,
+пропускная способность, SQL-запросы на запрос и прирост RSS процесса,
+обслуживающего запросы, за сценарий.
+Используется командой `manage.py loadtest`.
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+
+# Метрики, которые сравниваются с базовой линией: имя -> True, если больше — хуже
+GATED_METRICS = {
+    'throughput_rps': False,
+    'p50_ms': True,
+    'p95_ms': True,
+    'p99_ms': True,
+    'queries_per_request': True,
+}
+
+
+def percentile(values, fraction):
+    """
+    Перцентиль по методу ближайшего ранга.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def rss_mb():
+    """
+    Текущий (не пиковый) RSS этого процесса в МБ или None, если /proc
+    недоступен. Пиковый ru_maxrss растёт только вверх и после первого
+    тяжёлого сценария не говорит ничего о следующих.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            resident = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class Scenario:
+    def __init__(self, name, method, path, body=None, authenticated=True):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.authenticated = authenticated
+
+    def resolve_path(self, rng):
+        return self.path(rng) if callable(self.path) else self.path
+
+
+class InProcessTransport:
+    """
+    Запросы через django.test.Client в этом же процессе: проходят весь стек
+    middleware и позволяют посчитать SQL-запросы в потоке клиента и память
+    процесса, который их обслуживает.
+    """
+    counts_queries = True
+    measures_memory = True
+
+    def __init__(self, token):
+        self.token = token
+        self.local = threading.local()
+
+    def client(self):
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client(HTTP_HOST=self.host())
+        return self.local.client
+
+    def host(self):
+        # Первый конкретный хост из ALLOWED_HOSTS, чтобы пройти CommonMiddleware
+        for host in settings.ALLOWED_HOSTS:
+            if host != '*' and not host.startswith('.'):
+                return host
+        return 'localhost'
+
+    def request(self, scenario, path):
+        headers = {}
+        if scenario.authenticated:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {self.token}'
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            if scenario.method == 'POST':
+                response = self.client().post(path, scenario.body, content_type='application/json', **headers)
+            else:
+                response = self.client().get(path, **headers)
+        return response.status_code, queries[0]
+
+    def close(self):
+        connection.close()
+
+
+class HTTPTransport:
+    """
+    Запросы к уже запущенному серверу по HTTP (gunicorn/uvicorn).
+    SQL-запросы и память сервера в этом режиме не измеряются.
+    """
+    counts_queries = False
+    measures_memory = False
+
+    def __init__(self, base_url, token):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+
+    def request(self, scenario, path):
+        data = json.dumps(scenario.body).encode() if scenario.body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=scenario.method)
+        request.add_header('Content-Type', 'application/json')
+        if scenario.authenticated:
+            request.add_header('Authorization', f'Bearer {self.token}')
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status, None
+        except urllib.error.HTTPError as exc:
+            return exc.code, None
+
+    def close(self):
+        pass
+
+
+def run_scenario(transport, scenario, requests, concurrency, seed=0):
+    """
+    Выполняет `requests` запросов сценария в `concurrency` потоков и
+    возвращает сводку метрик.
+    """
+    latencies, queries, errors = [], [], [0]
+    lock = threading.Lock()
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(index, count):
+        rng = random.Random(seed + index)
+        local_latencies, local_queries, local_errors = [], [], 0
+        try:
+            for _ in range(count):
+                path = scenario.resolve_path(rng)
+                started = time.perf_counter()
+                status_code, query_count = transport.request(scenario, path)
+                local_latencies.append((time.perf_counter() - started) * 1000)
+                if query_count is not None:
+                    local_queries.append(query_count)
+                if status_code >= 400:
+                    local_errors += 1
+        finally:
+            transport.close()
+        with lock:
+            latencies.extend(local_latencies)
+            queries.extend(local_queries)
+            errors[0] += local_errors
+
+    rss_before = rss_mb() if transport.measures_memory else None
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker, i, count) for i, count in enumerate(per_worker) if count]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    rss_after = rss_mb() if rss_before is not None else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'rss_delta_mb': round(rss_after - rss_before, 1) if rss_after is not None else None,
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Возвращает список регрессий: метрика эндпоинта хуже базовой линии больше,
+    чем на долю `threshold`, или ошибок стало больше. Эндпоинты без базовой
+    линии не проверяются.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if metrics.get('errors', 0) > base.get('errors', 0):
+            regressions.append(f"{name}.errors: {base.get('errors', 0)} -> {metrics['errors']}")
+        for metric, higher_is_worse in GATED_METRICS.items():
+            current, reference = metrics.get(metric), base.get(metric)
+            if current is None or not reference:
+                continue
+            change = (current - reference) / reference
+            if (change > threshold) if higher_is_worse else (-change > threshold):
+                regressions.append(
+                    f'{name}.{metric}: {reference} -> {current} ({change:+.1%})'
+                )
+    return regressions
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tasks.models import Comment, Task
+from tasks.seeding import seed_comments, seed_tasks
+from tasks.transfer import csv_lines, import_ndjson, ndjson_lines
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет потоковый экспорт задач (NDJSON и CSV) и импорт NDJSON: '
+        'время, строк в секунду и пиковую память Python. Импорт выполняется '
+        'с новыми id в транзакции, которая затем откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=100000, help='Задач в таблице (дозаполняется).')
+        parser.add_argument(
+            '--comments', type=int, default=10,
+            help='Комментариев на задачу при дозаполнении данных.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=None, help='Строк на выборку курсора.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Задач в пачке импорта.')
+        parser.add_argument(
+            '--memory', action='store_true',
+            help='Мерить пиковую память через tracemalloc (замедляет замер времени).',
+        )
+
+    def handle(self, *args, **options):
+        missing = options['tasks'] - Task.objects.count()
+        if missing > 0:
+            self.stdout.write(f'Создаю {missing} задач...')
+            seed_comments(seed_tasks(missing), missing * options['comments'])
+        rows = Task.objects.count() + Comment.objects.count()
+        self.stdout.write(f'Задач и комментариев: {rows}')
+
+        fd, path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(fd)
+        try:
+            for name, lines in (('csv', csv_lines), ('ndjson', ndjson_lines)):
+                with open(path, 'wb') as output:
+                    def export():
+                        for line in lines(Task.objects.all(), options['chunk_size']):
+                            output.write(line.encode() if isinstance(line, str) else line)
+                    elapsed, peak = self.measure(export, options['memory'])
+                self.report(f'экспорт {name}', rows, elapsed, peak, os.path.getsize(path))
+
+            # Файл после цикла — выгрузка NDJSON
+            def load():
+                try:
+                    with transaction.atomic(), open(path, 'rb') as stream:
+                        import_ndjson(stream, batch_size=options['batch_size'], new_ids=True)
+                        raise Rollback
+                except Rollback:
+                    pass
+            elapsed, peak = self.measure(load, options['memory'])
+            self.report('импорт ndjson', rows, elapsed, peak)
+        finally:
+            os.remove(path)
+
+    def measure(self, func, memory):
+        if memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            func()
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] if memory else None
+        finally:
+            if memory:
+                tracemalloc.stop()
+        return elapsed, peak
+
+    def report(self, label, rows, elapsed, peak, size=None):
+        line = f'{label:14} {elapsed:8.2f} с  {rows / elapsed:10.0f} строк/с'
+        if size is not None:
+            line += f'  {size / 2 ** 20:8.1f} МиБ'
+        if peak is not None:
+            line += f'  пик памяти {peak / 2 ** 20:.1f} МиБ'
+        self.stdout.write(line)
@@ -0,0 +1,69 @@
+import io
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from tasks.models import Task, Comment
+from tasks.renderers import FastJSONParser, FastJSONRenderer, orjson
+from tasks.seeding import seed_comments, seed_tasks
+from tasks.serializers import TaskSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендеринга и разбора JSON для страницы задач '
+        'с вложенными комментариями и файлами: JSONRenderer/JSONParser DRF '
+        'против FastJSONRenderer/FastJSONParser.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=500, help='Задач в ответе.')
+        parser.add_argument(
+            '--comments', type=int, default=10,
+            help='Комментариев на задачу при дозаполнении данных.',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson не установлен: FastJSONRenderer работает через json.'))
+        missing = options['tasks'] - Task.objects.count()
+        if missing > 0:
+            self.stdout.write(f'Создаю {missing} задач...')
+            seed_comments(seed_tasks(missing), missing * options['comments'])
+
+        queryset = Task.objects.for_serializer(TaskSerializer, limit=settings.TASK_NESTED_LIMIT)
+        request = Request(APIRequestFactory().get('/api/tasks/'))
+        data = TaskSerializer(
+            queryset.order_by('-created_at')[:options['tasks']], many=True, context={'request': request},
+        ).data
+
+        baseline, fast = JSONRenderer().render(data), FastJSONRenderer().render(data)
+        if baseline != fast:
+            raise CommandError('Вывод FastJSONRenderer отличается от JSONRenderer.')
+        self.stdout.write(
+            f"Ответ: {len(data)} задач, {Comment.objects.count()} комментариев в БД, {len(baseline)} байт"
+        )
+
+        self.stdout.write(f"{'operation':<10}{'implementation':<20}{'median ms':>12}{'max ms':>12}")
+        cases = [
+            ('render', 'JSONRenderer', lambda: JSONRenderer().render(data)),
+            ('render', 'FastJSONRenderer', lambda: FastJSONRenderer().render(data)),
+            ('parse', 'JSONParser', lambda: JSONParser().parse(io.BytesIO(baseline))),
+            ('parse', 'FastJSONParser', lambda: FastJSONParser().parse(io.BytesIO(baseline))),
+        ]
+        for operation, name, func in cases:
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f'{operation:<10}{name:<20}{statistics.median(timings):>12.2f}{max(timings):>12.2f}'
+            )
@@ -0,0 +1,58 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework import filters
+from rest_framework.request import Request
+
+from tasks.filters import TaskSearchFilter
+from tasks.models import Task
+from tasks.seeding import seed_tasks
+from tasks.views import TaskViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время поиска задач через стандартный SearchFilter (ILIKE) '
+        'и полнотекстовый TaskSearchFilter.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks', type=int, default=1_000_000,
+            help='Дозаполнить таблицу задач до этого количества перед замером.',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument(
+            '--query', action='append', dest='queries',
+            help='Поисковый запрос; можно указать несколько раз.',
+        )
+
+    def handle(self, *args, **options):
+        missing = options['tasks'] - Task.objects.count()
+        if missing > 0:
+            self.stdout.write(f'Создаю {missing} задач...')
+            seed_tasks(missing)
+
+        queries = options['queries'] or ['отчёт', 'миграция базы', 'deploy review', 'индек']
+        backends = [('SearchFilter', filters.SearchFilter()), ('TaskSearchFilter', TaskSearchFilter())]
+        view = TaskViewSet()
+        # Как в API: по умолчанию список отсортирован по дате создания
+        base_queryset = Task.objects.order_by('-created_at')
+        factory = RequestFactory()
+
+        self.stdout.write(f"{'query':<24}{'backend':<20}{'median ms':>12}{'max ms':>12}")
+        for text in queries:
+            request = Request(factory.get('/api/tasks/', {'search': text}))
+            for name, backend in backends:
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    queryset = backend.filter_queryset(request, base_queryset, view)
+                    list(queryset[:options['page_size']])
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(
+                    f'{text:<24}{name:<20}{statistics.median(timings):>12.1f}{max(timings):>12.1f}'
+                )
@@ -0,0 +1,90 @@
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from tasks.models import Task
+from tasks.seeding import seed_comments, seed_tasks
+from tasks.serializers import TaskSerializer
+from tasks.values import TaskValuesSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает TaskSerializer и values-режим (TaskValuesSerializer) на '
+        'странице задач: время выборки и построения ответа на строку и пиковую память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=500, help='Задач на странице.')
+        parser.add_argument(
+            '--comments', type=int, default=10,
+            help='Комментариев на задачу при дозаполнении данных.',
+        )
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        missing = options['tasks'] - Task.objects.count()
+        if missing > 0:
+            self.stdout.write(f'Создаю {missing} задач...')
+            seed_comments(seed_tasks(missing), missing * options['comments'])
+
+        size = options['tasks']
+        request = Request(APIRequestFactory().get('/api/tasks/'))
+        context = {'request': request}
+        queryset = Task.objects.for_serializer(
+            TaskSerializer, limit=settings.TASK_NESTED_LIMIT
+        ).order_by('-created_at', '-id')
+
+        # Каждая реализация: (выборка из БД, построение ответа по выбранному)
+        def model_fetch():
+            return list(queryset[:size])
+
+        def model_build(instances):
+            return TaskSerializer(instances, many=True, context=context).data
+
+        def values_fetch():
+            serializer = TaskValuesSerializer(context)
+            rows = list(serializer.get_queryset(queryset)[:size])
+            serializer.load_nested(rows)
+            return serializer, rows
+
+        def values_build(fetched):
+            serializer, rows = fetched
+            return serializer.build(rows)
+
+        cases = (
+            ('TaskSerializer', model_fetch, model_build),
+            ('TaskValuesSerializer', values_fetch, values_build),
+        )
+        renderer = JSONRenderer()
+        outputs = [renderer.render(build(fetch())) for _, fetch, build in cases]
+        if outputs[0] != outputs[1]:
+            raise CommandError('Вывод values-режима отличается от TaskSerializer.')
+
+        self.stdout.write(
+            f"{'serializer':<22}{'fetch µs/row':>14}{'build µs/row':>14}{'total ms':>10}{'peak KiB':>10}"
+        )
+        for name, fetch, build in cases:
+            fetch_timings, build_timings = [], []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                fetched = fetch()
+                fetched_at = time.perf_counter()
+                build(fetched)
+                fetch_timings.append(fetched_at - started)
+                build_timings.append(time.perf_counter() - fetched_at)
+            tracemalloc.start()
+            build(fetch())
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            fetch_time, build_time = statistics.median(fetch_timings), statistics.median(build_timings)
+            self.stdout.write(
+                f'{name:<22}{fetch_time / size * 1e6:>14.1f}{build_time / size * 1e6:>14.1f}'
+                f'{(fetch_time + build_time) * 1000:>10.2f}{peak / 1024:>10.0f}'
+            )
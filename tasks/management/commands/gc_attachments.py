@@ -0,0 +1,86 @@
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.models import File
+
+SHARD_RE = re.compile(r'^[0-9a-f]{2}$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет блобы вложений и миниатюр, на которые не ссылается ни одна строка File, '
+        'и брошенные временные файлы загрузок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-seconds', type=int, default=settings.ATTACHMENT_GC_GRACE_SECONDS,
+            help='Не трогать файлы моложе этого возраста.',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        deadline = time.time() - options['grace_seconds']
+        removed = kept = 0
+        # Блобы вложений и их миниатюр лежат в разных каталогах хранилища
+        for field_name in ('file', 'thumbnail'):
+            field_removed, field_kept = self.collect(File._meta.get_field(field_name), deadline, options['dry_run'])
+            removed += field_removed
+            kept += field_kept
+
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{action}: {removed}, используется: {kept}'))
+
+    def collect(self, field, deadline, dry_run):
+        """
+        Удаляет блобы каталога `field.upload_to`, на которые не ссылается
+        поле `field` ни одной строки File. Возвращает (удалено, используется).
+        """
+        storage = field.storage
+        root = field.upload_to.strip('/')
+        removed = kept = 0
+
+        for directory, names in self.iter_shards(storage, root):
+            candidates = {}
+            for filename in names:
+                name = f'{directory}/{filename}'
+                if not storage.is_blob(name):
+                    continue
+                if os.path.getmtime(storage.path(name)) < deadline:
+                    candidates[name] = filename
+            referenced = set(
+                File.objects.filter(**{f'{field.name}__in': candidates}).values_list(field.name, flat=True)
+            )
+            for name in candidates:
+                if name in referenced:
+                    kept += 1
+                    continue
+                removed += 1
+                self.stdout.write(f'orphan: {name}')
+                if not dry_run:
+                    storage.delete(name)
+
+        # Временные файлы оборванных сохранений в хранилище
+        if storage.exists(root):
+            for filename in storage.listdir(root)[1]:
+                name = f'{root}/{filename}'
+                if filename.startswith('.upload-') and os.path.getmtime(storage.path(name)) < deadline:
+                    removed += 1
+                    if not dry_run:
+                        storage.delete(name)
+        return removed, kept
+
+    def iter_shards(self, storage, root):
+        if not storage.exists(root):
+            return
+        for first in storage.listdir(root)[0]:
+            if not SHARD_RE.match(first):
+                continue
+            for second in storage.listdir(f'{root}/{first}')[0]:
+                if SHARD_RE.match(second):
+                    directory = f'{root}/{first}/{second}'
+                    yield directory, storage.listdir(directory)[1]
@@ -0,0 +1,52 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from tasks.transfer import InvalidRow, import_ndjson
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует задачи с комментариями из NDJSON в формате '
+        '/api/tasks/export/: пачками через COPY (PostgreSQL) или executemany.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON или "-" для stdin.')
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.IMPORT_BATCH_SIZE,
+            help='Задач в одной транзакции.',
+        )
+        parser.add_argument(
+            '--new-ids', action='store_true',
+            help='Выдать задачам новые id (например, чтобы скопировать выгрузку в ту же базу).',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(tasks, comments):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {tasks} задач, {comments} комментариев, {tasks / elapsed:.0f} задач/с')
+
+        stream = sys.stdin.buffer if options['path'] == '-' else open(options['path'], 'rb')
+        try:
+            tasks, comments = import_ndjson(
+                stream, batch_size=options['batch_size'], new_ids=options['new_ids'],
+                progress=progress if options['verbosity'] > 1 else None,
+            )
+        except InvalidRow as exc:
+            raise CommandError(f'Некорректные данные, {exc}')
+        except IntegrityError as exc:
+            raise CommandError(f'Конфликт при вставке (задача с таким id уже есть? см. --new-ids): {exc}')
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        elapsed = time.perf_counter() - started
+        rate = (tasks + comments) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано задач: {tasks}, комментариев: {comments} за {elapsed:.1f} с ({rate:.0f} строк/с)'
+        ))
@@ -0,0 +1,60 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+TABLES_SQL = """
+    SELECT relname, seq_scan, seq_tup_read, COALESCE(idx_scan, 0), n_live_tup
+    FROM pg_stat_user_tables
+    WHERE relname = ANY(%s)
+    ORDER BY relname
+"""
+
+INDEXES_SQL = """
+    SELECT relname, indexrelname, idx_scan, idx_tup_read, idx_tup_fetch,
+           pg_size_pretty(pg_relation_size(indexrelid))
+    FROM pg_stat_user_indexes
+    WHERE relname = ANY(%s)
+    ORDER BY relname, idx_scan DESC
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает использование индексов (pg_stat_user_indexes) и долю '
+        'последовательных сканирований по таблицам приложения tasks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError('Статистика индексов доступна только для PostgreSQL.')
+
+        tables = [model._meta.db_table for model in apps.get_app_config('tasks').get_models()]
+        with connection.cursor() as cursor:
+            cursor.execute(TABLES_SQL, [tables])
+            table_rows = cursor.fetchall()
+            cursor.execute(INDEXES_SQL, [tables])
+            index_rows = cursor.fetchall()
+
+        self.stdout.write('Таблицы:')
+        self.stdout.write(f"{'table':<24}{'rows':>12}{'seq_scan':>12}{'idx_scan':>12}{'seq %':>8}")
+        for table, seq_scan, seq_tup_read, idx_scan, live in table_rows:
+            total = seq_scan + idx_scan
+            ratio = 100.0 * seq_scan / total if total else 0.0
+            line = f'{table:<24}{live:>12}{seq_scan:>12}{idx_scan:>12}{ratio:>7.1f}%'
+            # Большая доля seq scan на непустой таблице — повод смотреть EXPLAIN
+            if live > 10000 and ratio > 10:
+                line = self.style.WARNING(line)
+            self.stdout.write(line)
+
+        self.stdout.write('')
+        self.stdout.write('Индексы:')
+        self.stdout.write(f"{'table':<24}{'index':<36}{'scans':>12}{'tup_read':>12}{'size':>10}")
+        for table, index, scans, tup_read, tup_fetch, size in index_rows:
+            line = f'{table:<24}{index:<36}{scans:>12}{tup_read:>12}{size:>10}'
+            if scans == 0:
+                line = self.style.WARNING(line + '  (не используется)')
+            self.stdout.write(line)
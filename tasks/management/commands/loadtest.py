@@ -0,0 +1,148 @@
+import json
+import secrets
+from contextlib import nullcontext
+from urllib.parse import quote
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from tasks.cache import get_cache
+from tasks.loadtest import (
+    HTTPTransport, InProcessTransport, Scenario, compare_with_baseline, run_scenario,
+)
+from tasks.models import Task, Comment
+from tasks.seeding import STATUS_WEIGHTS, WORDS, seed_comments, seed_tasks
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон API конкурентными клиентами: пропускная способность, '
+        'p50/p95/p99, SQL-запросы на запрос и пиковый RSS. Сравнивает результат '
+        'с JSON-базовой линией и завершается ошибкой при регрессии. Запросы идут '
+        'от временного пользователя со случайными именем и паролем, он удаляется '
+        'после прогона.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks', type=int, default=1_000_000,
+            help='Дозаполнить таблицу задач до этого количества перед прогоном.',
+        )
+        parser.add_argument(
+            '--comments', type=int, default=10_000_000,
+            help='Дозаполнить таблицу комментариев до этого количества.',
+        )
+        parser.add_argument('--requests', type=int, default=500, help='Запросов на сценарий.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Число параллельных клиентов.')
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='Запустить только указанные сценарии; можно указать несколько раз.',
+        )
+        parser.add_argument(
+            '--base-url',
+            help='Адрес запущенного сервера. Без него запросы идут в этом процессе через тестовый клиент.',
+        )
+        parser.add_argument('--output', help='Сохранить результаты в JSON (новая базовая линия).')
+        parser.add_argument('--baseline', help='JSON-базовая линия для сравнения.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.10,
+            help='Допустимое ухудшение метрики относительно базовой линии (доля).',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.seed_data(options)
+        password = secrets.token_urlsafe(16)
+        user = User.objects.create_user(username=f'loadtest-{secrets.token_hex(8)}', password=password)
+        try:
+            self.run(user, password, options)
+        finally:
+            user.delete()
+
+    def run(self, user, password, options):
+        token = str(RefreshToken.for_user(user).access_token)
+        if options['base_url']:
+            transport = HTTPTransport(options['base_url'], token)
+        else:
+            transport = InProcessTransport(token)
+
+        scenarios = self.build_scenarios(user.username, password)
+        if options['scenarios']:
+            unknown = set(options['scenarios']) - {s.name for s in scenarios}
+            if unknown:
+                raise CommandError(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+            scenarios = [s for s in scenarios if s.name in options['scenarios']]
+
+        results = {}
+        # Замеряется пропускная способность, а не лимиты: в этом процессе
+        # ограничения частоты и одновременности (todo_project/throttling.py)
+        # отключены, у запущенного сервера (--base-url) действуют как есть
+        limits = nullcontext() if options['base_url'] else override_settings(
+            THROTTLE_BUCKETS={}, MAX_CONCURRENT_REQUESTS=0, MAX_CONCURRENT_REQUESTS_PER_CLIENT=0,
+        )
+        with limits:
+            self.stdout.write(
+                f"{'scenario':<20}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+                f"{'queries':>10}{'errors':>8}{'rss +MB':>10}"
+            )
+            for scenario in scenarios:
+                # Каждый сценарий стартует с холодным кэшем ответов, иначе замеры
+                # зависят от порядка сценариев
+                get_cache().clear()
+                metrics = run_scenario(
+                    transport, scenario, options['requests'], options['concurrency'], seed=options['seed'],
+                )
+                results[scenario.name] = metrics
+                queries, rss = metrics['queries_per_request'], metrics['rss_delta_mb']
+                self.stdout.write(
+                    f"{scenario.name:<20}{metrics['throughput_rps']:>10.1f}{metrics['p50_ms']:>10.1f}"
+                    f"{metrics['p95_ms']:>10.1f}{metrics['p99_ms']:>10.1f}"
+                    f"{'-' if queries is None else queries:>10}{metrics['errors']:>8}{'-' if rss is None else rss:>10}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2, sort_keys=True)
+            self.stdout.write(f"Результаты сохранены в {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as fh:
+                baseline = json.load(fh)
+            regressions = compare_with_baseline(results, baseline, options['threshold'])
+            if regressions:
+                raise CommandError('Регрессия производительности:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий относительно базовой линии нет.'))
+
+    def seed_data(self, options):
+        missing = options['tasks'] - Task.objects.count()
+        if missing > 0:
+            self.stdout.write(f'Создаю {missing} задач...')
+            seed_tasks(missing, seed=options['seed'])
+        missing = options['comments'] - Comment.objects.count()
+        if missing > 0:
+            self.stdout.write(f'Создаю {missing} комментариев...')
+            task_ids = list(Task.objects.values_list('id', flat=True)[:100_000])
+            seed_comments(task_ids, missing, seed=options['seed'])
+
+    def build_scenarios(self, username, password):
+        task_ids = [str(pk) for pk in Task.objects.values_list('id', flat=True)[:1000]]
+        statuses = list(STATUS_WEIGHTS)
+        search_words = list(WORDS)
+
+        def task_detail(rng):
+            return f'/api/tasks/{rng.choice(task_ids)}/' if task_ids else '/api/tasks/'
+
+        return [
+            Scenario('tasks_list', 'GET', '/api/tasks/'),
+            Scenario('tasks_status', 'GET', lambda rng: f'/api/tasks/?status={quote(rng.choice(statuses))}'),
+            Scenario('tasks_ordering', 'GET', '/api/tasks/?ordering=status'),
+            Scenario('tasks_search', 'GET', lambda rng: f'/api/tasks/?search={quote(rng.choice(search_words))}'),
+            Scenario('task_detail', 'GET', task_detail),
+            Scenario('comments_list', 'GET', '/api/comments/'),
+            Scenario('files_list', 'GET', '/api/files/'),
+            Scenario(
+                'login', 'POST', '/auth/login/', authenticated=False,
+                body={'username': username, 'password': password},
+            ),
+        ]
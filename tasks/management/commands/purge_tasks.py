@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.utils import timezone
+
+from tasks.deletion import purge_tasks
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет задачи по фильтру вместе с комментариями и файлами: пачками, '
+        'без загрузки связанных строк в память. Блобы файлов освобождает '
+        'фоновая задача release_blobs (run_jobs).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', choices=[value for value, _ in Task.STATUS_CHOICES])
+        parser.add_argument(
+            '--older-than-days', type=int,
+            help='Только задачи, не менявшиеся (last_activity_at) столько дней.',
+        )
+        parser.add_argument('--batch-size', type=int, default=100, help='Задач в одной пачке.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.DELETE_CHUNK_SIZE,
+            help='Комментариев или файлов в одном DELETE.',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['status'] is None and options['older_than_days'] is None:
+            raise CommandError('Укажите --status и/или --older-than-days.')
+        queryset = Task.objects.all()
+        if options['status'] is not None:
+            queryset = queryset.filter(status=options['status'])
+        if options['older_than_days'] is not None:
+            queryset = queryset.filter(
+                last_activity_at__lt=timezone.now() - timedelta(days=options['older_than_days'])
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Будет удалено задач: {queryset.count()}'))
+            return
+        purged = purge_tasks(queryset, batch_size=options['batch_size'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено задач: {purged}'))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tasks import counters
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет денормализованные счётчики задач (комментарии, файлы, '
+        'последняя активность) и сводку по статусам с данными и исправляет '
+        'расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Задач в одной транзакции.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        fix = not options['dry_run']
+        broken = checked = 0
+        last_pk = None
+        # Keyset-обход по первичному ключу: каждая пачка — короткая транзакция
+        while True:
+            queryset = Task.objects.order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            task_ids = list(queryset.values_list('pk', flat=True)[:options['batch_size']])
+            if not task_ids:
+                break
+            with transaction.atomic():
+                for pk in counters.repair_tasks(task_ids, fix=fix):
+                    broken += 1
+                    self.stdout.write(f'task: {pk}')
+            checked += len(task_ids)
+            last_pk = task_ids[-1]
+
+        with transaction.atomic():
+            statuses = counters.repair_status_summary(fix=fix)
+        for status in statuses:
+            self.stdout.write(f'status: {status}')
+
+        action = 'Будет исправлено' if options['dry_run'] else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено задач: {checked}. {action} задач: {broken}, статусов: {len(statuses)}'
+        ))
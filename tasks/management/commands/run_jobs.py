@@ -0,0 +1,151 @@
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+from tasks import jobs
+
+logger = logging.getLogger('tasks.jobs')
+
+
+class Command(BaseCommand):
+    help = (
+        'Воркер фоновой очереди (tasks/jobs.py): забирает готовые задачи из '
+        'таблицы Job и выполняет их в пуле процессов и потоков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Число процессов-воркеров.')
+        parser.add_argument('--threads', type=int, default=1, help='Потоков в каждом процессе.')
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выполнить готовые задачи и завершиться, когда очередь опустеет.',
+        )
+
+    def handle(self, *args, **options):
+        stop = multiprocessing.Event()
+        # SIGTERM/SIGINT: воркеры дорабатывают текущую задачу и выходят
+        previous = {signum: signal.signal(signum, lambda *_: stop.set()) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            done = self.run_workers(options, stop)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
+
+    def run_workers(self, options, stop):
+        if options['processes'] == 1:
+            done = run_threads(options['threads'], options['poll_interval'], options['burst'], stop)
+        else:
+            # Соединения родителя не должны достаться дочерним процессам
+            connections.close_all()
+            results = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(
+                    target=run_process,
+                    args=(index, options['threads'], options['poll_interval'], options['burst'], stop, results),
+                )
+                for index in range(options['processes'])
+            ]
+            for process in processes:
+                process.start()
+            done, failed = self.collect(processes, results, options['poll_interval'], stop)
+            for process in processes:
+                process.join()
+            if failed:
+                raise CommandError(
+                    'Процессы воркеров завершились аварийно: '
+                    + ', '.join(f'pid {process.pid}, код {process.exitcode}' for process in failed)
+                )
+        return done
+
+    def collect(self, processes, results, poll_interval, stop):
+        """
+        Собирает число выполненных задач от процессов. Процесс, умерший без
+        результата, не блокирует родителя: он считается упавшим, а остальные
+        останавливаются, чтобы супервизор перезапустил команду целиком.
+        Возвращает (выполнено задач, упавшие процессы).
+        """
+        reported, failed = {}, []
+        while len(reported) < len(processes):
+            try:
+                index, count = results.get(timeout=poll_interval)
+                reported[index] = count
+                continue
+            except queue.Empty:
+                pass
+            dead = [index for index, process in enumerate(processes) if index not in reported and not process.is_alive()]
+            if not dead:
+                continue
+            # Результат, отправленный перед нормальным выходом, уже в очереди
+            while True:
+                try:
+                    index, count = results.get_nowait()
+                except queue.Empty:
+                    break
+                reported[index] = count
+            for index in dead:
+                if index not in reported:
+                    process = processes[index]
+                    logger.error('Процесс воркера %s завершился с кодом %s без результата', process.pid, process.exitcode)
+                    failed.append(process)
+                    reported[index] = 0
+                    stop.set()
+        return sum(reported.values()), failed
+
+
+def run_process(index, threads, poll_interval, burst, stop, results):
+    results.put((index, run_threads(threads, poll_interval, burst, stop)))
+
+
+def run_threads(threads, poll_interval, burst, stop=None):
+    """
+    Запускает `threads` циклов воркера в текущем процессе и возвращает
+    число выполненных задач.
+    """
+    stop = stop or threading.Event()
+    counts = []
+
+    def loop(number):
+        worker = f'{socket.gethostname()}:{os.getpid()}:{number}'
+        done = 0
+        try:
+            while not stop.is_set():
+                try:
+                    ran = jobs.run_pending(worker, stop=stop)
+                except DatabaseError:
+                    # Например, потеряно соединение: пробуем снова после паузы
+                    logger.exception('Воркер %s: ошибка БД', worker)
+                    connections.close_all()
+                    stop.wait(poll_interval)
+                    continue
+                done += ran
+                if not ran:
+                    if burst:
+                        break
+                    stop.wait(poll_interval)
+        finally:
+            counts.append(done)
+            # У каждого потока своё соединение с БД
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    if threads == 1:
+        loop(0)
+    else:
+        pool = [threading.Thread(target=loop, args=(number,), daemon=True) for number in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+    return sum(counts)
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.18 on 2026-10-16 22:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0001_initial"),
+    ]
+
+    # Составные индексы создаются раньше, чем удаляются одиночные индексы
+    # по task_id, чтобы выборки комментариев и файлов задачи не остались без
+    # индекса на время миграции.
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["task", "created_at"], name="comment_task_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="file",
+            index=models.Index(
+                fields=["task", "uploaded_at"], name="file_task_uploaded_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["status", "created_at"], name="task_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(fields=["created_at", "id"], name="task_created_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(fields=["updated_at"], name="task_updated_idx"),
+        ),
+        migrations.AlterField(
+            model_name="comment",
+            name="task",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="comments",
+                to="tasks.task",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="file",
+            name="task",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="files",
+                to="tasks.task",
+            ),
+        ),
+    ]
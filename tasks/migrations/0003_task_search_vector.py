@@ -0,0 +1,76 @@
+# Generated by Django 4.2.18 on 2026-10-16 22:29
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Вектор строится по двум конфигурациям: заголовки в основном на русском,
+# но встречаются и английские термины. Заголовок весит больше описания.
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('russian', coalesce({row}.title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce({row}.title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce({row}.description, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce({row}.description, '')), 'B')
+"""
+
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE OR REPLACE FUNCTION tasks_task_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := %s;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """ % SEARCH_VECTOR_SQL.format(row="NEW"),
+    """
+    CREATE TRIGGER tasks_task_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, search_vector ON tasks_task
+    FOR EACH ROW EXECUTE FUNCTION tasks_task_search_vector_update()
+    """,
+    "UPDATE tasks_task SET search_vector = %s"
+    % SEARCH_VECTOR_SQL.format(row="tasks_task"),
+    "CREATE INDEX task_search_vector_idx ON tasks_task USING gin (search_vector)",
+    # Выражение совпадает с тем, что Django генерирует для __icontains
+    "CREATE INDEX task_title_trgm_idx ON tasks_task "
+    "USING gin ((UPPER(title::text)) gin_trgm_ops)",
+    "CREATE INDEX task_description_trgm_idx ON tasks_task "
+    "USING gin ((UPPER(description::text)) gin_trgm_ops)",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS task_description_trgm_idx",
+    "DROP INDEX IF EXISTS task_title_trgm_idx",
+    "DROP INDEX IF EXISTS task_search_vector_idx",
+    "DROP TRIGGER IF EXISTS tasks_task_search_vector_trigger ON tasks_task",
+    "DROP FUNCTION IF EXISTS tasks_task_search_vector_update()",
+]
+
+
+def run_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0002_hot_column_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(
+            run_postgresql(FORWARD_SQL), run_postgresql(REVERSE_SQL)
+        ),
+    ]
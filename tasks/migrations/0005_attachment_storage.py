@@ -0,0 +1,25 @@
+# Generated by Django 4.2.18 on 2026-10-16 22:35
+
+from django.db import migrations, models
+import tasks.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0004_uploadsession"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="file",
+            name="file",
+            field=models.FileField(
+                storage=tasks.storage.get_attachment_storage, upload_to="task_files/"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="file",
+            index=models.Index(fields=["file"], name="file_file_idx"),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.18 on 2026-10-16 22:56
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def child_subquery(model, aggregate):
+    return Subquery(
+        model.objects.filter(task=OuterRef("pk"))
+        .order_by()
+        .values("task")
+        .annotate(value=aggregate)
+        .values("value")
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    Task = apps.get_model("tasks", "Task")
+    Comment = apps.get_model("tasks", "Comment")
+    File = apps.get_model("tasks", "File")
+    TaskStatusSummary = apps.get_model("tasks", "TaskStatusSummary")
+    Task.objects.update(
+        comments_count=Coalesce(
+            child_subquery(Comment, Count("pk")), 0, output_field=IntegerField()
+        ),
+        files_count=Coalesce(
+            child_subquery(File, Count("pk")), 0, output_field=IntegerField()
+        ),
+        last_activity_at=Greatest(
+            F("updated_at"),
+            Coalesce(child_subquery(Comment, Max("created_at")), F("updated_at")),
+            Coalesce(child_subquery(File, Max("uploaded_at")), F("updated_at")),
+        ),
+    )
+    totals = dict(
+        Task.objects.order_by()
+        .values("status")
+        .annotate(total=Count("pk"))
+        .values_list("status", "total")
+    )
+    statuses = [status for status, _ in Task._meta.get_field("status").choices]
+    TaskStatusSummary.objects.bulk_create(
+        TaskStatusSummary(status=status, count=totals.get(status, 0))
+        for status in dict.fromkeys([*statuses, *totals])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0005_attachment_storage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskStatusSummary",
+            fields=[
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("новая", "New"),
+                            ("в работе", "In Progress"),
+                            ("выполнена", "Completed"),
+                            ("отменена", "Cancelled"),
+                        ],
+                        max_length=20,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("count", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="comments_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="files_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="last_activity_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.18 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0009_task_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeLogHorizon",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("txid", models.BigIntegerField()),
+                ("entry_id", models.BigIntegerField()),
+                ("pruned_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        # Прежние записи закоммичены давно: txid 0 ставит их перед любым
+        # новым токеном
+        migrations.AddField(
+            model_name="changelogentry",
+            name="txid",
+            field=models.BigIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="changelogentry",
+            index=models.Index(fields=["txid", "id"], name="changelog_txid_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="changelogentry",
+            index=models.Index(fields=["changed_at"], name="changelog_changed_idx"),
+        ),
+    ]
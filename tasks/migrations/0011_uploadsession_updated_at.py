@@ -0,0 +1,28 @@
+# Generated by Django 4.2.18 on 2026-10-17 09:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0010_changelog_txid"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadsession",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="uploadsession",
+            index=models.Index(
+                fields=["updated_at"], name="upload_session_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.18 on 2026-10-17 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tasks", "0011_uploadsession_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="file",
+            name="original_name",
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
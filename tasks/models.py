@@ -1,7 +1,25 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, router, transaction
+from django.utils import timezone
+import os
 import uuid
 
-class Task(models.Model):
+from .querysets import TaskManager
+from .storage import get_attachment_storage
+
+class AtomicSaveMixin:
+    """
+    save() в транзакции: сигналы, поддерживающие счётчики (tasks/counters.py),
+    выполняются в ней же.
+    """
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class Task(AtomicSaveMixin, models.Model):
     STATUS_CHOICES = [
         ('новая', 'New'),
         ('в работе', 'In Progress'),
@@ -15,19 +33,235 @@ class Task(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='новая')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Заполняется триггером в PostgreSQL (миграция 0003), используется поиском
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Денормализованные счётчики, обновляются атомарно в tasks/counters.py
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    files_count = models.PositiveIntegerField(default=0, editable=False)
+    # Последнее изменение задачи или добавление комментария/файла
+    last_activity_at = models.DateTimeField(auto_now=True)
+    # Растёт при каждом изменении задачи; проверяется переходами статуса
+    # (tasks/transitions.py) для оптимистичной блокировки
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Задача удалена и ждёт фоновой очистки (tasks/deletion.py): Task.objects
+    # её уже не видит
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = TaskManager()
+
+    class Meta:
+        indexes = [
+            # Фильтр ?status=... с сортировкой по дате создания
+            models.Index(fields=['status', 'created_at'], name='task_status_created_idx'),
+            # Keyset-пагинация по умолчанию: (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='task_created_id_idx'),
+            models.Index(fields=['updated_at'], name='task_updated_idx'),
+            # Поиск задач, очистка которых не завершилась
+            models.Index(
+                fields=['deleted_at'], name='task_deleted_idx', condition=models.Q(deleted_at__isnull=False)
+            ),
+        ]
+
+    # Колонки, которые меняются только UPDATE ... SET x = x + n
+    COUNTER_FIELDS = ('comments_count', 'files_count')
+
+    # Разрешённые переходы статуса: статус -> куда из него можно перейти
+    TRANSITIONS = {
+        'новая': ('в работе', 'отменена'),
+        'в работе': ('новая', 'выполнена', 'отменена'),
+        'выполнена': ('в работе',),
+        'отменена': ('новая',),
+    }
 
     def __str__(self):
         return self.title
 
-class Comment(models.Model):
-    task = models.ForeignKey(Task, related_name='comments', on_delete=models.CASCADE)
+    def save(self, *args, **kwargs):
+        # Не перезаписываем счётчики значениями, прочитанными вместе с задачей:
+        # их могли изменить параллельно добавленные комментарии и файлы
+        if not self._state.adding:
+            if kwargs.get('update_fields') is None:
+                deferred = self.get_deferred_fields()
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.COUNTER_FIELDS
+                    and field.attname not in deferred
+                ]
+            # Новую версию выставляет сигнал pre_save под блокировкой строки
+            if kwargs['update_fields'] and 'version' not in kwargs['update_fields']:
+                kwargs['update_fields'] = [*kwargs['update_fields'], 'version']
+        super().save(*args, **kwargs)
+
+
+class TaskStatusSummary(models.Model):
+    """
+    Количество задач в каждом статусе, чтобы не считать GROUP BY по всей
+    таблице. Поддерживается tasks/counters.py.
+    """
+    status = models.CharField(max_length=20, primary_key=True, choices=Task.STATUS_CHOICES)
+    count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.status}: {self.count}'
+
+class Comment(AtomicSaveMixin, models.Model):
+    # Отдельный индекс по task_id не нужен: его покрывает составной индекс ниже
+    task = models.ForeignKey(Task, related_name='comments', on_delete=models.CASCADE, db_index=False)
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'created_at'], name='comment_task_created_idx'),
+        ]
+
     def __str__(self):
         return f'Comment on {self.task.title}'
 
-class File(models.Model):
-    task = models.ForeignKey(Task, related_name='files', on_delete=models.CASCADE)
-    file = models.FileField(upload_to='task_files/')
+class File(AtomicSaveMixin, models.Model):
+    PROCESSING_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('infected', 'Infected'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.ForeignKey(Task, related_name='files', on_delete=models.CASCADE, db_index=False)
+    # Одинаковое содержимое хранится один раз (tasks/storage.py)
+    file = models.FileField(upload_to='task_files/', storage=get_attachment_storage)
+    # Имя в хранилище — хэш содержимого, исходное имя нужно для скачивания
+    original_name = models.CharField(max_length=255, blank=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Заполняются фоновой обработкой после загрузки (tasks/processing.py)
+    processing_status = models.CharField(
+        max_length=20, choices=PROCESSING_CHOICES, default='pending', editable=False
+    )
+    sha256 = models.CharField(max_length=64, blank=True, editable=False)
+    extracted_text = models.TextField(blank=True, editable=False)
+    thumbnail = models.FileField(
+        upload_to='task_thumbnails/', storage=get_attachment_storage, blank=True, editable=False
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'uploaded_at'], name='file_task_uploaded_idx'),
+            # Подсчёт ссылок на блоб хранилища
+            models.Index(fields=['file'], name='file_file_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Новый, ещё не сохранённый в хранилище файл: запоминаем его имя
+        if self.file and not self.file._committed:
+            self.original_name = os.path.basename(self.file.name)[:255]
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'file' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'original_name'}
+        super().save(*args, **kwargs)
+
+
+class Job(models.Model):
+    """
+    Задача фоновой очереди (tasks/jobs.py). Выполненные задачи удаляются,
+    в таблице остаются ожидающие, выполняемые и окончательно упавшие.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Не раньше этого времени (отложенный запуск и паузы между попытками)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Выборка готовых к запуску задач воркером
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+
+class UploadSession(models.Model):
+    """
+    Незавершённая загрузка файла частями. Принятые байты лежат во временном
+    файле (settings.TASK_UPLOAD_TEMP_DIR), `offset` — сколько уже принято.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.ForeignKey(Task, related_name='upload_sessions', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    # Ожидаемая клиентом контрольная сумма SHA-256 (необязательно)
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Последняя принятая часть; брошенные сессии удаляет tasks/uploads.py
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['updated_at'], name='upload_session_updated_idx')]
+
+    def __str__(self):
+        return f'Upload {self.filename} ({self.offset}/{self.size})'
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Запись журнала изменений задач, комментариев и файлов для синхронизации
+    клиентов (/api/tasks/changes/). Токен синхронизации — пара (txid, id),
+    см. tasks/changelog.py; удаления записываются как tombstone с
+    action='delete'.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, 'Created or updated'),
+        (DELETE, 'Deleted'),
+    ]
+    KIND_CHOICES = [
+        ('task', 'Task'),
+        ('comment', 'Comment'),
+        ('file', 'File'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.CharField(max_length=36)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    # Id транзакции PostgreSQL, записавшей строку (pg_current_xact_id())
+    txid = models.BigIntegerField(editable=False)
+
+    class Meta:
+        indexes = [
+            # Чтение журнала после токена синхронизации
+            models.Index(fields=['txid', 'id'], name='changelog_txid_id_idx'),
+            # Удаление записей старше TASK_CHANGES_RETENTION_DAYS
+            models.Index(fields=['changed_at'], name='changelog_changed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.action} {self.kind} {self.object_id}'
+
+
+class ChangeLogHorizon(models.Model):
+    """
+    Единственная строка: последняя удалённая при очистке журнала позиция
+    (txid, id). Токены до неё устарели — клиент загружает список заново.
+    """
+    txid = models.BigIntegerField()
+    entry_id = models.BigIntegerField()
+    pruned_at = models.DateTimeField(auto_now=True)
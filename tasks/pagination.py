@@ -0,0 +1,215 @@
+import base64
+import binascii
+import datetime
+import json
+import uuid
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def approximate_count(queryset):
+    """
+    Дешёвая оценка количества строк вместо COUNT(*).
+    На PostgreSQL берём оценку планировщика из EXPLAIN, на остальных СУБД
+    (SQLite в локальной разработке) честно считаем COUNT(*).
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) пагинация по паре (поле сортировки, первичный ключ).
+
+    Поле сортировки берётся из queryset (его выставляет OrderingFilter или
+    атрибут `ordering` у view), первичный ключ добавляется как tie-breaker.
+    Страница выбирается условием `WHERE (field, pk) > (value, pk)`, поэтому
+    стоимость запроса не зависит от глубины страницы. Курсор непрозрачен
+    для клиента: это base64 от JSON с позицией последней строки.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # Сортировка по умолчанию, если ни view, ни клиент её не задали
+    ordering = '-created_at'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request, view)
+        if self.include_count:
+            self.count = approximate_count(queryset)
+        return self.build_page(list(page_queryset))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Возвращает срез queryset для текущей страницы (page_size + 1 строк).
+        Вынесено отдельно, чтобы асинхронные view могли выполнить запрос сами.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.include_count = request.query_params.get(self.count_query_param) in ('1', 'true', 'approx')
+        self.count = None
+        self.model = queryset.model
+        self.pk_name = queryset.model._meta.pk.name
+        self.order_term = self.get_ordering(queryset)
+        self.order_field = self.order_term.lstrip('-')
+        descending = self.order_term.startswith('-')
+
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor['r'])
+        if reverse:
+            descending = not descending
+
+        prefix = '-' if descending else ''
+        if self.order_field == self.pk_name:
+            queryset = queryset.order_by(prefix + self.pk_name)
+        else:
+            queryset = queryset.order_by(prefix + self.order_field, prefix + self.pk_name)
+
+        if self.cursor is not None:
+            queryset = queryset.filter(self._seek_condition(descending))
+        return queryset[:self.page_size + 1]
+
+    def build_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.cursor is not None and self.cursor['r']:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.include_count:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {
+                    'type': 'integer',
+                    'description': 'Приблизительное количество, только при ?count=approx',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        for term in queryset.query.order_by:
+            if isinstance(term, str) and term not in ('?', ''):
+                return term
+        return self.ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, row, reverse):
+        position = {
+            'o': self.order_term,
+            'v': self._to_json(self._get_value(row, self.order_field)),
+            'pk': self._to_json(self._get_value(row, self.pk_name)),
+            'r': int(reverse),
+        }
+        raw = json.dumps(position, separators=(',', ':')).encode()
+        token = base64.urlsafe_b64encode(raw).decode().rstrip('=')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            position = json.loads(raw)
+            if position['o'] != self.order_term:
+                # Клиент сменил сортировку, старая позиция не имеет смысла
+                raise ValueError
+            position['v'] = self._from_json(self.order_field, position['v'])
+            position['pk'] = self._from_json(self.pk_name, position['pk'])
+            position['r'] = bool(position.get('r'))
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def _seek_condition(self, descending):
+        lookup = 'lt' if descending else 'gt'
+        pk_condition = Q(**{'%s__%s' % (self.pk_name, lookup): self.cursor['pk']})
+        if self.order_field == self.pk_name:
+            return pk_condition
+        return (
+            Q(**{'%s__%s' % (self.order_field, lookup): self.cursor['v']})
+            | (Q(**{self.order_field: self.cursor['v']}) & pk_condition)
+        )
+
+    @staticmethod
+    def _get_value(row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    @staticmethod
+    def _to_json(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return value
+
+    def _from_json(self, name, value):
+        try:
+            field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Аннотация (например, ранг поиска) — значение уже JSON-совместимо
+            return value
+        return field.to_python(value)
@@ -0,0 +1,115 @@
+"""
+Фоновая обработка вложений после загрузки (задача очереди `process_file`).
+
+Шаги: проверка на вирусы (settings.ATTACHMENT_SCANNER), SHA-256
+содержимого, извлечение текста для поиска по файлам и миниатюра для
+изображений (если установлен Pillow). Ход обработки виден в поле
+File.processing_status: pending -> processing -> ready, infected или failed.
+Обработка идемпотентна: повтор после сбоя просто пересчитывает поля.
+"""
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils.module_loading import import_string
+
+from . import jobs
+from .models import File
+from .storage import BLOB_NAME_RE, CHUNK_SIZE
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - зависит от окружения
+    Image = None
+
+TEXT_EXTENSIONS = {'.txt', '.md', '.csv', '.json', '.log', '.xml', '.html', '.yaml', '.yml'}
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp'}
+
+# Стандартная тестовая сигнатура антивирусов (EICAR)
+EICAR_SIGNATURE = b'EICAR-STANDARD-ANTIVIRUS-TEST-FILE'
+
+
+class Infected(Exception):
+    pass
+
+
+def scan_test_signature(stream):
+    """
+    Заглушка антивируса: находит только тестовую сигнатуру EICAR.
+    Настоящий сканер подключается через settings.ATTACHMENT_SCANNER —
+    функцию, которая читает поток и бросает Infected.
+    """
+    tail = b''
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        if EICAR_SIGNATURE in tail + chunk:
+            raise Infected('EICAR test signature')
+        tail = chunk[-len(EICAR_SIGNATURE):]
+
+
+def content_sha256(field):
+    # В контентно-адресуемом хранилище хэш уже записан в имени блоба
+    match = BLOB_NAME_RE.match(field.name)
+    if match:
+        return match.group('digest')
+    digest = hashlib.sha256()
+    with field.open('rb') as stream:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_text(field):
+    if os.path.splitext(field.name)[1].lower() not in TEXT_EXTENSIONS:
+        return ''
+    with field.open('rb') as stream:
+        data = stream.read(settings.ATTACHMENT_TEXT_MAX_BYTES)
+    return data.decode('utf-8', errors='replace').replace('\x00', '')
+
+
+def make_thumbnail(field):
+    if Image is None or os.path.splitext(field.name)[1].lower() not in IMAGE_EXTENSIONS:
+        return None
+    with field.open('rb') as stream:
+        image = Image.open(stream)
+        image.thumbnail(settings.ATTACHMENT_THUMBNAIL_SIZE)
+        output = io.BytesIO()
+        image.convert('RGB').save(output, format='JPEG', quality=85)
+    return ContentFile(output.getvalue(), name='thumbnail.jpg')
+
+
+def set_status(file_id, processing_status):
+    File.objects.filter(pk=file_id).update(processing_status=processing_status)
+
+
+def mark_failed(payload, error):
+    set_status(payload['file_id'], 'failed')
+
+
+@jobs.register('process_file', on_failure=mark_failed)
+def process_file(file_id):
+    file_obj = File.objects.filter(pk=file_id).first()
+    if file_obj is None:
+        # Файл удалили раньше, чем до него дошла очередь
+        return
+    set_status(file_id, 'processing')
+    scanner = import_string(settings.ATTACHMENT_SCANNER)
+    try:
+        with file_obj.file.open('rb') as stream:
+            scanner(stream)
+    except Infected:
+        file_obj.processing_status = 'infected'
+        file_obj.save(update_fields=['processing_status'])
+        return
+
+    file_obj.sha256 = content_sha256(file_obj.file)
+    file_obj.extracted_text = extract_text(file_obj.file)
+    thumbnail = make_thumbnail(file_obj.file)
+    update_fields = ['processing_status', 'sha256', 'extracted_text']
+    if thumbnail is not None:
+        file_obj.thumbnail.save(thumbnail.name, thumbnail, save=False)
+        update_fields.append('thumbnail')
+    file_obj.processing_status = 'ready'
+    # Через save(): изменение попадает в журнал изменений и сбрасывает кэш задачи
+    file_obj.save(update_fields=update_fields)
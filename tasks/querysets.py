@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import models
+from django.db.models import Prefetch
+from rest_framework.serializers import ListSerializer
+
+# Порядок вложенных связей задачи: сначала самые свежие
+NESTED_ORDERING = {
+    'comments': ('-created_at', '-id'),
+    'files': ('-uploaded_at', '-id'),
+}
+
+
+def prefetch_attr(relation):
+    """
+    Атрибут задачи, в который складывается предзагруженный список связи.
+    Срез в Prefetch поддерживается Django только вместе с to_attr.
+    """
+    return 'latest_' + relation
+
+
+def get_nested_limit():
+    """
+    Сколько последних комментариев/файлов отдавать внутри задачи.
+    None — без ограничения.
+    """
+    return getattr(settings, 'TASK_NESTED_LIMIT', None)
+
+
+class TaskQuerySet(models.QuerySet):
+    def with_nested(self, *relations, limit=None):
+        """
+        Предзагружает указанные связи (comments, files) одним запросом на
+        связь, оставляя не более `limit` последних объектов на задачу
+        (список кладётся в атрибут `latest_<relation>`).
+        """
+        queryset = self
+        for relation in relations:
+            rel = self.model._meta.get_field(relation)
+            nested = rel.related_model.objects.order_by(*NESTED_ORDERING[relation])
+            if limit:
+                nested = nested[:limit]
+            queryset = queryset.prefetch_related(
+                Prefetch(relation, queryset=nested, to_attr=prefetch_attr(relation))
+            )
+        return queryset
+
+    def for_serializer(self, serializer, limit=None, extra_columns=()):
+        """
+        Готовит выборку под сериализатор (класс или экземпляр с уже
+        отобранными полями, см. tasks/fieldsets.py): читает только выводимые
+        колонки (плюс `extra_columns`) и предзагружает только связи, которые
+        выводятся вложенными списками.
+        """
+        if isinstance(serializer, type):
+            serializer = serializer()
+        fields = serializer.fields
+        relations = [
+            field.source
+            for field in fields.values()
+            if isinstance(field, ListSerializer) and field.source in NESTED_ORDERING
+        ]
+        concrete = {field.name for field in self.model._meta.concrete_fields}
+        columns = {field.source for field in fields.values() if field.source in concrete}
+        columns.update(extra_columns)
+        return self.only(self.model._meta.pk.name, *sorted(columns)).with_nested(*relations, limit=limit)
+
+
+class TaskManager(models.Manager.from_queryset(TaskQuerySet)):
+    def get_queryset(self):
+        # tsvector нужен только в WHERE поиска, не выбираем его в каждой выборке.
+        # Удалённые задачи до фоновой очистки видны только через _base_manager
+        return super().get_queryset().defer('search_vector').filter(deleted_at__isnull=True)
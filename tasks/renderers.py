@@ -0,0 +1,72 @@
+"""
+Быстрые JSON-рендерер и парсер для API на orjson.
+
+Вывод совпадает с JSONRenderer DRF в конфигурации по умолчанию
+(UNICODE_JSON, COMPACT_JSON): UUID и datetime с часовым поясом кодируются
+нативно, UTC-время заканчивается на 'Z'. Если orjson не установлен или
+запрошен вывод с отступами, используется стандартный json через DRF.
+"""
+from django.conf import settings
+from rest_framework.utils import encoders
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from .instrumentation import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+# Объекты, которых нет в orjson (ленивые строки, Decimal, timedelta,
+# QuerySet), кодируются так же, как в DRF
+default = encoders.JSONEncoder().default
+
+
+def dumps(data):
+    """
+    Сериализует данные в компактный JSON (bytes) тем же способом, что и
+    FastJSONRenderer.
+    """
+    if orjson is None:
+        return JSONRenderer().render(data)
+    ret = orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+    # Как DRF: \u2028 и \u2029 экранируются, чтобы ответ был подмножеством JavaScript
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return ret
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            if data is None:
+                return b''
+            if orjson is None or not self.supports_fast_path(accepted_media_type, renderer_context):
+                return super().render(data, accepted_media_type, renderer_context)
+            try:
+                return dumps(data)
+            except TypeError:
+                # Например, целые больше 64 бит: их умеет только json
+                return super().render(data, accepted_media_type, renderer_context)
+
+    def supports_fast_path(self, accepted_media_type, renderer_context):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        return indent is None and self.compact and not self.ensure_ascii
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            # orjson, как и STRICT_JSON в DRF, не принимает NaN и Infinity
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
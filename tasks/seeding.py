@@ -0,0 +1,75 @@
+"""
+Генерация синтетических данных для бенчмарков и нагрузочных тестов.
+"""
+import random
+
+from django.db import transaction
+
+from . import counters
+from .models import Task, Comment
+
+WORDS = (
+    'отчёт', 'задача', 'проект', 'релиз', 'ошибка', 'клиент', 'сервер', 'база',
+    'данных', 'поиск', 'миграция', 'индекс', 'документация', 'тестирование',
+    'report', 'deploy', 'backend', 'frontend', 'invoice', 'review', 'refactor',
+    'release', 'database', 'search', 'customer', 'upload', 'metrics', 'cache',
+)
+
+# Перекошенное распределение статусов: большая часть задач уже закрыта
+STATUS_WEIGHTS = {
+    'выполнена': 70,
+    'новая': 15,
+    'в работе': 10,
+    'отменена': 5,
+}
+
+
+def random_text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed_tasks(count, batch_size=5000, seed=None):
+    """
+    Создаёт `count` задач пачками через bulk_create и возвращает их id.
+    """
+    rng = random.Random(seed)
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    ids = []
+    for start in range(0, count, batch_size):
+        batch = [
+            Task(
+                title=random_text(rng, rng.randint(2, 6)).capitalize(),
+                description=random_text(rng, rng.randint(5, 40)),
+                status=rng.choices(statuses, weights)[0],
+            )
+            for _ in range(min(batch_size, count - start))
+        ]
+        with transaction.atomic(), counters.batched():
+            Task.objects.bulk_create(batch)
+            for task in batch:
+                counters.created(task)
+        ids.extend(task.id for task in batch)
+    return ids
+
+
+def seed_comments(task_ids, count, batch_size=10000, seed=None):
+    """
+    Создаёт `count` комментариев, распределённых по задачам по закону,
+    близкому к Ципфу: у немногих задач очень много комментариев.
+    """
+    rng = random.Random(seed)
+    if not task_ids:
+        return
+    weights = [1.0 / (rank + 1) for rank in range(len(task_ids))]
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        targets = rng.choices(task_ids, weights, k=size)
+        batch = [
+            Comment(task_id=task_id, text=random_text(rng, rng.randint(3, 30)))
+            for task_id in targets
+        ]
+        with transaction.atomic(), counters.batched():
+            Comment.objects.bulk_create(batch)
+            for comment in batch:
+                counters.created(comment)
@@ -1,21 +1,95 @@
+import re
+
+from django.conf import settings
 from rest_framework import serializers
-from .models import Task, Comment, File
+from .fieldsets import DynamicFieldsMixin
+from .instrumentation import InstrumentedListSerializer, InstrumentedSerializerMixin
+from .models import Task, Comment, File, UploadSession
+from .querysets import NESTED_ORDERING, get_nested_limit, prefetch_attr
+
+
+class NestedLatestListSerializer(serializers.ListSerializer):
+    """
+    Вложенный список связанных объектов задачи, ограниченный N последними.
+    Если связь предзагружена (TaskQuerySet.with_nested), берём готовый
+    список из атрибута задачи, иначе делаем один ограниченный запрос.
+    """
+    def to_representation(self, data):
+        prefetched = getattr(getattr(data, 'instance', None), prefetch_attr(self.source), None)
+        if prefetched is not None:
+            data = prefetched
+        elif hasattr(data, 'all'):
+            data = data.all().order_by(*NESTED_ORDERING[self.source])
+            limit = get_nested_limit()
+            if limit:
+                data = data[:limit]
+        return super().to_representation(data)
+
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = '__all__'
+        list_serializer_class = InstrumentedListSerializer
 
 
-class FileSerializer(serializers.ModelSerializer):
+class FileSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = File
-        fields = '__all__'
+        # Извлечённый текст нужен только поиску по файлам
+        exclude = ('extracted_text',)
+        list_serializer_class = InstrumentedListSerializer
+
 
+class TaskSerializer(DynamicFieldsMixin, InstrumentedSerializerMixin, serializers.ModelSerializer):
+    comments = NestedLatestListSerializer(child=CommentSerializer(), read_only=True)
+    files = NestedLatestListSerializer(child=FileSerializer(), read_only=True)
+    # Денормализованные колонки задачи (tasks/counters.py); объявлены явно,
+    # чтобы сохранить место полей в ответе
+    comments_count = serializers.IntegerField(read_only=True)
+    files_count = serializers.IntegerField(read_only=True)
 
-class TaskSerializer(serializers.ModelSerializer):
-    comments = CommentSerializer(many=True, read_only=True)
-    files = FileSerializer(many=True, read_only=True)
     class Meta:
         model = Task
+        exclude = ('search_vector', 'deleted_at')
+        list_serializer_class = InstrumentedListSerializer
+
+
+class BulkStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES)
+
+
+class TransitionSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Task.STATUS_CHOICES)
+    # Условия перехода: при несовпадении с текущими значениями ответ 409
+    expected_status = serializers.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+    expected_version = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        source = attrs.get('expected_status')
+        if source is not None and attrs['status'] not in Task.TRANSITIONS[source]:
+            raise serializers.ValidationError(
+                {'status': [f'Переход из статуса «{source}» в «{attrs["status"]}» запрещён.']}
+            )
+        return attrs
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
         fields = '__all__'
+        read_only_fields = ('offset',)
+
+    def validate_size(self, value):
+        if value <= 0 or value > settings.TASK_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Размер файла должен быть от 1 до {settings.TASK_UPLOAD_MAX_SIZE} байт.'
+            )
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and not re.fullmatch(r'[0-9a-f]{64}', value):
+            raise serializers.ValidationError('Ожидается SHA-256 в шестнадцатеричном виде.')
+        return value
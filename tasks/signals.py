@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, changelog, counters, jobs, transitions
+from . import deletion, processing, uploads  # noqa: F401 - регистрируют фоновые задачи
+from .instrumentation import install_query_recorder
+from .models import ChangeLogEntry, Task, Comment, File
+
+
+@receiver([post_save, post_delete], sender=Task)
+def invalidate_task_cache(sender, instance, **kwargs):
+    cache.invalidate_task(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=File)
+def invalidate_parent_task_cache(sender, instance, **kwargs):
+    cache.invalidate_task(instance.task_id)
+
+
+@receiver(pre_save, sender=Task)
+@receiver(pre_save, sender=Comment)
+@receiver(pre_save, sender=File)
+def lock_counter_state(sender, instance, **kwargs):
+    # save() выполняется в транзакции (AtomicSaveMixin): блокируем строку и
+    # запоминаем прежний статус/задачу, чтобы посчитать дельту счётчиков
+    if instance._state.adding:
+        return
+    if sender is Task:
+        # Версия читается под той же блокировкой, поэтому следующая версия
+        # не совпадёт с версией параллельного изменения
+        state = counters.lock_task_state(instance.pk)
+        if state is not None:
+            instance._counter_state, version = state
+            # Условная запись PUT/PATCH (TaskViewSet.update): строка уже
+            # заблокирована, версия не изменится до конца транзакции
+            expected = getattr(instance, '_expected_versions', None)
+            if expected is not None and version not in expected:
+                raise transitions.VersionConflict(version)
+            instance.version = version + 1
+    else:
+        instance._counter_state = counters.lock_states(sender, [instance.pk]).get(instance.pk)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=File)
+def update_counters_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        counters.created(instance)
+    elif update_fields is None or counters.tracked_field(sender) in update_fields:
+        # Статус/задача не записывались: значение в экземпляре может быть
+        # устаревшим, и дельта по нему испортила бы счётчики
+        counters.changed(instance, getattr(instance, '_counter_state', None))
+
+
+def deleted_with_task(sender, origin):
+    """
+    Комментарий или файл удаляется каскадно вместе с задачей.
+    """
+    return sender is not Task and (
+        isinstance(origin, Task) or (isinstance(origin, QuerySet) and origin.model is Task)
+    )
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=File)
+def update_counters_on_delete(sender, instance, origin=None, **kwargs):
+    # При каскадном удалении задачи её счётчики уже не нужны
+    if not deleted_with_task(sender, origin):
+        counters.deleted(instance)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=File)
+def record_change_on_save(sender, instance, **kwargs):
+    # Прежнюю задачу перенесённого комментария/файла тоже отмечаем изменённой
+    previous = instance.__dict__.pop('_counter_state', None)
+    moved_from = [previous] if sender is not Task and previous not in (None, instance.task_id) else ()
+    changelog.record([instance], ChangeLogEntry.UPSERT, task_ids=moved_from)
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=File)
+def record_change_on_delete(sender, instance, origin=None, **kwargs):
+    if not deleted_with_task(sender, origin):
+        changelog.record([instance], ChangeLogEntry.DELETE)
+
+
+@receiver(post_delete, sender=File)
+def release_attachment(sender, instance, **kwargs):
+    # Срабатывает и при каскадном удалении задачи; блоб удаляем после коммита,
+    # когда строки File с этим именем уже точно удалены
+    for field_name in ('file', 'thumbnail'):
+        field = getattr(instance, field_name)
+        storage, name = field.storage, field.name
+        if hasattr(storage, 'release') and name:
+            transaction.on_commit(lambda storage=storage, name=name, field_name=field_name: storage.release(name, field_name))
+
+
+@receiver(post_save, sender=File)
+def enqueue_file_processing(sender, instance, created, **kwargs):
+    # Задача ставится в той же транзакции, что и File: воркер увидит её после коммита
+    if created:
+        jobs.enqueue('process_file', {'file_id': instance.pk})
+
+
+# Учёт SQL-запросов для метрик запроса (tasks.instrumentation)
+connection_created.connect(install_query_recorder, dispatch_uid='tasks.install_query_recorder')
@@ -0,0 +1,101 @@
+"""
+Контентно-адресуемое хранилище вложений.
+
+Файл сохраняется под именем, производным от SHA-256 содержимого:
+`task_files/ab/cd/<sha256>.<ext>`. Одинаковое содержимое, прикреплённое
+к тысячам задач, хранится на диске один раз; количество ссылок — это
+число строк File с таким именем (по полю file есть индекс). Блоб удаляется,
+когда на него не осталось ссылок (см. tasks/signals.py и gc_attachments).
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+
+CHUNK_SIZE = 64 * 1024
+
+BLOB_NAME_RE = re.compile(r'^(?P<prefix>.+/)?[0-9a-f]{2}/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(\.\w{1,10})?$')
+
+
+def get_attachment_storage():
+    """
+    Хранилище поля File.file (алиас `attachments` в settings.STORAGES).
+    """
+    return storages['attachments']
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя всё равно определяется хэшем содержимого в _save
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()[:11]
+        os.makedirs(self.path(directory or '.'), exist_ok=True)
+
+        if hasattr(content, 'temporary_file_path'):
+            # Файл уже на диске (большой upload или загрузка частями): хэшируем и переносим
+            source = content.temporary_file_path()
+            digest = hashlib.sha256()
+            with open(source, 'rb') as stream:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            owned = False
+        else:
+            # Хэшируем по ходу записи во временный файл рядом с итоговым местом
+            digest = hashlib.sha256()
+            fd, source = tempfile.mkstemp(dir=self.path(directory or '.'), prefix='.upload-')
+            with os.fdopen(fd, 'wb') as stream:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    stream.write(chunk)
+            owned = True
+
+        hexdigest = digest.hexdigest()
+        blob_name = '/'.join(filter(None, [directory, hexdigest[:2], hexdigest[2:4], hexdigest + extension]))
+        blob_path = self.path(blob_name)
+        if os.path.exists(blob_path):
+            # Такой блоб уже есть: обновляем mtime, чтобы сборщик мусора его не тронул
+            os.utime(blob_path)
+            if owned:
+                os.remove(source)
+            return blob_name
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if owned:
+            os.replace(source, blob_path)
+        else:
+            file_move_safe(source, blob_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(blob_path, self.file_permissions_mode)
+        return blob_name
+
+    def is_blob(self, name):
+        return bool(BLOB_NAME_RE.match(name or ''))
+
+    def release(self, name, field='file'):
+        """
+        Удаляет блоб, если на него больше не ссылается ни одна строка File
+        (по полю `field`: сам файл или миниатюра).
+        Свежие блобы (моложе ATTACHMENT_GC_GRACE_SECONDS) не трогаем: их может
+        прямо сейчас переиспользовать параллельная загрузка. Их уберёт
+        команда gc_attachments.
+        """
+        from .models import File
+
+        if not self.is_blob(name) or File.objects.filter(**{field: name}).exists():
+            return False
+        try:
+            age = time.time() - os.path.getmtime(self.path(name))
+        except FileNotFoundError:
+            return False
+        if age < settings.ATTACHMENT_GC_GRACE_SECONDS:
+            return False
+        self.delete(name)
+        return True
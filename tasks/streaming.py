@@ -0,0 +1,104 @@
+"""
+Потоковая отдача вложений с поддержкой HTTP Range.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.encoding import escape_uri_path
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Разбирает заголовок Range с одним диапазоном и возвращает (start, end)
+    включительно или None, если заголовок не задан или не поддерживается
+    (тогда отдаётся весь файл, как разрешает RFC 7233).
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        # В пустом файле нет ни одного байта, который можно вернуть
+        raise RangeNotSatisfiable
+    if not first:
+        # bytes=-500 — последние 500 байт
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def read_range(fileobj, start, length):
+    try:
+        fileobj.seek(start)
+        while length > 0:
+            chunk = fileobj.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def file_download_response(field_file, request, filename=None):
+    """
+    Ответ на скачивание вложения без загрузки файла в память воркера.
+    `filename` — имя для Content-Disposition (по умолчанию имя в хранилище).
+
+    Весь файл отдаётся через FileResponse (WSGI-сервер использует
+    wsgi.file_wrapper / sendfile), диапазон — потоково кусками по 64 КБ.
+    Если настроен SENDFILE_URL_PREFIX, отдачу (включая Range) берёт на себя
+    nginx через X-Accel-Redirect.
+    """
+    filename = filename or os.path.basename(field_file.name)
+    disposition = f"attachment; filename*=UTF-8''{escape_uri_path(filename)}"
+
+    prefix = getattr(settings, 'SENDFILE_URL_PREFIX', None)
+    if prefix:
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + field_file.name
+        response['Content-Disposition'] = disposition
+        return response
+
+    size = field_file.size
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        response = FileResponse(field_file.open('rb'), as_attachment=True, filename=filename)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(field_file.open('rb'), start, end - start + 1),
+            status=206,
+            content_type='application/octet-stream',
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Disposition'] = disposition
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -1,10 +1,43 @@
+import csv
+import hashlib
 import io
+import json
+import os
 import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
+import django
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from rest_framework import status
-from rest_framework.test import APITestCase, APIClient
-from .models import Task, Comment, File
+from rest_framework import permissions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from todo_project import routers, throttling
+from todo_project.db import database_settings
+from . import changelog, counters, deletion, jobs, transitions, uploads
+from .instrumentation import RequestMetrics, current_metrics, registry
+from .loadtest import Scenario, compare_with_baseline, percentile, run_scenario
+from .management.commands import run_jobs
+from .renderers import FastJSONParser, FastJSONRenderer
+from .serializers import TaskSerializer
+from .values import TaskValuesSerializer
+from .views import CommentViewSet, TaskViewSet
+from .models import ChangeLogEntry, Job, Task, Comment, File, TaskStatusSummary, UploadSession
 
 User = get_user_model()
 
@@ -20,6 +53,37 @@ def get_response_results(response_data):
     return response_data
 
 
+def log_position():
+    """
+    Токен после последней записи журнала. В TestCase все изменения идут
+    в одной незакоммиченной транзакции, выше горизонта журнала, поэтому
+    тесты внутри неё читают журнал без горизонта (logged_changes).
+    """
+    last = ChangeLogEntry.objects.order_by('-txid', '-id').values_list('txid', 'id').first()
+    return changelog.format_token(*(last or (0, 0)))
+
+
+def logged_changes(token, limit=100):
+    with mock.patch.object(changelog, 'horizon', return_value=2 ** 63 - 1):
+        return changelog.changes_since(changelog.parse_token(token), limit)[0]
+
+
+class TemporaryMediaMixin:
+    """
+    Вложения и части загрузок пишутся во временный каталог теста, а не в
+    task_files/ репозитория.
+    """
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name, TASK_UPLOAD_TEMP_DIR=os.path.join(media_root.name, 'uploads')
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
 class BaseAPITestCase(APITestCase):
     """
     Базовый класс тестов, который создаёт пользователя и настраивает аутентификацию.
@@ -30,6 +94,9 @@ class BaseAPITestCase(APITestCase):
         self.client = APIClient()
         # Принудительная аутентификация для тестов
         self.client.force_authenticate(user=self.user)
+        # Кэш и вёдра лимитов переживают откат транзакции между тестами, очищаем их
+        caches[settings.TASK_CACHE_ALIAS].clear()
+        throttling.get_store().clear()
 
 
 class TaskAPITests(BaseAPITestCase):
@@ -156,7 +223,7 @@ class CommentAPITests(BaseAPITestCase):
         self.assertEqual(str(response.data['task']), str(self.task.id))
 
 
-class FileAPITests(BaseAPITestCase):
+class FileAPITests(TemporaryMediaMixin, BaseAPITestCase):
     def setUp(self):
         super().setUp()
         self.task = Task.objects.create(title="Task for file", status="новая")
@@ -220,3 +287,1871 @@ class SearchAPITests(BaseAPITestCase):
         # Ожидаем, что найдется хотя бы одна задача, содержащая слово "Поиск" в заголовке
         self.assertTrue(any("Поиск" in task['title'] for task in tasks))
 
+    def test_search_by_description_word_with_pagination(self):
+        """
+        Тест поиска по слову из описания вместе с постраничной выдачей.
+        """
+        Task.objects.create(title="Отчёт", description="Описание второе", status="новая")
+        response = self.client.get(self.tasks_url, {'search': 'Описание', 'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [task['title'] for task in response.data['results']]
+        response = self.client.get(response.data['next'])
+        titles += [task['title'] for task in response.data['results']]
+        self.assertEqual(sorted(titles), ["Отчёт", "Поиск задача 1"])
+        self.assertIsNone(response.data['next'])
+
+
+class PaginationAPITests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tasks_url = reverse('task-list')
+        statuses = ['новая', 'в работе', 'новая', 'выполнена', 'отменена']
+        self.tasks = [
+            Task.objects.create(title=f"Task {i}", status=task_status)
+            for i, task_status in enumerate(statuses)
+        ]
+
+    def walk(self, params):
+        """
+        Проходит по всем страницам по ссылкам next и возвращает id задач.
+        """
+        ids = []
+        response = self.client.get(self.tasks_url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(task['id'] for task in response.data['results'])
+            if not response.data['next']:
+                return ids, response
+            response = self.client.get(response.data['next'])
+
+    def test_keyset_pages_cover_all_tasks_without_duplicates(self):
+        """
+        Тест обхода всех страниц: каждая задача встречается ровно один раз
+        в порядке убывания даты создания.
+        """
+        ids, _ = self.walk({'page_size': 2})
+        expected = [str(task.id) for task in sorted(
+            self.tasks, key=lambda t: (t.created_at, t.id), reverse=True)]
+        self.assertEqual(ids, expected)
+
+    def test_keyset_pages_with_status_ordering(self):
+        """
+        Тест keyset-пагинации совместно с ?ordering=status.
+        """
+        ids, _ = self.walk({'page_size': 2, 'ordering': 'status'})
+        expected = [str(task.id) for task in sorted(self.tasks, key=lambda t: (t.status, t.id))]
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_previous_page(self):
+        """
+        Тест перехода на предыдущую страницу по ссылке previous.
+        """
+        first = self.client.get(self.tasks_url, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [task['id'] for task in back.data['results']],
+            [task['id'] for task in first.data['results']],
+        )
+
+    def test_invalid_cursor(self):
+        """
+        Тест некорректного курсора: ожидаем 404.
+        """
+        response = self.client.get(self.tasks_url, {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_approximate_count(self):
+        """
+        Тест необязательного приблизительного количества задач.
+        """
+        if connection.vendor == 'postgresql':
+            # Оценка планировщика точна только по свежей статистике
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE tasks_task')
+        response = self.client.get(self.tasks_url, {'count': 'approx'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], len(self.tasks))
+        response = self.client.get(self.tasks_url)
+        self.assertNotIn('count', response.data)
+
+
+class NestedQueryCountTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.tasks_url = reverse('task-list')
+
+    def create_tasks(self, count):
+        for i in range(count):
+            task = Task.objects.create(title=f"Task {i}", status="новая")
+            Comment.objects.create(task=task, text="Комментарий")
+            File.objects.create(task=task, file="task_files/example.txt")
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.tasks_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        """
+        Тест отсутствия N+1: число запросов для списка из 2 и из 10 задач
+        одинаково.
+        """
+        self.create_tasks(2)
+        small = self.count_list_queries()
+        self.create_tasks(8)
+        large = self.count_list_queries()
+        self.assertEqual(small, large)
+
+    @override_settings(TASK_NESTED_LIMIT=2)
+    def test_nested_comments_are_limited(self):
+        """
+        Тест ограничения вложенных комментариев: N последних плюс общее количество.
+        """
+        task = Task.objects.create(title="Task", status="новая")
+        comments = [Comment.objects.create(task=task, text=f"Комментарий {i}") for i in range(5)]
+        detail_url = reverse('task-detail', kwargs={'pk': task.id})
+        response = self.client.get(detail_url)
+        self.assertEqual(response.data['comments_count'], 5)
+        self.assertEqual(
+            [comment['id'] for comment in response.data['comments']],
+            [comments[4].id, comments[3].id],
+        )
+
+
+class IndexStatsCommandTests(TestCase):
+    def test_index_stats_requires_postgresql(self):
+        """
+        Тест команды index_stats: на других СУБД она сообщает об ошибке.
+        """
+        if connection.vendor == 'postgresql':
+            out = io.StringIO()
+            call_command('index_stats', stdout=out)
+            self.assertIn('task_status_created_idx', out.getvalue())
+        else:
+            with self.assertRaises(CommandError):
+                call_command('index_stats')
+
+
+class TaskCacheTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Кэшируемая задача", status="новая")
+        self.detail_url = reverse('task-detail', kwargs={'pk': self.task.id})
+        self.tasks_url = reverse('task-list')
+
+    def test_detail_is_served_from_cache(self):
+        """
+        Тест повторного чтения задачи: второй запрос не обращается к БД.
+        """
+        first = self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.detail_url)
+        self.assertEqual(first.data, second.data)
+
+    def test_comment_invalidates_task_detail(self):
+        """
+        Тест инвалидации: новый комментарий сразу виден в задаче.
+        """
+        self.client.get(self.detail_url)
+        Comment.objects.create(task=self.task, text="Новый комментарий")
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data['comments_count'], 1)
+
+    def test_list_is_invalidated_on_task_create(self):
+        """
+        Тест инвалидации страниц списка при создании задачи.
+        """
+        self.assertEqual(len(self.client.get(self.tasks_url).data['results']), 1)
+        Task.objects.create(title="Ещё одна", status="новая")
+        self.assertEqual(len(self.client.get(self.tasks_url).data['results']), 2)
+
+    def test_if_none_match_returns_not_modified(self):
+        """
+        Тест условного запроса: совпадающий ETag даёт 304 без тела.
+        """
+        etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.task.title = "Новое название"
+        self.task.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+    def test_stale_entry_is_cleared_on_commit(self):
+        """
+        Тест инвалидации после коммита: ответ, закэшированный параллельным
+        GET до коммита изменения, удаляется.
+        """
+        stale = self.client.get(self.detail_url).data
+        cache = caches[settings.TASK_CACHE_ALIAS]
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.task.title = "Новое название"
+                self.task.save()
+                # Параллельный запрос видит ещё старую строку и кэширует её
+                cache.set(f'tasks:detail:{self.task.id}', {'data': stale, 'etag': 'old', 'host': 'testserver', 'last_modified': None})
+        self.assertEqual(self.client.get(self.detail_url).data['title'], "Новое название")
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_cache_is_not_filled_during_replica_lag(self):
+        """
+        Тест реплик: сразу после изменения ответы не кэшируются, пока
+        реплика может отставать.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.save()
+        # Роль реплики играет основная база
+        with mock.patch.object(routers, 'choose_replica', return_value='default'):
+            for url in (self.detail_url, self.tasks_url):
+                self.client.get(url)
+                with CaptureQueriesContext(connection) as context:
+                    self.client.get(url)
+                self.assertTrue(context.captured_queries)
+
+
+class BulkAPITests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.bulk_url = reverse('task-bulk')
+
+    def test_bulk_create_tasks_with_per_item_errors(self):
+        """
+        Тест массового создания: валидные задачи создаются, ошибки
+        возвращаются по индексу элемента.
+        """
+        payload = [
+            {"title": "Задача 1", "status": "новая"},
+            {"title": "", "status": "новая"},
+            {"title": "Задача 3", "status": "в работе"},
+        ]
+        response = self.client.post(self.bulk_url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(len(response.data['ids']), 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_bulk_update_tasks(self):
+        """
+        Тест массового частичного обновления задач.
+        """
+        tasks = [Task.objects.create(title=f"Task {i}", status="новая") for i in range(3)]
+        payload = [{"id": str(task.id), "title": f"Updated {i}"} for i, task in enumerate(tasks)]
+        response = self.client.patch(self.bulk_url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(Task.objects.values_list('title', flat=True)),
+            ["Updated 0", "Updated 1", "Updated 2"],
+        )
+
+    def test_bulk_status_single_update(self):
+        """
+        Тест массовой смены статуса одним запросом UPDATE к задачам
+        (плюс блокировка строк и сводка по статусам).
+        """
+        tasks = [Task.objects.create(title=f"Task {i}", status="новая") for i in range(3)]
+        payload = {"ids": [str(task.id) for task in tasks[:2]], "status": "выполнена"}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('task-bulk-status'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+        task_updates = [q for q in context.captured_queries if q['sql'].startswith('UPDATE "tasks_task" ')]
+        self.assertEqual(len(task_updates), 1)
+        self.assertEqual(
+            counters.status_summary()['by_status'],
+            {'новая': 1, 'в работе': 0, 'выполнена': 2, 'отменена': 0},
+        )
+        self.assertEqual(Task.objects.filter(status="выполнена").count(), 2)
+
+    def test_bulk_create_comments_loads_tasks_once(self):
+        """
+        Тест массового создания комментариев: задачи для проверки ссылок
+        загружаются одним запросом, а не на каждый комментарий.
+        """
+        tasks = [Task.objects.create(title=f"Task {i}", status="новая") for i in range(5)]
+        payload = [{"task": str(task.id), "text": "Комментарий"} for task in tasks * 4]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse('comment-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Comment.objects.count(), 20)
+        # Плюс по одному запросу на счётчики задач и журнал изменений
+        self.assertLess(len(context.captured_queries), 8)
+
+    def test_bulk_database_error_is_not_leaked(self):
+        """
+        Тест ошибки БД при массовой записи: текст исключения пишется в лог,
+        клиент получает общее сообщение по каждому элементу пачки.
+        """
+        payload = [{"title": f"Task {i}", "status": "новая"} for i in range(2)]
+        error = DatabaseError('duplicate key value violates unique constraint "tasks_task_pkey"')
+        with mock.patch.object(TaskViewSet, 'perform_bulk_create', side_effect=error), \
+                self.assertLogs('tasks.bulk', level='ERROR') as logs:
+            response = self.client.post(self.bulk_url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([item['index'] for item in response.data['errors']], [0, 1])
+        self.assertNotIn('tasks_task_pkey', json.dumps(response.json(), ensure_ascii=False))
+        self.assertIn('tasks_task_pkey', '\n'.join(logs.output))
+
+    def test_bulk_delete(self):
+        """
+        Тест массового удаления задач по списку id.
+        """
+        tasks = [Task.objects.create(title=f"Task {i}", status="новая") for i in range(3)]
+        response = self.client.delete(self.bulk_url, {"ids": [str(tasks[0].id), str(tasks[1].id)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(Task.objects.values_list('id', flat=True)), [tasks[2].id])
+
+
+class ChunkedUploadAPITests(TemporaryMediaMixin, BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Task for upload", status="новая")
+        self.content = b"0123456789" * 10
+
+    def create_session(self, **extra):
+        payload = {"task": str(self.task.id), "filename": "big.txt", "size": len(self.content), **extra}
+        response = self.client.post(reverse('uploadsession-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def put_chunk(self, session_id, start, end):
+        return self.client.put(
+            reverse('uploadsession-chunk', kwargs={'pk': session_id}),
+            data=self.content[start:end + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(self.content)}',
+        )
+
+    def test_chunked_upload_with_resume_and_checksum(self):
+        """
+        Тест загрузки частями: неверное смещение отклоняется, после всех
+        частей сессия превращается в файл с проверенной контрольной суммой.
+        """
+        checksum = hashlib.sha256(self.content).hexdigest()
+        session_id = self.create_session(sha256=checksum)
+        self.assertEqual(self.put_chunk(session_id, 0, 39).data['offset'], 40)
+        conflict = self.put_chunk(session_id, 60, 99)
+        self.assertEqual(conflict.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(conflict.data['offset'], 40)
+        resumed = self.client.get(reverse('uploadsession-detail', kwargs={'pk': session_id}))
+        self.assertEqual(self.put_chunk(session_id, resumed.data['offset'], 99).data['offset'], 100)
+
+        response = self.client.post(reverse('uploadsession-complete', kwargs={'pk': session_id}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['sha256'], checksum)
+        self.assertEqual(response.data['original_name'], 'big.txt')
+        file_obj = File.objects.get(id=response.data['id'])
+        with file_obj.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+        file_obj.file.delete(save=False)
+
+    def test_checksum_mismatch_restarts_upload(self):
+        """
+        Тест несовпадения контрольной суммы: файл не создаётся.
+        """
+        session_id = self.create_session(sha256='0' * 64)
+        self.put_chunk(session_id, 0, 99)
+        response = self.client.post(reverse('uploadsession-complete', kwargs={'pk': session_id}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(File.objects.exists())
+
+    def test_concurrent_parts_and_complete_conflict(self):
+        """
+        Тест блокировки: пока пишется часть, другая часть и complete той же
+        сессии получают 409; повторный complete — 404, файл один.
+        """
+        session_id = self.create_session()
+        self.put_chunk(session_id, 0, 49)
+        session = UploadSession.objects.get(pk=session_id)
+        with uploads.part_lock(session) as locked:
+            self.assertTrue(locked)
+            self.assertEqual(self.put_chunk(session_id, 50, 99).status_code, status.HTTP_409_CONFLICT)
+            response = self.client.post(reverse('uploadsession-complete', kwargs={'pk': session_id}))
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.put_chunk(session_id, 50, 99).status_code, status.HTTP_200_OK)
+        url = reverse('uploadsession-complete', kwargs={'pk': session_id})
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(File.objects.count(), 1)
+
+    def test_abandoned_sessions_expire(self):
+        """
+        Тест очистки: брошенная сессия и временный файл без сессии
+        удаляются, активная сессия остаётся.
+        """
+        abandoned, active = self.create_session(), self.create_session()
+        self.put_chunk(abandoned, 0, 9)
+        self.put_chunk(active, 0, 9)
+        old = timezone.now() - timedelta(seconds=settings.TASK_UPLOAD_EXPIRE_SECONDS + 1)
+        UploadSession.objects.filter(pk=abandoned).update(updated_at=old)
+        orphan = os.path.join(settings.TASK_UPLOAD_TEMP_DIR, f'{uuid.uuid4()}.part')
+        with open(orphan, 'wb') as part:
+            part.write(b'orphan')
+        os.utime(orphan, (old.timestamp(), old.timestamp()))
+
+        self.assertEqual(uploads.expire_upload_sessions(), 1)
+        self.assertEqual(list(UploadSession.objects.values_list('pk', flat=True)), [uuid.UUID(active)])
+        self.assertFalse(os.path.exists(os.path.join(settings.TASK_UPLOAD_TEMP_DIR, f'{abandoned}.part')))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(os.path.join(settings.TASK_UPLOAD_TEMP_DIR, f'{active}.part')))
+
+    def test_download_with_range(self):
+        """
+        Тест скачивания файла целиком и по диапазону байт.
+        """
+        file_obj = File(task=self.task, processing_status='ready')
+        file_obj.file.save("range.txt", io.BytesIO(self.content))
+        url = reverse('file-download', kwargs={'pk': file_obj.id})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b"".join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=500-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        file_obj.file.delete(save=False)
+
+    def test_range_of_empty_file(self):
+        """
+        Тест пустого файла: любой диапазон, в том числе суффиксный, — 416
+        с `bytes */0`; без Range файл отдаётся целиком.
+        """
+        file_obj = File(task=self.task, processing_status='ready')
+        file_obj.file.save("empty.txt", io.BytesIO(b""))
+        url = reverse('file-download', kwargs={'pk': file_obj.id})
+        for header in ('bytes=-5', 'bytes=0-', 'bytes=0-0'):
+            response = self.client.get(url, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.assertEqual(response['Content-Range'], 'bytes */0')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), b"")
+        file_obj.file.delete(save=False)
+
+
+@override_settings(ATTACHMENT_GC_GRACE_SECONDS=0)
+class ContentAddressedStorageTests(TemporaryMediaMixin, BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Task for files", status="новая")
+
+    def upload(self, content, name="report.pdf"):
+        upload = io.BytesIO(content)
+        upload.name = name
+        response = self.client.post(
+            reverse('file-list'), {"task": str(self.task.id), "file": upload}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return File.objects.get(id=response.data['id'])
+
+    def test_identical_uploads_share_one_blob(self):
+        """
+        Тест дедупликации: одинаковое содержимое хранится один раз и
+        удаляется с диска вместе с последней ссылкой.
+        """
+        first = self.upload(b"same content")
+        second = self.upload(b"same content")
+        other = self.upload(b"other content")
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertNotEqual(first.file.name, other.file.name)
+        digest = hashlib.sha256(b"same content").hexdigest()
+        self.assertEqual(first.file.name, f"task_files/{digest[:2]}/{digest[2:4]}/{digest}.pdf")
+
+        storage = first.file.storage
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.exists(second.file.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.delete()
+        self.assertFalse(storage.exists(second.file.name))
+        self.assertFalse(storage.exists(other.file.name))
+
+    def test_download_keeps_original_name(self):
+        """
+        Тест имени файла: в хранилище блоб называется по хэшу, а скачивается
+        под именем, с которым его загрузили.
+        """
+        file_obj = self.upload(b"quarterly numbers", name="Отчёт за квартал.pdf")
+        self.assertEqual(file_obj.original_name, "Отчёт за квартал.pdf")
+        File.objects.filter(pk=file_obj.pk).update(processing_status='ready')
+        response = self.client.get(reverse('file-download', kwargs={'pk': file_obj.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("filename*=utf-8''%D0%9E%D1%82%D1%87%D1%91%D1%82", response['Content-Disposition'])
+        self.assertEqual(b"".join(response.streaming_content), b"quarterly numbers")
+
+    def test_gc_attachments_removes_orphans(self):
+        """
+        Тест сборщика мусора: блоб без ссылок удаляется, используемый остаётся.
+        """
+        kept = self.upload(b"kept")
+        orphan = self.upload(b"orphan")
+        File.objects.filter(id=orphan.id).delete()
+        call_command('gc_attachments', stdout=io.StringIO())
+        self.assertTrue(kept.file.storage.exists(kept.file.name))
+        self.assertFalse(orphan.file.storage.exists(orphan.file.name))
+
+    def test_gc_attachments_removes_orphan_thumbnails(self):
+        """
+        Тест сборщика мусора: миниатюра без ссылок удаляется, миниатюра
+        существующего файла остаётся.
+        """
+        kept = self.upload(b"with thumbnail")
+        storage = kept.thumbnail.storage
+        used = storage.save('task_thumbnails/thumbnail.jpg', ContentFile(b"used thumbnail"))
+        orphan = storage.save('task_thumbnails/thumbnail.jpg', ContentFile(b"orphan thumbnail"))
+        File.objects.filter(id=kept.id).update(thumbnail=used)
+        call_command('gc_attachments', stdout=io.StringIO())
+        self.assertTrue(storage.exists(used))
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(kept.file.name))
+
+
+class AsyncReadAPITests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Async task", status="новая")
+        Comment.objects.create(task=self.task, text="Комментарий")
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def test_async_task_list_matches_sync(self):
+        """
+        Тест async-списка задач: данные совпадают с синхронным эндпоинтом.
+        """
+        response = await self.async_client.get(reverse('async-task-list'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sync_response = await self.async_client.get(reverse('task-list'), headers=self.headers)
+        self.assertEqual(response.json(), sync_response.json())
+
+    async def test_async_task_detail_and_comments(self):
+        """
+        Тест async-эндпоинтов детальной задачи и списка комментариев.
+        """
+        response = await self.async_client.get(
+            reverse('async-task-detail', kwargs={'pk': self.task.id}), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['comments_count'], 1)
+        response = await self.async_client.get(reverse('async-comment-list'), headers=self.headers)
+        self.assertEqual(response.json()['results'][0]['text'], "Комментарий")
+
+    async def test_async_requires_token(self):
+        """
+        Тест async-эндпоинта без токена: 401.
+        """
+        response = await self.async_client.get(reverse('async-task-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(THROTTLE_BUCKETS={'api': ('1/min', 25)}, THROTTLE_COSTS={'search': 10, 'export': 100})
+    async def test_async_is_throttled(self):
+        """
+        Тест лимитов: async-эндпоинты тратят то же ведро, что и синхронные,
+        при пустом ведре — 429 с Retry-After.
+        """
+        url = reverse('async-task-list')
+        for _ in range(2):
+            response = await self.async_client.get(url, {'search': 'задача'}, headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = await self.async_client.get(url, {'search': 'задача'}, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    async def test_async_checks_permissions(self):
+        """
+        Тест прав: permission_classes viewset применяются и к async-эндпоинтам.
+        """
+        with mock.patch.object(TaskViewSet, 'permission_classes', [permissions.IsAdminUser]):
+            response = await self.async_client.get(reverse('async-task-list'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class LoadTestTests(TransactionTestCase):
+    def test_percentile(self):
+        """
+        Тест перцентилей по методу ближайшего ранга.
+        """
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([], 0.95), 0.0)
+
+    def test_compare_with_baseline(self):
+        """
+        Тест сравнения с базовой линией: регрессией считается только
+        ухудшение сверх порога.
+        """
+        baseline = {'tasks_list': {'throughput_rps': 100, 'p95_ms': 50, 'queries_per_request': 2}}
+        ok = {'tasks_list': {'throughput_rps': 95, 'p95_ms': 54, 'queries_per_request': 2}}
+        self.assertEqual(compare_with_baseline(ok, baseline, 0.10), [])
+        slower = {'tasks_list': {'throughput_rps': 80, 'p95_ms': 40, 'queries_per_request': 3}}
+        regressions = compare_with_baseline(slower, baseline, 0.10)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('tasks_list.throughput_rps'))
+        # Сценарии без базовой линии не проверяются
+        self.assertEqual(compare_with_baseline({'login': {'p95_ms': 999}}, baseline, 0.10), [])
+
+    def test_loadtest_command_fails_on_regression(self):
+        """
+        Тест команды loadtest: при регрессии относительно базовой линии
+        команда завершается ошибкой.
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as fh:
+            fh.write('{"files_list": {"queries_per_request": 0.5, "errors": 0}}')
+            fh.flush()
+            out = io.StringIO()
+            with self.assertRaises(CommandError):
+                call_command(
+                    'loadtest', tasks=5, comments=5, requests=4, concurrency=1,
+                    scenarios=['files_list'], baseline=fh.name, stdout=out,
+                )
+        self.assertIn('files_list', out.getvalue())
+
+    def test_loadtest_removes_its_user(self):
+        """
+        Тест команды loadtest: вход проходит со случайным паролем временного
+        пользователя, после прогона пользователь удалён.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command(
+                'loadtest', tasks=1, comments=0, requests=2, concurrency=1,
+                scenarios=['login'], output=output, stdout=io.StringIO(),
+            )
+            with open(output, encoding='utf-8') as fh:
+                self.assertEqual(json.load(fh)['login']['errors'], 0)
+        self.assertFalse(User.objects.exists())
+
+    def test_rss_delta_only_for_in_process_server(self):
+        """
+        Тест памяти: прирост RSS измеряется только для сервера в этом
+        процессе, для внешнего сервера метрики нет.
+        """
+        scenario = Scenario('noop', 'GET', '/')
+        transport = mock.Mock(measures_memory=True, request=mock.Mock(return_value=(200, None)))
+        self.assertIsInstance(run_scenario(transport, scenario, 2, 1)['rss_delta_mb'], float)
+        transport.measures_memory = False
+        self.assertIsNone(run_scenario(transport, scenario, 2, 1)['rss_delta_mb'])
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0, REQUEST_METRICS_SERVER_TIMING=True)
+class InstrumentationTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+        Task.objects.create(title="Задача", status="новая")
+
+    def test_server_timing_header(self):
+        """
+        Тест заголовка Server-Timing: время БД, число запросов и сериализация.
+        """
+        response = self.client.get(reverse('task-list'))
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'serialize;dur=', 'render;dur='):
+            self.assertIn(metric, timing)
+        self.assertRegex(timing, r'desc="[1-9]\d* queries')
+
+    def test_metrics_endpoint_exposes_view_histograms(self):
+        """
+        Тест /metrics: гистограммы по view в формате Prometheus.
+        """
+        self.client.get(reverse('task-list'))
+        with override_settings(METRICS_AUTH_TOKEN='secret'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_queries_bucket{method="GET",view="task-list",le="+Inf"} 1', body)
+        self.assertIn('http_response_size_bytes_count{method="GET",view="task-list"} 1', body)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_request_is_not_recorded(self):
+        """
+        Тест выборки: при нулевой доле запрос не измеряется.
+        """
+        response = self.client.get(reverse('task-list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertNotIn('task-list', registry.render())
+
+    def test_metrics_requires_token(self):
+        """
+        Тест защиты /metrics токеном: без настроенного токена доступ закрыт.
+        """
+        with override_settings(METRICS_AUTH_TOKEN=None):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer None')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(METRICS_AUTH_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_server_timing_is_off_by_default(self):
+        """
+        Тест настроек по умолчанию: Server-Timing раскрывает время БД и число
+        запросов, поэтому включается явно.
+        """
+        with override_settings(REQUEST_METRICS_SERVER_TIMING=False):
+            self.assertFalse(self.client.get(reverse('task-list')).has_header('Server-Timing'))
+
+    def test_duplicate_queries_are_detected(self):
+        """
+        Тест обнаружения повторяющихся SQL-запросов (N+1).
+        """
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            for task in Task.objects.all():
+                list(task.comments.all())
+                list(task.comments.all())
+        finally:
+            current_metrics.reset(token)
+        self.assertEqual(metrics.queries, 3)
+        self.assertEqual(metrics.duplicates, 1)
+
+
+class FastJSONTests(BaseAPITestCase):
+    def test_renderer_matches_drf_output(self):
+        """
+        Тест FastJSONRenderer: вывод побайтно совпадает с JSONRenderer DRF,
+        включая UUID, datetime с часовым поясом и \u2028.
+        """
+        task = Task.objects.create(title="Задача\u2028", status="новая")
+        Comment.objects.create(task=task, text="Комментарий")
+        data = self.client.get(reverse('task-list')).data
+        extra = {'id': task.id, 'created_at': task.created_at, 'nested': {1: None}}
+        for payload in (data, extra):
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertTrue(FastJSONRenderer().render({'at': task.created_at}).endswith(b'Z"}'))
+
+    def test_parser_roundtrip_and_errors(self):
+        """
+        Тест FastJSONParser: разбор тела запроса и 400 на некорректный JSON.
+        """
+        self.assertEqual(FastJSONParser().parse(io.BytesIO('{"title": "Ёж"}'.encode())), {'title': 'Ёж'})
+        response = self.client.post(reverse('task-list'), data='{"title": ', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse('task-list'), data='{"title": "Новая", "status": "новая"}', content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class ValuesSerializationTests(TemporaryMediaMixin, BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        busy = Task.objects.create(title="Отчёт по релизу", description="Много комментариев", status="в работе")
+        Comment.objects.bulk_create([Comment(task=busy, text=f"Комментарий {i}") for i in range(25)])
+        self.client.post(
+            reverse('file-list'),
+            {'task': str(busy.id), 'file': io.BytesIO(b'report')},
+            format='multipart',
+        )
+        Task.objects.create(title="Пустая задача", description=None, status="новая")
+
+    def assert_same_response(self, viewset, url, params):
+        fast = self.client.get(url, params)
+        caches[settings.TASK_CACHE_ALIAS].clear()
+        with mock.patch.object(viewset, 'values_serializer_class', None):
+            slow = self.client.get(url, params)
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_task_list_is_byte_identical(self):
+        """
+        Тест values-режима списка задач: JSON побайтно совпадает с TaskSerializer.
+        """
+        cases = (
+            {}, {'status': 'в работе'}, {'search': 'отчёт'}, {'ordering': 'status'}, {'page_size': 1},
+            {'fields': 'id,title,status'}, {'expand': 'files'}, {'fields': 'title,comments_count', 'expand': 'comments'},
+        )
+        for params in cases:
+            with self.subTest(params=params):
+                self.assert_same_response(TaskViewSet, reverse('task-list'), params)
+
+    def test_comment_list_is_byte_identical(self):
+        """
+        Тест values-режима списка комментариев.
+        """
+        self.assert_same_response(CommentViewSet, reverse('comment-list'), {'page_size': 10})
+
+    def test_field_order_matches_model_serializer(self):
+        """
+        Тест порядка полей values-сериализатора задач.
+        """
+        self.assertEqual([name for name, _ in TaskValuesSerializer.fields], list(TaskSerializer().fields))
+
+    def test_task_list_query_count(self):
+        """
+        Тест числа запросов values-режима: страница и по запросу на связь.
+        """
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('task-list'))
+        busy = response.data['results'][-1]
+        self.assertEqual(len(busy['comments']), settings.TASK_NESTED_LIMIT)
+        self.assertTrue(busy['files'][0]['file'].startswith('http://testserver/'))
+
+
+class FieldSelectionAPITests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Дашборд", description="Длинное описание", status="новая")
+        Comment.objects.create(task=self.task, text="Комментарий")
+        self.tasks_url = reverse('task-list')
+
+    def test_sparse_fields_shrink_sql(self):
+        """
+        Тест ?fields=: в ответе и в SQL только выбранные поля, без связей.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.tasks_url, {'fields': 'id,title,status'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title', 'status'])
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('description', context.captured_queries[0]['sql'])
+
+    def test_expand_selects_relations(self):
+        """
+        Тест ?expand=: выводятся обычные поля и только раскрытые связи.
+        """
+        result = self.client.get(self.tasks_url, {'expand': 'comments'}).data['results'][0]
+        self.assertIn('comments', result)
+        self.assertNotIn('files', result)
+        self.assertEqual(result['description'], "Длинное описание")
+        result = self.client.get(self.tasks_url, {'fields': 'id', 'expand': 'comments'}).data['results'][0]
+        self.assertEqual(list(result), ['id', 'comments'])
+
+    def test_detail_and_async_respect_fields(self):
+        """
+        Тест выборочных полей в детальной задаче и async-эндпоинте.
+        """
+        url = reverse('task-detail', kwargs={'pk': self.task.id})
+        self.client.get(url)  # полный ответ попадает в кэш
+        self.assertEqual(list(self.client.get(url, {'fields': 'title'}).data), ['title'])
+        self.client.force_authenticate(user=None)
+        token = AccessToken.for_user(self.user)
+        response = self.client.get(
+            reverse('async-task-list'), {'fields': 'id,status'}, HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'status'])
+
+    def test_unknown_fields_are_rejected(self):
+        """
+        Тест неизвестного поля и нераскрываемой связи: 400.
+        """
+        self.assertEqual(self.client.get(self.tasks_url, {'fields': 'secret'}).status_code, 400)
+        self.assertEqual(self.client.get(self.tasks_url, {'expand': 'title'}).status_code, 400)
+
+
+class CounterTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Задача со счётчиками", status="новая")
+        self.other = Task.objects.create(title="Другая задача", status="новая")
+
+    def test_comment_and_file_counters(self):
+        """
+        Тест счётчиков: создание, перенос и удаление комментария меняют
+        comments_count и last_activity_at задачи.
+        """
+        before = Task.objects.get(pk=self.task.pk).last_activity_at
+        comment = Comment.objects.create(task=self.task, text="Первый")
+        Comment.objects.create(task=self.task, text="Второй")
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertEqual((task.comments_count, task.files_count), (2, 0))
+        self.assertGreaterEqual(task.last_activity_at, before)
+
+        comment.task = self.other
+        comment.save()
+        self.assertEqual(Task.objects.get(pk=self.task.pk).comments_count, 1)
+        self.assertEqual(Task.objects.get(pk=self.other.pk).comments_count, 1)
+        comment.delete()
+        self.assertEqual(Task.objects.get(pk=self.other.pk).comments_count, 0)
+
+    def test_task_save_keeps_counters(self):
+        """
+        Тест сохранения задачи, прочитанной до добавления комментария:
+        счётчик не перезаписывается устаревшим значением.
+        """
+        task = Task.objects.get(pk=self.task.pk)
+        Comment.objects.create(task=self.task, text="Параллельный")
+        task.title = "Новое название"
+        task.save()
+        self.assertEqual(Task.objects.get(pk=self.task.pk).comments_count, 1)
+
+    def test_status_summary(self):
+        """
+        Тест сводки по статусам: создание, смена статуса и удаление задачи.
+        """
+        self.task.status = "в работе"
+        self.task.save()
+        Task.objects.create(title="Третья", status="выполнена")
+        self.other.delete()
+        self.assertEqual(
+            counters.status_summary(),
+            {'total': 2, 'by_status': {'новая': 0, 'в работе': 1, 'выполнена': 1, 'отменена': 0}},
+        )
+
+    def test_stats_endpoint_reads_summary(self):
+        """
+        Тест эндпоинта stats: один запрос к сводке независимо от числа задач.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('task-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual(response.data['by_status']['новая'], 2)
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_counters_in_task_response(self):
+        """
+        Тест вывода счётчиков в списке и детальной задаче.
+        """
+        payload = [{"task": str(self.task.id), "text": f"Комментарий {i}"} for i in range(3)]
+        self.client.post(reverse('comment-bulk'), payload, format='json')
+        detail = self.client.get(reverse('task-detail', kwargs={'pk': self.task.id})).data
+        self.assertEqual(detail['comments_count'], 3)
+        self.assertIn('last_activity_at', detail)
+        results = self.client.get(reverse('task-list'), {'fields': 'id,comments_count'}).data['results']
+        self.assertEqual({row['id']: row['comments_count'] for row in results}[str(self.task.id)], 3)
+
+    def test_bulk_comments_update_and_delete(self):
+        """
+        Тест массовых операций: перенос комментариев в другую задачу и
+        удаление пересчитывают счётчики обеих задач.
+        """
+        comments = [Comment.objects.create(task=self.task, text=f"Комментарий {i}") for i in range(4)]
+        payload = [{"id": comment.id, "task": str(self.other.id)} for comment in comments[:3]]
+        response = self.client.patch(reverse('comment-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Task.objects.get(pk=self.task.pk).comments_count, 1)
+        self.assertEqual(Task.objects.get(pk=self.other.pk).comments_count, 3)
+        self.client.delete(reverse('comment-bulk'), {"ids": [c.id for c in comments[:2]]}, format='json')
+        self.assertEqual(Task.objects.get(pk=self.other.pk).comments_count, 1)
+
+    def test_repair_counters_command(self):
+        """
+        Тест команды repair_counters: расхождения находятся и исправляются.
+        """
+        Comment.objects.create(task=self.task, text="Комментарий")
+        Task.objects.filter(pk=self.task.pk).update(comments_count=10)
+        TaskStatusSummary.objects.filter(status="новая").update(count=0)
+        out = io.StringIO()
+        call_command('repair_counters', '--dry-run', stdout=out)
+        self.assertIn(str(self.task.pk), out.getvalue())
+        self.assertEqual(Task.objects.get(pk=self.task.pk).comments_count, 10)
+        call_command('repair_counters', stdout=io.StringIO())
+        self.assertEqual(Task.objects.get(pk=self.task.pk).comments_count, 1)
+        self.assertEqual(counters.status_summary()['by_status']['новая'], 2)
+
+
+class DatabaseSettingsTests(TestCase):
+    def test_persistent_connections_and_replicas(self):
+        """
+        Тест настроек БД из окружения: постоянные соединения с проверкой,
+        реплики с теми же учётными данными и зеркалом в тестах.
+        """
+        databases, replicas = database_settings({'DB_HOST': 'primary', 'DB_REPLICA_HOSTS': 'r1, r2'})
+        self.assertEqual(replicas, ['replica_1', 'replica_2'])
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 60)
+        self.assertTrue(databases['default']['CONN_HEALTH_CHECKS'])
+        self.assertEqual(databases['replica_2']['HOST'], 'r2')
+        self.assertEqual(databases['replica_2']['NAME'], databases['default']['NAME'])
+        self.assertEqual(databases['replica_1']['TEST'], {'MIRROR': 'default'})
+        databases, replicas = database_settings({'DB_CONN_MAX_AGE': '0', 'DB_CONN_HEALTH_CHECKS': '0'})
+        self.assertEqual(replicas, [])
+        self.assertEqual((databases['default']['CONN_MAX_AGE'], databases['default']['CONN_HEALTH_CHECKS']), (0, False))
+
+    def test_pool_disables_persistent_connections(self):
+        """
+        Тест пула соединений: включается DB_POOL_MAX_SIZE на Django 5.1+.
+        """
+        databases, _ = database_settings({'DB_POOL_MAX_SIZE': '20'})
+        pool = databases['default']['OPTIONS'].get('pool')
+        if django.VERSION >= (5, 1):
+            self.assertEqual(pool['max_size'], 20)
+            self.assertEqual(databases['default']['CONN_MAX_AGE'], 0)
+        else:
+            self.assertIsNone(pool)
+
+
+# Транзакционный тест: внутри транзакции роутер намеренно читает из основной базы
+class ReplicaRoutingTests(APITransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        caches[settings.TASK_CACHE_ALIAS].clear()
+        self.task = Task.objects.create(title="Задача", status="новая")
+
+    def test_router_uses_replica_only_for_replica_reads(self):
+        """
+        Тест роутера: реплика выбирается только внутри replica_reads() и
+        вне транзакции; запись всегда в основную базу.
+        """
+        router = routers.ReplicaRouter()
+        with override_settings(DATABASE_REPLICAS=['replica_1']):
+            self.assertIsNone(router.db_for_read(Task))
+            with routers.replica_reads():
+                self.assertEqual(router.db_for_read(Task), 'replica_1')
+                self.assertEqual(router.db_for_write(Task), 'default')
+                with transaction.atomic():
+                    self.assertIsNone(router.db_for_read(Task))
+            self.assertFalse(router.allow_migrate('replica_1', 'tasks'))
+            self.assertTrue(router.allow_migrate('default', 'tasks'))
+
+    def test_safe_methods_read_from_replica(self):
+        """
+        Тест TaskViewSet: GET читает через реплику, POST — только основная база.
+        """
+        # Роль реплики играет основная база
+        with mock.patch.object(routers, 'choose_replica', return_value='default') as choose:
+            self.assertEqual(self.client.get(reverse('task-list')).status_code, status.HTTP_200_OK)
+            self.assertTrue(choose.called)
+            choose.reset_mock()
+            response = self.client.post(reverse('task-list'), {'title': 'Новая', 'status': 'новая'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertFalse(choose.called)
+
+    @override_settings(THROTTLE_BUCKETS={})
+    def test_export_reads_from_replica_chosen_in_view(self):
+        """
+        Тест выгрузки: база выбирается во view, строки читаются уже после
+        выхода из replica_reads() без обращения к роутеру.
+        """
+        Comment.objects.create(task=self.task, text="Комментарий")
+        with mock.patch.object(routers, 'choose_replica', return_value='default') as choose:
+            response = self.client.get(reverse('task-export'))
+            self.assertTrue(choose.called)
+        with mock.patch.object(routers.ReplicaRouter, 'db_for_read', side_effect=AssertionError('роутер вызван')):
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(json.loads(lines[0])['comments'][0]['text'], "Комментарий")
+
+
+class ChangesAPITests(APITransactionTestCase):
+    # Журнал читается только до горизонта незавершённых транзакций,
+    # поэтому изменения должны коммититься
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        caches[settings.TASK_CACHE_ALIAS].clear()
+        throttling.get_store().clear()
+        self.changes_url = reverse('task-changes')
+        self.task = Task.objects.create(title="Задача", status="новая")
+
+    def get_changes(self, since):
+        response = self.client.get(self.changes_url, {'since': since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_changes_since_token(self):
+        """
+        Тест синхронизации: после токена приходят только изменённые задачи,
+        комментарии и tombstone удалённых объектов.
+        """
+        token = self.client.get(self.changes_url).data['next']
+        untouched = Task.objects.create(title="Без изменений", status="новая")
+        data = self.get_changes(token)
+        self.assertEqual([task['id'] for task in data['tasks']], [str(untouched.id)])
+        token = data['next']
+
+        comment = Comment.objects.create(task=self.task, text="Комментарий")
+        data = self.get_changes(token)
+        self.assertEqual([c['id'] for c in data['comments']], [comment.id])
+        # Счётчики задачи изменились, поэтому она тоже в ответе
+        self.assertEqual([task['id'] for task in data['tasks']], [str(self.task.id)])
+        self.assertEqual(data['tasks'][0]['comments_count'], 1)
+        self.assertNotIn('comments', data['tasks'][0])
+
+        token = data['next']
+        comment_id, task_id = comment.id, untouched.id
+        comment.delete()
+        untouched.delete()
+        data = self.get_changes(token)
+        self.assertEqual(data['deleted']['comments'], [comment_id])
+        self.assertEqual(data['deleted']['tasks'], [task_id])
+        self.assertEqual(self.get_changes(data['next'])['tasks'], [])
+
+    def test_bulk_changes_are_logged(self):
+        """
+        Тест массовых операций: bulk_status и bulk-удаление попадают в журнал.
+        """
+        token = self.client.get(self.changes_url).data['next']
+        self.client.post(reverse('task-bulk-status'), {'ids': [str(self.task.id)], 'status': 'выполнена'}, format='json')
+        data = self.get_changes(token)
+        self.assertEqual(data['tasks'][0]['status'], 'выполнена')
+        self.client.delete(reverse('task-bulk'), {'ids': [str(self.task.id)]}, format='json')
+        self.assertEqual(self.get_changes(data['next'])['deleted']['tasks'], [self.task.pk])
+
+    @override_settings(TASK_CHANGES_PAGE_SIZE=2)
+    def test_changes_paging(self):
+        """
+        Тест постраничного чтения журнала: has_more и следующий токен.
+        """
+        token = self.client.get(self.changes_url).data['next']
+        for i in range(3):
+            Task.objects.create(title=f"Задача {i}", status="новая")
+        data = self.get_changes(token)
+        self.assertTrue(data['has_more'])
+        self.assertEqual(len(data['tasks']), 2)
+        data = self.get_changes(data['next'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(len(data['tasks']), 1)
+
+    def test_invalid_token(self):
+        """
+        Тест некорректного токена: 400.
+        """
+        self.assertEqual(self.client.get(self.changes_url, {'since': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(self.changes_url, {'since': '10'}).status_code, 400)
+
+    @override_settings(TASK_CHANGES_RETENTION_DAYS=1)
+    def test_pruned_token_expires(self):
+        """
+        Тест очистки журнала: старые записи удаляются, токен до удалённых
+        записей получает 410, новый токен работает.
+        """
+        token = self.client.get(self.changes_url).data['next']
+        Task.objects.create(title="Старая", status="новая")
+        ChangeLogEntry.objects.update(changed_at=timezone.now() - timedelta(days=2))
+        Task.objects.create(title="Новая", status="новая")
+        self.assertEqual(changelog.prune_changelog(), 2)
+        self.assertEqual(ChangeLogEntry.objects.count(), 1)
+        response = self.client.get(self.changes_url, {'since': token})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(self.get_changes(self.client.get(self.changes_url).data['next'])['tasks'], [])
+
+    def test_out_of_order_commit_is_not_skipped(self):
+        """
+        Тест горизонта журнала: запись транзакции, закоммиченной позже
+        следующей за ней, не теряется — более новые записи придерживаются,
+        пока старая транзакция не завершится.
+        """
+        # Комментарии к разным задачам, чтобы транзакции не ждали блокировок друг друга
+        other = Task.objects.create(title="Другая", status="новая")
+        token = self.client.get(self.changes_url).data['next']
+        inserted, release = threading.Event(), threading.Event()
+        slow = []
+
+        def slow_writer():
+            try:
+                with transaction.atomic():
+                    slow.append(Comment.objects.create(task=self.task, text="Медленный"))
+                    inserted.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=slow_writer)
+        writer.start()
+        self.assertTrue(inserted.wait(10))
+        fast = Comment.objects.create(task=other, text="Быстрый")
+        data = self.get_changes(token)
+        self.assertEqual(data['comments'], [])
+        release.set()
+        writer.join()
+        data = self.get_changes(data['next'])
+        self.assertEqual({comment['id'] for comment in data['comments']}, {slow[0].id, fast.id})
+
+    def test_if_modified_since(self):
+        """
+        Тест Last-Modified/If-Modified-Since на детальной задаче, в том числе
+        из кэша и в async-эндпоинте.
+        """
+        url = reverse('task-detail', kwargs={'pk': self.task.id})
+        response = self.client.get(url)
+        last_modified = response['Last-Modified']
+        for _ in range(2):  # второй раз — из кэша
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        Task.objects.filter(pk=self.task.pk).update(last_activity_at=self.task.last_activity_at + timedelta(seconds=5))
+        caches[settings.TASK_CACHE_ALIAS].clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, status.HTTP_200_OK)
+
+        token = AccessToken.for_user(self.user)
+        self.client.force_authenticate(user=None)
+        response = self.client.get(
+            reverse('async-task-detail', kwargs={'pk': self.task.id}),
+            HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_IF_MODIFIED_SINCE=last_modified,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(
+            reverse('async-task-detail', kwargs={'pk': self.task.id}),
+            HTTP_AUTHORIZATION=f'Bearer {token}', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class JobQueueTests(TemporaryMediaMixin, BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Задача с вложениями", status="новая")
+
+    def upload(self, content, suffix='.txt'):
+        response = self.client.post(
+            reverse('file-list'),
+            {'task': str(self.task.id), 'file': SimpleUploadedFile('attachment' + suffix, content)},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def test_upload_is_processed_in_background(self):
+        """
+        Тест фоновой обработки: загрузка только ставит задачу в очередь,
+        воркер считает SHA-256 и извлекает текст для поиска по файлам.
+        """
+        content = 'Отчёт о миграции базы данных'.encode()
+        data = self.upload(content)
+        self.assertEqual(data['processing_status'], 'pending')
+        self.assertEqual(Job.objects.filter(name='process_file', payload={'file_id': data['id']}).count(), 1)
+
+        call_command('run_jobs', '--burst', stdout=io.StringIO())
+        file_obj = File.objects.get(pk=data['id'])
+        self.assertEqual(file_obj.processing_status, 'ready')
+        self.assertEqual(file_obj.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(file_obj.extracted_text, 'Отчёт о миграции базы данных')
+        self.assertFalse(Job.objects.exists())
+        results = self.client.get(reverse('file-list'), {'search': 'миграции'}).data
+        self.assertEqual([item['id'] for item in results], [data['id']])
+        self.assertNotIn('extracted_text', results[0])
+
+    def test_infected_file(self):
+        """
+        Тест проверки на вирусы: тестовая сигнатура EICAR помечает файл.
+        """
+        data = self.upload(b'X5O!P%@AP[4\\PZX54(P^)7CC)7}$EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*', '.com')
+        url = reverse('file-download', kwargs={'pk': data['id']})
+        # До проверки файл не отдаётся
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_409_CONFLICT)
+        call_command('run_jobs', '--burst', stdout=io.StringIO())
+        self.assertEqual(File.objects.get(pk=data['id']).processing_status, 'infected')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['processing_status'], 'infected')
+
+    def test_run_pending_honours_stop(self):
+        """
+        Тест остановки воркера: после сигнала очередная задача не забирается.
+        """
+        stop = threading.Event()
+        handler = jobs.Handler(mock.Mock(side_effect=lambda **payload: stop.set()), 'stopper')
+        with mock.patch.dict(jobs.HANDLERS, {'stopper': handler}):
+            for value in range(3):
+                jobs.enqueue('stopper', {'value': value})
+            self.assertEqual(jobs.run_pending('test', stop=stop), 1)
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 2)
+
+    def test_retry_with_backoff_then_fail(self):
+        """
+        Тест повторов: упавшая задача откладывается, после последней
+        попытки остаётся со статусом failed и вызывает on_failure.
+        """
+        on_failure = mock.Mock()
+        handler = jobs.Handler(mock.Mock(side_effect=RuntimeError('сбой')), 'flaky', on_failure=on_failure)
+        with mock.patch.dict(jobs.HANDLERS, {'flaky': handler}):
+            job = jobs.enqueue('flaky', {'value': 1}, max_attempts=2)
+            self.assertEqual(jobs.run_pending('test'), 1)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+            self.assertGreater(job.run_at, timezone.now())
+            self.assertIn('сбой', job.last_error)
+            # Пауза ещё не прошла
+            self.assertEqual(jobs.run_pending('test'), 0)
+
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            jobs.run_pending('test')
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        handler.func.assert_called_with(value=1)
+        on_failure.assert_called_once()
+
+    def test_stale_running_job_is_reclaimed(self):
+        """
+        Тест зависшего воркера: задача с истёкшей блокировкой снова доступна.
+        """
+        with mock.patch.dict(jobs.HANDLERS, {'noop': jobs.Handler(mock.Mock(), 'noop')}):
+            job = jobs.enqueue('noop')
+            self.assertEqual([claimed.pk for claimed in jobs.claim('first')], [job.pk])
+            self.assertEqual(jobs.claim('second'), [])
+            Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT + 1))
+            self.assertEqual([claimed.locked_by for claimed in jobs.claim('second')], ['second'])
+
+
+class RunJobsProcessTests(TransactionTestCase):
+    def test_processes_report_results(self):
+        """
+        Тест run_jobs с несколькими процессами: результаты процессов
+        суммируются.
+        """
+        out = io.StringIO()
+        call_command('run_jobs', '--burst', '--processes', '2', '--poll-interval', '0.1', stdout=out)
+        self.assertIn('Выполнено задач: 0', out.getvalue())
+
+    def test_dead_process_does_not_block_parent(self):
+        """
+        Тест упавшего процесса воркера: родитель не ждёт его результат вечно,
+        а завершается ошибкой с кодом выхода процесса.
+        """
+        def crash(index, *args):
+            os._exit(3)
+
+        with mock.patch.object(run_jobs, 'run_process', side_effect=crash), \
+                self.assertLogs('tasks.jobs', level='ERROR'):
+            with self.assertRaisesMessage(CommandError, 'код 3'):
+                call_command('run_jobs', '--burst', '--processes', '2', '--poll-interval', '0.1', stdout=io.StringIO())
+
+
+class ChunkedDeletionTests(TemporaryMediaMixin, BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Большая задача", status="отменена")
+        Comment.objects.bulk_create([Comment(task=self.task, text=f"Комментарий {i}") for i in range(25)])
+        self.file = File(task=self.task)
+        self.file.file.save('attachment.txt', ContentFile(b'attachment for deletion'), save=False)
+        self.file.save()
+        self.keep = Task.objects.create(title="Остаётся", status="новая")
+        Comment.objects.create(task=self.keep, text="Не трогать")
+
+    @override_settings(DELETE_CHUNK_SIZE=10)
+    def test_delete_task_in_chunks(self):
+        """
+        Тест удаления задачи: запрос только помечает задачу удалённой
+        (журнал и сводка обновлены сразу), комментарии удаляет пачками без
+        загрузки объектов фоновая задача, блоб освобождается следом.
+        """
+        token = log_position()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(reverse('task-detail', kwargs={'pk': self.task.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse([q for q in context.captured_queries if q['sql'].startswith('DELETE')])
+        self.assertFalse(Task.objects.filter(pk=self.task.pk).exists())
+        self.assertEqual(
+            self.client.get(reverse('task-detail', kwargs={'pk': self.task.id})).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+        self.assertEqual(counters.status_summary()['by_status']['отменена'], 0)
+        latest = logged_changes(token)
+        self.assertEqual(latest['task'], {str(self.task.pk): ChangeLogEntry.DELETE})
+        self.assertEqual(Job.objects.get(name='purge_deleted_tasks').payload, {'task_ids': [str(self.task.pk)]})
+
+        storage = self.file.file.storage
+        with mock.patch.object(Comment, 'from_db', side_effect=AssertionError('объект загружен')), \
+                CaptureQueriesContext(connection) as context, \
+                override_settings(ATTACHMENT_GC_GRACE_SECONDS=0):
+            call_command('run_jobs', '--burst', stdout=io.StringIO())
+        deletes = [q for q in context.captured_queries if q['sql'].startswith('DELETE FROM "tasks_comment"')]
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(Task._base_manager.filter(pk=self.task.pk).exists())
+        self.assertEqual(list(Comment.objects.values_list('text', flat=True)), ["Не трогать"])
+        self.assertFalse(storage.exists(self.file.file.name))
+        self.assertEqual(counters.status_summary()['by_status']['отменена'], 0)
+        self.assertFalse(Job.objects.exists())
+
+    def test_children_hidden_before_purge(self):
+        """
+        Тест: комментарии и файлы удалённой задачи пропадают из API сразу,
+        ещё до фоновой очистки.
+        """
+        self.client.delete(reverse('task-detail', kwargs={'pk': self.task.id}))
+        self.assertEqual(Comment.objects.filter(task_id=self.task.pk).count(), 25)
+        comments = get_response_results(self.client.get(reverse('comment-list'), {'page_size': 100}).data)
+        self.assertEqual([comment['text'] for comment in comments], ["Не трогать"])
+        self.assertEqual(get_response_results(self.client.get(reverse('file-list')).data), [])
+        response = self.client.get(reverse('file-detail', kwargs={'pk': self.file.pk}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(DELETE_CHUNK_SIZE=10)
+    def test_interrupted_purge_keeps_counters(self):
+        """
+        Тест прерванной очистки: каждая удалённая пачка уменьшает счётчик
+        задачи в своей транзакции, повтор дочищает остальное.
+        """
+        # Комментарии созданы bulk_create без сигналов
+        Task.objects.filter(pk=self.task.pk).update(comments_count=25)
+        deletion.delete_tasks([self.task.pk], purge=False)
+        raw_delete = deletion.raw_delete
+        calls = []
+
+        def fail_second_chunk(queryset):
+            if calls:
+                raise RuntimeError('сбой')
+            calls.append(queryset)
+            return raw_delete(queryset)
+
+        with mock.patch.object(deletion, 'raw_delete', side_effect=fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                deletion.purge_deleted_tasks([self.task.pk])
+        task = Task._base_manager.get(pk=self.task.pk)
+        self.assertEqual((Comment.objects.filter(task=task).count(), task.comments_count), (15, 15))
+        deletion.purge_deleted_tasks([self.task.pk])
+        self.assertFalse(Task._base_manager.filter(pk=self.task.pk).exists())
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_purge_tasks_command(self):
+        """
+        Тест purge_tasks: удаляются только задачи со статусом и возрастом
+        из фильтра.
+        """
+        Task.objects.filter(pk=self.task.pk).update(last_activity_at=timezone.now() - timedelta(days=40))
+        fresh = Task.objects.create(title="Свежая отменённая", status="отменена")
+        out = io.StringIO()
+        call_command('purge_tasks', '--status', 'отменена', '--older-than-days', '30', '--dry-run', stdout=out)
+        self.assertIn('Будет удалено задач: 1', out.getvalue())
+        call_command('purge_tasks', '--status', 'отменена', '--older-than-days', '30', stdout=io.StringIO())
+        self.assertEqual(set(Task.objects.values_list('pk', flat=True)), {self.keep.pk, fresh.pk})
+        self.assertEqual(Comment.objects.count(), 1)
+        with self.assertRaises(CommandError):
+            call_command('purge_tasks')
+
+
+# Выгрузка стоит 100 токенов лимита: лимиты проверяются в ThrottlingTests
+@override_settings(THROTTLE_BUCKETS={})
+class ExportImportTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Выгрузка", description="строка\tс табуляцией", status="в работе")
+        Comment.objects.bulk_create([Comment(task=self.task, text=f"Комментарий {i}") for i in range(5)])
+        self.empty = Task.objects.create(title="Без комментариев", status="выполнена")
+        self.url = reverse('task-export')
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_export_ndjson(self):
+        """
+        Тест экспорта NDJSON: задача с комментариями на строку, даты в формате
+        API; фильтр ?status= учитывается, некорректный формат — 400.
+        """
+        lines = [json.loads(line) for line in self.export().splitlines()]
+        by_id = {line['id']: line for line in lines}
+        self.assertEqual(set(by_id), {str(self.task.id), str(self.empty.id)})
+        exported = by_id[str(self.task.id)]
+        self.assertEqual([c['text'] for c in exported['comments']], [f"Комментарий {i}" for i in range(5)])
+        self.assertEqual(by_id[str(self.empty.id)]['comments'], [])
+        detail = self.client.get(reverse('task-detail', kwargs={'pk': self.task.id})).json()
+        self.assertEqual(exported['created_at'], detail['created_at'])
+
+        lines = self.export(status='выполнена').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [str(self.empty.id)])
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    async def test_export_under_asgi_streams_asynchronously(self):
+        """
+        Тест выгрузки под ASGI: ответ отдаётся асинхронным итератором, а не
+        читается Django целиком в память.
+        """
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        response = await self.async_client.get(self.url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(sum(len(json.loads(line)['comments']) for line in lines), 5)
+
+    def test_export_csv(self):
+        """
+        Тест экспорта CSV: строка на комментарий, задача без комментариев —
+        одна строка с пустыми колонками комментария.
+        """
+        rows = list(csv.DictReader(io.StringIO(self.export(output='csv').decode())))
+        self.assertEqual(len(rows), 6)
+        empty = [row for row in rows if row['task_id'] == str(self.empty.id)]
+        self.assertEqual(len(empty), 1)
+        self.assertEqual(empty[0]['comment_text'], '')
+        self.assertEqual({row['description'] for row in rows if row['comment_id']}, {"строка\tс табуляцией"})
+
+    def test_import_round_trip(self):
+        """
+        Тест import_tasks: выгрузка загружается в чистую базу с теми же id
+        и датами, счётчики, сводка и журнал изменений обновлены.
+        """
+        exported = self.export()
+        created_at = Task.objects.get(pk=self.task.pk).created_at
+        Task.objects.all().delete()
+        token = log_position()
+        with tempfile.NamedTemporaryFile(suffix='.ndjson') as stream:
+            stream.write(exported)
+            stream.flush()
+            out = io.StringIO()
+            call_command('import_tasks', stream.name, '--batch-size', '1', stdout=out)
+        self.assertIn('Импортировано задач: 2, комментариев: 5', out.getvalue())
+
+        task = Task.objects.get(pk=self.task.pk)
+        self.assertEqual(task.created_at, created_at)
+        self.assertEqual(task.description, "строка\tс табуляцией")
+        self.assertEqual(task.comments_count, 5)
+        self.assertEqual(Comment.objects.filter(task=task).count(), 5)
+        self.assertEqual(counters.repair_tasks([task.pk, self.empty.pk], fix=False), [])
+        summary = counters.status_summary()['by_status']
+        self.assertEqual((summary['в работе'], summary['выполнена']), (1, 1))
+        latest = logged_changes(token)
+        self.assertEqual(len(latest['task']), 2)
+        self.assertEqual(len(latest['comment']), 5)
+
+    def test_import_errors(self):
+        """
+        Тест import_tasks: конфликт id без --new-ids и некорректная строка —
+        ошибка команды; с --new-ids выгрузка копируется.
+        """
+        with tempfile.NamedTemporaryFile(suffix='.ndjson') as stream:
+            stream.write(self.export())
+            stream.flush()
+            with self.assertRaises(CommandError):
+                call_command('import_tasks', stream.name, stdout=io.StringIO())
+            call_command('import_tasks', stream.name, '--new-ids', stdout=io.StringIO())
+        self.assertEqual(Task.objects.filter(title="Выгрузка").count(), 2)
+
+        with tempfile.NamedTemporaryFile(suffix='.ndjson') as stream:
+            stream.write(b'{"title": "ok"}\n{"title": "bad", "status": "???"}\n')
+            stream.flush()
+            with self.assertRaisesMessage(CommandError, 'строка 2'):
+                call_command('import_tasks', stream.name, stdout=io.StringIO())
+
+
+class FakeRedis:
+    """
+    Заменяет Redis в тестах: eval выполняет ту же логику ведра, что и
+    Lua-скрипт, над общим словарём.
+    """
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def eval(self, script, numkeys, key, rate, capacity, cost):
+        with self.lock:
+            state, allowed, wait = throttling.take_tokens(self.buckets.get(key), time.monotonic(), rate, capacity, cost)
+            self.buckets[key] = state
+        return [int(allowed), str(wait)]
+
+    def scan_iter(self, match):
+        return [key for key in self.buckets if key.startswith(match.rstrip('*'))]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.buckets.pop(key, None)
+
+
+shared_redis = FakeRedis()
+
+
+class SharedBucketStore(throttling.RedisBucketStore):
+    def __init__(self):
+        super().__init__(client=shared_redis)
+
+
+@override_settings(THROTTLE_BUCKETS={'api': ('1/min', 25)}, THROTTLE_COSTS={'search': 10, 'export': 100})
+class ThrottlingTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('task-list')
+
+    def test_search_costs_more_tokens(self):
+        """
+        Тест token bucket: поиск стоит 10 токенов, обычный список — 1;
+        при пустом ведре — 429 с Retry-After.
+        """
+        for _ in range(2):
+            self.assertEqual(self.client.get(self.url, {'search': 'отчёт'}).status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url, {'search': 'отчёт'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        for _ in range(5):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLE_STORE='tasks.tests.SharedBucketStore')
+    def test_shared_store(self):
+        """
+        Тест общего хранилища: ведро пользователя общее для всех воркеров
+        (здесь — два экземпляра хранилища над одним фейковым Redis).
+        """
+        throttling.get_store().clear()
+        self.client.get(self.url, {'search': 'отчёт'})
+        self.assertIn(f'throttle:api:user:{self.user.pk}', shared_redis.buckets)
+        other_worker = SharedBucketStore()
+        self.assertEqual(other_worker.take(f'api:user:{self.user.pk}', 1 / 60, 25, 10), (True, 0.0))
+        self.assertEqual(self.client.get(self.url, {'search': 'отчёт'}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_refill(self):
+        """
+        Тест пополнения ведра со временем и ограничения ёмкостью.
+        """
+        state, allowed, _ = throttling.take_tokens(None, 0.0, 2.0, 10, 10)
+        self.assertTrue(allowed)
+        state, allowed, wait = throttling.take_tokens(state, 1.0, 2.0, 10, 5)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.5)
+        state, allowed, _ = throttling.take_tokens(state, 100.0, 2.0, 10, 10)
+        self.assertTrue(allowed)
+        self.assertEqual(state, (0, 100.0))
+
+
+class ConcurrencyLimitTests(TestCase):
+    def run_blocked(self, middleware, request):
+        """
+        Запускает запрос в потоке и ждёт, пока он займёт слот.
+        """
+        started = threading.Event()
+        thread = threading.Thread(target=middleware, args=(request,))
+        middleware.started = started
+        thread.start()
+        self.assertTrue(started.wait(5))
+        return thread
+
+    @override_settings(MAX_CONCURRENT_REQUESTS=2, MAX_CONCURRENT_REQUESTS_PER_CLIENT=1)
+    def test_sheds_load(self):
+        """
+        Тест ограничения одновременности: второй запрос того же клиента —
+        429, запрос сверх лимита процесса — 503; после завершения слоты
+        освобождаются.
+        """
+        release = threading.Event()
+
+        def get_response(request):
+            middleware.started.set()
+            release.wait(5)
+            return HttpResponse('ok')
+
+        middleware = throttling.ConcurrencyLimitMiddleware(get_response)
+        factory = RequestFactory()
+        first = self.run_blocked(middleware, factory.get('/api/tasks/', REMOTE_ADDR='10.0.0.1'))
+        response = middleware(factory.get('/api/tasks/', REMOTE_ADDR='10.0.0.1'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        second = self.run_blocked(middleware, factory.get('/api/tasks/', REMOTE_ADDR='10.0.0.2'))
+        self.assertEqual(middleware(factory.get('/api/tasks/', REMOTE_ADDR='10.0.0.3')).status_code, 503)
+        middleware.started = threading.Event()
+        release.set()
+        first.join()
+        second.join()
+        self.assertEqual((middleware.active, dict(middleware.clients)), (0, {}))
+        self.assertEqual(middleware(factory.get('/api/tasks/', REMOTE_ADDR='10.0.0.3')).status_code, 200)
+
+    @override_settings(MAX_CONCURRENT_REQUESTS=1)
+    def test_streaming_holds_slot(self):
+        """
+        Тест потокового ответа: слот занят, пока ответ не отдан и не закрыт.
+        """
+        middleware = throttling.ConcurrencyLimitMiddleware(lambda request: StreamingHttpResponse(iter([b'a', b'b'])))
+        response = middleware(RequestFactory().get('/api/tasks/export/'))
+        self.assertEqual(middleware.active, 1)
+        self.assertEqual(middleware(RequestFactory().get('/api/tasks/')).status_code, 503)
+        b''.join(response.streaming_content)
+        response.close()
+        self.assertEqual(middleware.active, 0)
+        # Оборванная отдача: слот освобождается при закрытии ответа
+        response = middleware(RequestFactory().get('/api/tasks/export/'))
+        next(iter(response))
+        response.close()
+        self.assertEqual(middleware.active, 0)
+
+    def test_client_key(self):
+        """
+        Тест ключа клиента: пользователь из проверенного access-токена;
+        случайный заголовок Authorization и X-Forwarded-For без доверенных
+        прокси не дают нового ключа.
+        """
+        user = User.objects.create_user(username='client', password='testpassword')
+        middleware = throttling.ConcurrencyLimitMiddleware(lambda request: HttpResponse('ok'))
+        factory = RequestFactory()
+        token = AccessToken.for_user(user)
+        request = factory.get('/api/tasks/', REMOTE_ADDR='10.0.0.1', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(middleware.client_key(request), f'user:{user.pk}')
+        for header in ('Bearer random', 'Bearer a b', 'Basic abc', f'Bearer {token}x'):
+            request = factory.get('/api/tasks/', REMOTE_ADDR='10.0.0.1', HTTP_AUTHORIZATION=header)
+            self.assertEqual(middleware.client_key(request), 'ip:10.0.0.1')
+        request = factory.get('/api/tasks/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.4')
+        self.assertEqual(middleware.client_key(request), 'ip:10.0.0.1')
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            self.assertEqual(middleware.client_key(request), 'ip:1.2.3.4')
+
+
+class TransitionAPITests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Task.objects.create(title="Задача", status="новая")
+        self.url = reverse('task-transition', args=[self.task.id])
+
+    def test_allowed_transition(self):
+        """
+        Тест разрешённого перехода: один условный UPDATE задачи, версия
+        растёт, сводка по статусам обновляется.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(self.url, {'status': 'в работе'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {'id': str(self.task.id), 'status': 'в работе', 'previous_status': 'новая', 'version': 1},
+        )
+        task_updates = [q for q in context.captured_queries if q['sql'].startswith('UPDATE "tasks_task" ')]
+        self.assertEqual(len(task_updates), 1)
+        self.assertNotIn('FOR UPDATE', ' '.join(q['sql'] for q in context.captured_queries))
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.status, self.task.version), ('в работе', 1))
+        self.assertEqual(counters.status_summary()['by_status']['в работе'], 1)
+        self.assertEqual(self.client.get(reverse('task-detail', args=[self.task.id])).data['version'], 1)
+
+    def test_forbidden_transition(self):
+        """
+        Тест запрещённого перехода: 409 с текущим статусом, задача не меняется;
+        запрещённая пара с expected_status отклоняется валидацией.
+        """
+        response = self.client.post(self.url, {'status': 'выполнена'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual((response.data['status'], response.data['version']), ('новая', 0))
+        response = self.client.post(self.url, {'status': 'выполнена', 'expected_status': 'новая'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.status, self.task.version), ('новая', 0))
+
+    def test_expected_version_conflict(self):
+        """
+        Тест оптимистичной блокировки: изменение задачи увеличивает версию,
+        переход с устаревшей версией — 409.
+        """
+        response = self.client.patch(reverse('task-detail', args=[self.task.id]), {'title': 'Другое'}, format='json')
+        self.assertEqual(response.data['version'], 1)
+        response = self.client.post(self.url, {'status': 'в работе', 'expected_version': 0}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual((response.data['status'], response.data['version']), ('новая', 1))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                self.url, {'status': 'в работе', 'expected_status': 'новая', 'expected_version': 1}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], 2)
+        # Новая версия вычисляется из совпавшей строки, без чтения задачи
+        self.assertFalse([q for q in context.captured_queries if q['sql'].startswith('SELECT') and 'FROM "tasks_task"' in q['sql']])
+
+    def test_conditional_update(self):
+        """
+        Тест условного PUT/PATCH: If-Match с устаревшей версией — 412,
+        поле `version` — 409, задача при этом не меняется.
+        """
+        url = reverse('task-detail', args=[self.task.id])
+        response = self.client.patch(url, {'title': 'Первое'}, format='json', HTTP_IF_MATCH='"0"')
+        self.assertEqual((response.status_code, response.data['version']), (status.HTTP_200_OK, 1))
+        response = self.client.patch(url, {'title': 'Устаревшее'}, format='json', HTTP_IF_MATCH='"0"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response.data['version'], 1)
+        response = self.client.put(
+            url, {'title': 'Устаревшее', 'status': 'новая', 'version': 0}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.title, self.task.version), ('Первое', 1))
+        response = self.client.put(url, {'title': 'Второе', 'status': 'новая', 'version': 1}, format='json')
+        self.assertEqual((response.status_code, response.data['version']), (status.HTTP_200_OK, 2))
+        response = self.client.patch(url, {'version': 'abc'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_if_match_with_etag_from_get(self):
+        """
+        Тест GET -> PATCH: ETag детальной задачи подходит для If-Match, ответ
+        на запись несёт ETag, совпадающий со следующим GET; устаревший ETag — 412.
+        """
+        url = reverse('task-detail', args=[self.task.id])
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch(url, {'title': 'Первое'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], self.client.get(url)['ETag'])
+        response = self.client.patch(url, {'title': 'Второе'}, format='json', HTTP_IF_MATCH=response['ETag'])
+        self.assertEqual((response.status_code, response.data['version']), (status.HTTP_200_OK, 2))
+        response = self.client.patch(url, {'title': 'Устаревшее'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_bulk_operations_increment_version(self):
+        """
+        Тест массовых операций: bulk-status и массовое обновление тоже
+        увеличивают версию.
+        """
+        self.client.post(reverse('task-bulk-status'), {'ids': [str(self.task.id)], 'status': 'выполнена'}, format='json')
+        response = self.client.patch(reverse('task-bulk'), [{'id': str(self.task.id), 'title': 'Другое'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.version, 2)
+
+    def test_missing_task(self):
+        """
+        Тест несуществующей задачи и некорректного id: 404.
+        """
+        response = self.client.post(reverse('task-transition', args=[uuid.uuid4()]), {'status': 'в работе'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(reverse('task-transition', args=['abc']), {'status': 'в работе'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TransitionConcurrencyTests(TransactionTestCase):
+    threads = 8
+    transitions_per_thread = 20
+    saves_per_thread = 10
+
+    def test_no_lost_updates(self):
+        """
+        Нагрузочный тест: потоки одновременно переключают статус задачи
+        переходами и сохраняют её название. Каждое успешное изменение
+        увеличивает версию ровно на единицу, а сводка по статусам сходится.
+        """
+        task = Task.objects.create(title="Задача", status="новая")
+        results = []
+        barrier = threading.Barrier(self.threads)
+
+        def switch_status():
+            done = 0
+            try:
+                barrier.wait(10)
+                while done < self.transitions_per_thread:
+                    current = Task.objects.values_list('status', flat=True).get(pk=task.pk)
+                    target = 'в работе' if current == 'новая' else 'новая'
+                    try:
+                        transitions.transition(task.pk, target, expected_status=current)
+                    except transitions.TransitionError:
+                        continue
+                    done += 1
+            finally:
+                results.append(('transition', done))
+                connection.close()
+
+        def rename():
+            done = 0
+            try:
+                barrier.wait(10)
+                for i in range(self.saves_per_thread):
+                    instance = Task.objects.get(pk=task.pk)
+                    instance.title = f"Задача {i}"
+                    instance.save(update_fields=['title'])
+                    done += 1
+            finally:
+                results.append(('save', done))
+                connection.close()
+
+        workers = [
+            threading.Thread(target=rename if i % 4 == 0 else switch_status) for i in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+
+        switched = sum(done for kind, done in results if kind == 'transition')
+        saved = sum(done for kind, done in results if kind == 'save')
+        self.assertEqual(switched, 6 * self.transitions_per_thread)
+        self.assertEqual(saved, 2 * self.saves_per_thread)
+        task.refresh_from_db()
+        self.assertEqual(task.version, switched + saved)
+        self.assertEqual(task.status, 'новая' if switched % 2 == 0 else 'в работе')
+        by_status = counters.status_summary()['by_status']
+        self.assertEqual((by_status['новая'], by_status['в работе']), (1, 0) if task.status == 'новая' else (0, 1))
@@ -0,0 +1,303 @@
+"""
+Потоковый экспорт и импорт задач с комментариями.
+
+Экспорт (/api/tasks/export/) читает задачи и комментарии двумя
+серверными курсорами (.iterator(chunk_size=EXPORT_CHUNK_SIZE)), оба
+упорядочены по id задачи, и сливает их как при merge join. В памяти
+находится не больше пачки строк каждого курсора и комментарии одной
+задачи, поэтому память не зависит от числа задач. Строки выдаёт генератор
+для StreamingHttpResponse: NDJSON (задача с комментариями на строку) или
+CSV (строка на комментарий, задача без комментариев — одна строка). Под
+ASGI Django 4.2 читает синхронный итератор ответа целиком, поэтому там
+генератор оборачивается в асинхронный (aiter_lines).
+
+Импорт (команда import_tasks) читает тот же NDJSON и вставляет задачи и
+комментарии пачками: в PostgreSQL через COPY, в остальных СУБД через
+executemany. Счётчики, сводка по статусам и журнал изменений обновляются
+в транзакции каждой пачки.
+"""
+import csv
+import io
+import itertools
+import json
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import changelog, counters
+from .cache import invalidate_tasks
+from .models import ChangeLogEntry, Comment, Task
+from .renderers import dumps, orjson
+from .values import ValuesSerializer
+
+CSV_HEADER = (
+    'task_id', 'title', 'description', 'status', 'created_at', 'updated_at', 'last_activity_at',
+    'comment_id', 'comment_text', 'comment_created_at',
+)
+
+# Колонки, которые импорт не заполняет: search_vector пишет триггер (миграция 0003)
+IMPORT_EXCLUDE = {'search_vector'}
+
+STATUSES = {value for value, _ in Task.STATUS_CHOICES}
+
+loads = orjson.loads if orjson is not None else json.loads
+
+
+class ExportTaskSerializer(ValuesSerializer):
+    model = Task
+    fields = (
+        ('id', 'id'),
+        ('title', 'title'),
+        ('description', 'description'),
+        ('status', 'status'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+        ('last_activity_at', 'last_activity_at'),
+    )
+
+    def convert_id(self, value):
+        return str(value)
+
+    convert_created_at = convert_updated_at = convert_last_activity_at = ValuesSerializer.convert_datetime
+
+
+class ExportCommentSerializer(ValuesSerializer):
+    model = Comment
+    fields = (('id', 'id'), ('text', 'text'), ('created_at', 'created_at'))
+
+    convert_created_at = ValuesSerializer.convert_datetime
+
+
+def iter_tasks(queryset, chunk_size=None):
+    """
+    Выдаёт пары (задача, комментарии) по выборке задач в порядке id, строки
+    уже приведены к формату API. Комментарии читаются из той же базы, что и
+    задачи (queryset.db).
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    task_serializer = ExportTaskSerializer()
+    comment_serializer = ExportCommentSerializer()
+    tasks = queryset.order_by('pk').values(*task_serializer.columns).iterator(chunk_size=chunk_size)
+    comments = (
+        Comment.objects.using(queryset.db).filter(task__in=queryset.order_by().values('pk'))
+        .order_by('task_id', 'created_at', 'id')
+        .values('task_id', *comment_serializer.columns)
+        .iterator(chunk_size=chunk_size)
+    )
+    pending = next(comments, None)
+    for task in tasks:
+        # Обе выборки упорядочены по id задачи: берём комментарии текущей
+        # задачи и пропускаем комментарии задач, созданных во время выгрузки
+        while pending is not None and pending['task_id'] < task['id']:
+            pending = next(comments, None)
+        rows = []
+        while pending is not None and pending['task_id'] == task['id']:
+            rows.append(pending)
+            pending = next(comments, None)
+        yield task_serializer.to_representation([task])[0], comment_serializer.to_representation(rows)
+
+
+def ndjson_lines(queryset, chunk_size=None):
+    for task, comments in iter_tasks(queryset, chunk_size):
+        yield dumps({**task, 'comments': comments}) + b'\n'
+
+
+class Echo:
+    """
+    Псевдофайл для csv.writer: write() возвращает строку, а не пишет её.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_lines(queryset, chunk_size=None):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for task, comments in iter_tasks(queryset, chunk_size):
+        columns = [task[name] for name in ('id', 'title', 'description', 'status', 'created_at', 'updated_at', 'last_activity_at')]
+        if not comments:
+            yield writer.writerow([*columns, '', '', ''])
+        for comment in comments:
+            yield writer.writerow([*columns, comment['id'], comment['text'], comment['created_at']])
+
+
+async def aiter_lines(lines, batch_size=None):
+    """
+    Асинхронный итератор по генератору строк для ответа под ASGI. Строки
+    читаются пачками по EXPORT_CHUNK_SIZE в потоке синхронного кода запроса
+    (thread_sensitive), поэтому серверные курсоры остаются на его соединении.
+    """
+    batch_size = batch_size or settings.EXPORT_CHUNK_SIZE
+    next_batch = sync_to_async(lambda: list(itertools.islice(lines, batch_size)), thread_sensitive=True)
+    try:
+        while batch := await next_batch():
+            for line in batch:
+                yield line
+    finally:
+        await sync_to_async(lines.close, thread_sensitive=True)()
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def parse_time(value, field, default=None):
+    if value in (None, ''):
+        return default
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise InvalidRow(f'{field}: некорректная дата {value!r}')
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def build_objects(data, new_ids=False, now=None):
+    """
+    Превращает строку NDJSON экспорта в несохранённые Task и Comment.
+    """
+    if not isinstance(data, dict):
+        raise InvalidRow('ожидается объект JSON')
+    title = data.get('title')
+    if not isinstance(title, str) or not title or len(title) > Task._meta.get_field('title').max_length:
+        raise InvalidRow('title: обязательная строка до 255 символов')
+    status = data.get('status', 'новая')
+    if status not in STATUSES:
+        raise InvalidRow(f'status: неизвестный статус {status!r}')
+    description = data.get('description')
+    if description is not None and not isinstance(description, str):
+        raise InvalidRow('description: ожидается строка')
+    comments = data.get('comments') or []
+    if not isinstance(comments, list):
+        raise InvalidRow('comments: ожидается список')
+    try:
+        task_id = uuid.uuid4() if new_ids or not data.get('id') else uuid.UUID(str(data['id']))
+    except ValueError:
+        raise InvalidRow(f'id: некорректный UUID {data["id"]!r}')
+
+    now = now or timezone.now()
+    created_at = parse_time(data.get('created_at'), 'created_at', now)
+    updated_at = parse_time(data.get('updated_at'), 'updated_at', created_at)
+    task = Task(
+        id=task_id, title=title, description=description, status=status,
+        created_at=created_at, updated_at=updated_at,
+        last_activity_at=parse_time(data.get('last_activity_at'), 'last_activity_at', updated_at),
+        comments_count=len(comments),
+    )
+    children = []
+    for item in comments:
+        if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+            raise InvalidRow('comments: у комментария должно быть текстовое поле text')
+        children.append(Comment(
+            task_id=task_id, text=item['text'],
+            created_at=parse_time(item.get('created_at'), 'comments.created_at', now),
+        ))
+    if children:
+        task.last_activity_at = max(task.last_activity_at, *(comment.created_at for comment in children))
+    return task, children
+
+
+def insert_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if field is not model._meta.auto_field and field.name not in IMPORT_EXCLUDE
+    ]
+
+
+def copy_value(value):
+    """
+    Значение для текстового формата COPY: NULL как \\N, спецсимволы экранированы.
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (
+        str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
+    )
+
+
+def insert_rows(model, objs):
+    """
+    Вставляет объекты как есть, без pre_save полей (auto_now и
+    auto_now_add не перезаписывают импортированные даты) и без сигналов.
+    """
+    if not objs:
+        return
+    fields = insert_fields(model)
+    rows = [[field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] for obj in objs]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            sql = f'COPY {table} ({columns}) FROM STDIN'
+            if hasattr(cursor.cursor, 'copy_expert'):
+                # psycopg2
+                buffer = io.StringIO(''.join('\t'.join(map(copy_value, row)) + '\n' for row in rows))
+                # Вызов мимо CursorWrapper: ошибки драйвера переводим в
+                # исключения Django (IntegrityError и т. п.) сами
+                with connection.wrap_database_errors:
+                    cursor.cursor.copy_expert(sql, buffer)
+            else:
+                # psycopg 3
+                with connection.wrap_database_errors, cursor.cursor.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+        else:
+            placeholders = ', '.join(['%s'] * len(fields))
+            cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', rows)
+
+
+def import_batch(tasks, comments):
+    with transaction.atomic(), counters.batched() as deltas:
+        insert_rows(Task, tasks)
+        insert_rows(Comment, comments)
+        task_ids = [task.id for task in tasks]
+        for task in tasks:
+            deltas.statuses[task.status] += 1
+        changelog.record_ids('task', task_ids, ChangeLogEntry.UPSERT)
+        if comments:
+            # id комментариев назначает БД: читаем их обратно для журнала
+            comment_ids = Comment.objects.filter(task_id__in=task_ids).values_list('pk', flat=True)
+            changelog.record_ids('comment', list(comment_ids), ChangeLogEntry.UPSERT)
+
+
+def import_ndjson(lines, batch_size=None, new_ids=False, progress=None):
+    """
+    Импортирует задачи из строк NDJSON в формате экспорта. Каждая пачка из
+    `batch_size` задач — отдельная транзакция. Возвращает число задач и
+    комментариев. С `new_ids` задачам выдаются новые id (копия данных).
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    now = timezone.now()
+    tasks, comments = [], []
+    imported_tasks = imported_comments = 0
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            task, children = build_objects(loads(line), new_ids, now)
+        except (ValueError, TypeError) as exc:
+            # orjson.JSONDecodeError и json.JSONDecodeError — подклассы ValueError
+            raise InvalidRow(f'строка {number}: {exc}') from exc
+        tasks.append(task)
+        comments.extend(children)
+        if len(tasks) >= batch_size:
+            import_batch(tasks, comments)
+            imported_tasks += len(tasks)
+            imported_comments += len(comments)
+            tasks, comments = [], []
+            if progress is not None:
+                progress(imported_tasks, imported_comments)
+    if tasks:
+        import_batch(tasks, comments)
+        imported_tasks += len(tasks)
+        imported_comments += len(comments)
+    if imported_tasks:
+        # Новые задачи попадают в списки: сбрасываем закэшированные страницы
+        invalidate_tasks([])
+    return imported_tasks, imported_comments
@@ -0,0 +1,91 @@
+"""
+Переходы статуса задачи (POST /api/tasks/{id}/transition/).
+
+Переход — один условный UPDATE ... WHERE status = <прежний> AND version =
+<прежняя> без SELECT FOR UPDATE: если задачу параллельно изменили, UPDATE
+не найдёт строку и ничего не перезапишет, а при успехе новая версия —
+ровно прежняя + 1, перечитывать её не нужно. Клиент может передать
+ожидаемые статус и версию (Task.version) — тогда при несовпадении переход
+отклоняется (409). Чего клиент не передал, читается перед UPDATE, а
+проигравший гонку переход без ожидаемой версии повторяется до
+TASK_TRANSITION_RETRIES раз с заново прочитанным состоянием.
+
+PUT/PATCH задачи сверяют ожидаемую версию (If-Match или поле `version`)
+под блокировкой строки, которую берёт pre_save (tasks/signals.py), и при
+несовпадении бросают VersionConflict.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import changelog, counters
+from .cache import invalidate_tasks
+from .models import ChangeLogEntry, Task
+
+
+class TransitionError(Exception):
+    """
+    Переход отклонён. `status` и `version` — текущее состояние задачи.
+    """
+
+    def __init__(self, message, status, version):
+        super().__init__(message)
+        self.status = status
+        self.version = version
+
+
+class VersionConflict(Exception):
+    """
+    Версия задачи не совпала с ожидаемой. `version` — текущая версия.
+    """
+
+    def __init__(self, version):
+        super().__init__(f'Задача изменена параллельно: текущая версия {version}.')
+        self.version = version
+
+
+MISMATCH = 'Задача изменена параллельно: статус или версия не совпадают с ожидаемыми.'
+
+
+def is_allowed(source, target):
+    return target in Task.TRANSITIONS.get(source, ())
+
+
+def current_state(task_id):
+    state = Task.objects.filter(pk=task_id).values_list('status', 'version').first()
+    if state is None:
+        raise Task.DoesNotExist(f'Задача {task_id} не найдена.')
+    return state
+
+
+def transition(task_id, target, expected_status=None, expected_version=None):
+    """
+    Переводит задачу в статус `target`. Возвращает (прежний статус, новая
+    версия). Бросает Task.DoesNotExist или TransitionError.
+    """
+    attempts = settings.TASK_TRANSITION_RETRIES + 1 if expected_version is None else 1
+    # Статус и версия известны от клиента: переход — только UPDATE
+    known = expected_status is not None and expected_version is not None
+    for _ in range(attempts):
+        if known:
+            source, version = expected_status, expected_version
+        else:
+            source, version = current_state(task_id)
+            if expected_status not in (None, source) or expected_version not in (None, version):
+                raise TransitionError(MISMATCH, source, version)
+        if not is_allowed(source, target):
+            status, version = current_state(task_id) if known else (source, version)
+            raise TransitionError(f'Переход из статуса «{source}» в «{target}» запрещён.', status, version)
+        now = timezone.now()
+        with transaction.atomic():
+            updated = Task.objects.filter(pk=task_id, status=source, version=version).update(
+                status=target, version=F('version') + 1, updated_at=now, last_activity_at=now,
+            )
+            if updated:
+                counters.statuses_changed([source], target)
+                changelog.record([], ChangeLogEntry.UPSERT, task_ids=[task_id])
+        if updated:
+            invalidate_tasks([task_id])
+            return source, version + 1
+    raise TransitionError(MISMATCH, *current_state(task_id))
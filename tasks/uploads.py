@@ -0,0 +1,178 @@
+"""
+Загрузка вложений частями с возможностью продолжить прерванную загрузку.
+
+Клиент создаёт UploadSession, затем отправляет байты запросами PUT с
+заголовком `Content-Range: bytes <start>-<end>/<size>`, где start обязан
+совпадать с уже принятым offset. После последней части POST complete
+сверяет размер и SHA-256 и превращает сессию в обычный File.
+
+Часть пишется под блокировкой временного файла (flock), а не строки
+сессии: транзакция не держится открытой, пока клиент передаёт тело
+запроса. Параллельная часть или complete той же сессии получают 409.
+Сессии без новых частей дольше TASK_UPLOAD_EXPIRE_SECONDS и временные
+файлы без сессий удаляет фоновая задача expire_upload_sessions.
+"""
+import fcntl
+import hashlib
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.utils import timezone
+
+from . import jobs
+from .models import File, UploadSession
+
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+_next_expire = 0.0
+
+
+class PartFile(DjangoFile):
+    """
+    Временный файл сессии. FileSystemStorage переносит такой файл
+    (file_move_safe) вместо копирования содержимого.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(session):
+    return os.path.join(settings.TASK_UPLOAD_TEMP_DIR, f'{session.pk}.part')
+
+
+@contextmanager
+def part_lock(session):
+    """
+    Исключительная блокировка временного файла сессии. Отдаёт False, если
+    файл уже заблокирован другим запросом.
+    """
+    os.makedirs(settings.TASK_UPLOAD_TEMP_DIR, exist_ok=True)
+    with open(part_path(session), 'ab') as part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(part, fcntl.LOCK_UN)
+
+
+def parse_content_range(header):
+    """
+    Возвращает (start, end, total) из `Content-Range: bytes start-end/total`
+    или None, если заголовок некорректен.
+    """
+    match = CONTENT_RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    start, end, total = map(int, match.groups())
+    if start > end or end >= total:
+        return None
+    return start, end, total
+
+
+def write_chunk(session, stream, start, length):
+    """
+    Пишет до `length` байт из потока запроса в позицию `start` временного
+    файла и возвращает, сколько байт реально получено. Хвост после
+    записанного обрезается, чтобы остатки прерванной попытки не попали в файл.
+    """
+    os.makedirs(settings.TASK_UPLOAD_TEMP_DIR, exist_ok=True)
+    path = part_path(session)
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+        part.seek(start)
+        while written < length and stream is not None:
+            chunk = stream.read(min(CHUNK_SIZE, length - written))
+            if not chunk:
+                break
+            part.write(chunk)
+            written += len(chunk)
+        part.truncate(start + written)
+    return written
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for chunk in iter(lambda: part.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def discard(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def finish(session):
+    """
+    Создаёт File из полностью принятой сессии и удаляет сессию.
+    """
+    file_obj = File(task_id=session.task_id, original_name=session.filename)
+    with open(part_path(session), 'rb') as part:
+        file_obj.file.save(session.filename, PartFile(part), save=False)
+    file_obj.save()
+    discard(session)
+    session.delete()
+    return file_obj
+
+
+def schedule_expire():
+    global _next_expire
+    now = time.monotonic()
+    if now >= _next_expire:
+        _next_expire = now + settings.TASK_UPLOAD_EXPIRE_INTERVAL
+        jobs.enqueue('expire_upload_sessions')
+
+
+@jobs.register('expire_upload_sessions')
+def expire_upload_sessions():
+    """
+    Удаляет сессии без новых частей дольше TASK_UPLOAD_EXPIRE_SECONDS и
+    старые временные файлы без сессии (например, задачу удалили вместе с
+    сессиями). Возвращает число удалённых сессий.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.TASK_UPLOAD_EXPIRE_SECONDS)
+    expired = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        with part_lock(session) as locked:
+            # Часть пишется прямо сейчас — сессия жива
+            if not locked:
+                continue
+            expired += UploadSession.objects.filter(pk=session.pk, updated_at__lt=cutoff).delete()[0]
+            discard(session)
+    try:
+        names = os.listdir(settings.TASK_UPLOAD_TEMP_DIR)
+    except FileNotFoundError:
+        return expired
+    pks = set()
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        try:
+            if ext == '.part':
+                pks.add(str(uuid.UUID(stem)))
+        except ValueError:
+            continue
+    alive = {str(pk) for pk in UploadSession.objects.filter(pk__in=pks).values_list('pk', flat=True)}
+    for pk in pks - alive:
+        path = os.path.join(settings.TASK_UPLOAD_TEMP_DIR, f'{pk}.part')
+        try:
+            if os.path.getmtime(path) < cutoff.timestamp():
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+    return expired
@@ -1,12 +1,18 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, CommentViewSet, FileViewSet
+from .views import TaskViewSet, CommentViewSet, FileViewSet, UploadSessionViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet)
 router.register(r'comments', CommentViewSet)
 router.register(r'files', FileViewSet)
+router.register(r'uploads', UploadSessionViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    # Async-версии эндпоинтов чтения для сравнения под ASGI
+    path('async/tasks/', async_views.task_list, name='async-task-list'),
+    path('async/tasks/<uuid:pk>/', async_views.task_detail, name='async-task-detail'),
+    path('async/comments/', async_views.comment_list, name='async-comment-list'),
 ]
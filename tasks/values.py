@@ -0,0 +1,212 @@
+"""
+Сериализация списков только для чтения напрямую из строк .values(), без
+создания экземпляров моделей и полей DRF на каждую строку.
+
+Вывод совпадает с TaskSerializer, CommentSerializer и FileSerializer
+(порядок полей, формат дат, абсолютные ссылки на файлы), поэтому JSON
+ответа побайтно тот же. Вложенные комментарии и файлы выбираются одним
+запросом на связь для всей страницы и группируются по задаче в Python;
+ограничение TASK_NESTED_LIMIT применяется в БД через ROW_NUMBER().
+"""
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .instrumentation import timed
+from .models import Task, Comment, File
+from .querysets import NESTED_ORDERING, get_nested_limit
+
+
+def values_mode_supported():
+    """
+    Формат вывода повторяет DRF только для настроек по умолчанию:
+    даты в ISO 8601 и ссылки на файлы вместо имён.
+    """
+    return (
+        str(api_settings.DATETIME_FORMAT).lower() == 'iso-8601'
+        and api_settings.UPLOADED_FILES_USE_URL
+    )
+
+
+class ValuesSerializer:
+    """
+    Базовый сериализатор строк .values(). `fields` — пары (поле ответа,
+    колонка), порядок совпадает с полями соответствующего ModelSerializer.
+    Преобразование значения задаётся методом `convert_<поле>`.
+    """
+    model = None
+    fields = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        self.converters = [
+            (name, column, getattr(self, 'convert_' + name, None)) for name, column in self.fields
+        ]
+
+    @property
+    def columns(self):
+        return [column for _, column in self.fields]
+
+    def get_queryset(self, queryset):
+        """
+        Превращает отфильтрованный и отсортированный queryset в выборку
+        словарей. Аннотации (например, ранг поиска) сохраняются, чтобы
+        пагинация могла построить курсор по полю сортировки.
+        """
+        columns = [*self.columns, *queryset.query.annotations, self.model._meta.pk.name]
+        columns += [term.lstrip('-') for term in queryset.query.order_by if isinstance(term, str)]
+        return queryset.prefetch_related(None).values(*dict.fromkeys(columns))
+
+    def to_representation(self, rows):
+        return [
+            {name: convert(row[column]) if convert else row[column] for name, column, convert in self.converters}
+            for row in rows
+        ]
+
+    def serialize(self, rows):
+        with timed('serialize'):
+            return self.to_representation(rows)
+
+    def convert_datetime(self, value):
+        if value is None:
+            return None
+        if self.timezone is not None:
+            if timezone.is_aware(value):
+                value = value.astimezone(self.timezone)
+            else:
+                value = timezone.make_aware(value, self.timezone)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, datetime.timezone.utc)
+        text = value.isoformat()
+        return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+    def convert_id(self, value):
+        return value if isinstance(value, int) else str(value)
+
+
+class CommentValuesSerializer(ValuesSerializer):
+    model = Comment
+    fields = (('id', 'id'), ('text', 'text'), ('created_at', 'created_at'), ('task', 'task_id'))
+
+    convert_created_at = ValuesSerializer.convert_datetime
+
+
+class FileValuesSerializer(ValuesSerializer):
+    model = File
+    fields = (
+        ('id', 'id'),
+        ('file', 'file'),
+        ('original_name', 'original_name'),
+        ('uploaded_at', 'uploaded_at'),
+        ('processing_status', 'processing_status'),
+        ('sha256', 'sha256'),
+        ('thumbnail', 'thumbnail'),
+        ('task', 'task_id'),
+    )
+
+    def __init__(self, context=None):
+        super().__init__(context)
+        self.storage = File._meta.get_field('file').storage
+        self.request = self.context.get('request')
+
+    def convert_file(self, name):
+        if not name:
+            return None
+        url = self.storage.url(name)
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    convert_thumbnail = convert_file
+    convert_uploaded_at = ValuesSerializer.convert_datetime
+
+
+class TaskValuesSerializer(ValuesSerializer):
+    model = Task
+    fields = (
+        ('id', 'id'),
+        ('comments', 'id'),
+        ('files', 'id'),
+        ('comments_count', 'comments_count'),
+        ('files_count', 'files_count'),
+        ('title', 'title'),
+        ('description', 'description'),
+        ('status', 'status'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+        ('last_activity_at', 'last_activity_at'),
+        ('version', 'version'),
+    )
+    nested = {'comments': CommentValuesSerializer, 'files': FileValuesSerializer}
+
+    def __init__(self, context=None):
+        selected = (context or {}).get('fields')
+        if selected is not None:
+            # Выборочные поля (?fields=, ?expand=), см. tasks/fieldsets.py
+            self.fields = tuple((name, column) for name, column in self.fields if name in selected)
+        super().__init__(context)
+        self.nested_serializers = {
+            relation: serializer_class(self.context)
+            for relation, serializer_class in self.nested.items()
+            if relation in dict(self.fields)
+        }
+        self.groups = {}
+
+    def to_representation(self, rows):
+        self.load_nested(rows)
+        return self.build(rows)
+
+    def build(self, rows):
+        return super().to_representation(rows)
+
+    def load_nested(self, rows):
+        """
+        Выбирает последние `TASK_NESTED_LIMIT` комментариев и файлов для
+        всех задач страницы (по запросу на связь) и группирует их по задаче.
+        """
+        task_ids = [row['id'] for row in rows]
+        for relation, serializer in self.nested_serializers.items():
+            ordering = NESTED_ORDERING[relation]
+            queryset = serializer.model.objects.filter(task_id__in=task_ids)
+            limit = get_nested_limit()
+            if limit:
+                queryset = queryset.annotate(
+                    row_number=Window(RowNumber(), partition_by=F('task_id'), order_by=list(ordering))
+                ).filter(row_number__lte=limit)
+            grouped = self.groups[relation] = defaultdict(list)
+            for row in queryset.order_by(*ordering).values(*serializer.columns):
+                grouped[row['task_id']].append(row)
+
+    def convert_id(self, value):
+        return str(value)
+
+    def convert_comments(self, task_id):
+        return self.nested_serializers['comments'].to_representation(self.groups['comments'].get(task_id, ()))
+
+    def convert_files(self, task_id):
+        return self.nested_serializers['files'].to_representation(self.groups['files'].get(task_id, ()))
+
+    convert_created_at = convert_updated_at = convert_last_activity_at = ValuesSerializer.convert_datetime
+
+
+class ValuesListMixin:
+    """
+    Отдаёт action list через `values_serializer_class`, минуя экземпляры
+    моделей. Остальные действия работают через обычный serializer_class.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None or not values_mode_supported():
+            return super().list(request, *args, **kwargs)
+        serializer = self.values_serializer_class(self.get_serializer_context())
+        queryset = serializer.get_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(list(queryset)))
@@ -1,31 +1,372 @@
-from rest_framework import viewsets, permissions, filters
-from .models import Task, Comment, File
-from .serializers import TaskSerializer, CommentSerializer, FileSerializer
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import quote_etag
+from rest_framework import viewsets, mixins, permissions, filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from todo_project.routers import ReplicaReadMixin
+from .models import ChangeLogEntry, Task, Comment, File, UploadSession
+from .serializers import (
+    TaskSerializer, CommentSerializer, FileSerializer, BulkStatusSerializer, TransitionSerializer,
+    UploadSessionSerializer,
+)
+from . import changelog, counters, deletion, transfer, transitions, uploads
+from .bulk import BulkModelMixin
+from .cache import TaskCacheMixin, etag_versions, invalidate_tasks, make_etag
+from .fieldsets import FieldSelectionMixin
+from .filters import TaskSearchFilter
+from .pagination import KeysetPagination
+from .querysets import NESTED_ORDERING
+from .streaming import file_download_response
+from .values import ValuesListMixin, CommentValuesSerializer, TaskValuesSerializer
 
-class TaskViewSet(viewsets.ModelViewSet):
+# ?output= -> (генератор строк, Content-Type) для /api/tasks/export/
+EXPORT_FORMATS = {
+    'ndjson': (transfer.ndjson_lines, 'application/x-ndjson'),
+    'csv': (transfer.csv_lines, 'text/csv; charset=utf-8'),
+}
+
+class TaskViewSet(ReplicaReadMixin, TaskCacheMixin, FieldSelectionMixin, ValuesListMixin, BulkModelMixin, viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']  # Явно разрешаем PUT
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
+    # Список строится из .values() без экземпляров моделей (tasks/values.py)
+    values_serializer_class = TaskValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
     # Подключаем фильтры сортировки и поиска
-    filter_backends = [filters.OrderingFilter, filters.SearchFilter]
+    filter_backends = [filters.OrderingFilter, TaskSearchFilter]
     # Разрешаем сортировку по дате создания и статусу
     ordering_fields = ['created_at', 'status']
-    # Реализуем поиск по названию и описанию задачи
+    ordering = ['-created_at']
+    # Keyset-пагинация по (поле сортировки, id)
+    pagination_class = KeysetPagination
+    # Реализуем поиск по названию и описанию задачи (полнотекстовый на PostgreSQL)
     search_fields = ['title', 'description']
 
     def get_queryset(self):
-        status = self.request.query_params.get('status', None)
-        if status:
-            return Task.objects.filter(status=status)
-        return Task.objects.all()
+        queryset = Task.objects.all()
+        task_status = self.request.query_params.get('status', None)
+        if task_status:
+            queryset = queryset.filter(status=task_status)
+        # Эти действия не выводят задачи сериализатором, связи им не нужны
+        if self.action in ('destroy', 'bulk', 'bulk_status', 'transition', 'stats', 'changes', 'export'):
+            return queryset
+        # Читаем только выводимые колонки (?fields=) и предзагружаем только
+        # выводимые связи, чтобы число запросов не зависело от размера страницы.
+        # Колонки сортировки нужны пагинации для курсора, last_activity_at —
+        # заголовку Last-Modified.
+        return queryset.for_serializer(
+            self.get_serializer(), limit=settings.TASK_NESTED_LIMIT,
+            extra_columns=[*self.ordering_fields, 'last_activity_at'],
+        )
+
+    def get_throttle_cost(self, request):
+        # Поиск (ILIKE или полнотекстовый) и выгрузка стоят больше токенов
+        # лимита запросов, чем обычное чтение (todo_project/throttling.py)
+        if self.action == 'export':
+            return settings.THROTTLE_COSTS['export']
+        if request.query_params.get('search'):
+            return settings.THROTTLE_COSTS['search']
+        return 1
+
+    def update(self, request, *args, **kwargs):
+        """
+        PUT/PATCH с необязательной проверкой версии: If-Match с ETag из GET
+        или `"<version>"` (412 при несовпадении) либо поле `version` в теле
+        (409). Без них задача перезаписывается безусловно, как раньше.
+        Ответ несёт ETag новой версии для следующего If-Match.
+        """
+        if_match = request.headers.get('If-Match')
+        if if_match is not None:
+            self.expected_versions = etag_versions(if_match)
+            conflict_status = status.HTTP_412_PRECONDITION_FAILED
+        else:
+            self.expected_versions = self.version_from_body(request)
+            conflict_status = status.HTTP_409_CONFLICT
+        try:
+            response = super().update(request, *args, **kwargs)
+        except transitions.VersionConflict as exc:
+            return Response({'detail': str(exc), 'version': exc.version}, status=conflict_status)
+        response['ETag'] = quote_etag(make_etag(response.data))
+        return response
+
+    def version_from_body(self, request):
+        value = request.data.get('version') if hasattr(request.data, 'get') else None
+        if value is None:
+            return None
+        try:
+            return {int(value)}
+        except (TypeError, ValueError):
+            raise ValidationError({'version': ['Ожидается целое число.']}) from None
+
+    def perform_update(self, serializer):
+        # Сверяется сигналом pre_save под блокировкой строки (tasks/signals.py)
+        serializer.instance._expected_versions = self.expected_versions
+        super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        # Задача помечается удалённой, комментарии и файлы удаляет фоновая задача
+        deletion.delete_tasks([instance.pk])
+
+    def perform_bulk_destroy(self, queryset):
+        return deletion.delete_tasks(queryset.values_list('pk', flat=True))
+
+    def perform_bulk_update(self, objs, fields):
+        # bulk_update не отправляет pre_save: новые версии читаем под блокировкой сами
+        versions = dict(
+            Task.objects.select_for_update().filter(pk__in=[obj.pk for obj in objs]).values_list('pk', 'version')
+        )
+        for obj in objs:
+            obj.version = versions.get(obj.pk, obj.version) + 1
+        super().perform_bulk_update(objs, [*fields, 'version'])
+
+    @action(detail=False, methods=['post'], url_path='bulk-status', serializer_class=BulkStatusSerializer)
+    def bulk_status(self, request):
+        """
+        Переводит все перечисленные задачи в один статус одним UPDATE.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        new_status = serializer.validated_data['status']
+        now = timezone.now()
+        with transaction.atomic():
+            # Прежние статусы нужны сводке по статусам (tasks/counters.py)
+            previous = counters.lock_states(Task, ids)
+            updated = Task.objects.filter(id__in=previous).update(
+                status=new_status, version=F('version') + 1, updated_at=now, last_activity_at=now
+            )
+            counters.statuses_changed(previous.values(), new_status)
+            changelog.record([], ChangeLogEntry.UPSERT, task_ids=previous)
+        invalidate_tasks(ids)
+        return Response({'updated': updated})
+
+    @action(detail=True, methods=['post'], serializer_class=TransitionSerializer)
+    def transition(self, request, pk=None):
+        """
+        Переводит задачу в другой статус по Task.TRANSITIONS одним условным
+        UPDATE (tasks/transitions.py). Если задача изменилась или переход
+        из её текущего статуса запрещён, отвечает 409 с текущим статусом и
+        версией.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            task_id = Task._meta.pk.to_python(pk)
+            previous, version = transitions.transition(
+                task_id, serializer.validated_data['status'],
+                expected_status=serializer.validated_data.get('expected_status'),
+                expected_version=serializer.validated_data.get('expected_version'),
+            )
+        except (DjangoValidationError, Task.DoesNotExist):
+            raise NotFound()
+        except transitions.TransitionError as exc:
+            return Response(
+                {'detail': str(exc), 'status': exc.status, 'version': exc.version},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response({
+            'id': str(task_id),
+            'status': serializer.validated_data['status'],
+            'previous_status': previous,
+            'version': version,
+        })
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Количество задач всего и по статусам из денормализованной сводки.
+        """
+        return Response(counters.status_summary())
 
-class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all()
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Задачи, комментарии и файлы, изменённые после токена `since`, и
+        id удалённых. Без `since` возвращает только текущий токен: его
+        нужно получить до полной загрузки списка.
+        """
+        since = request.query_params.get('since')
+        data = {'tasks': [], 'comments': [], 'files': [], 'deleted': {'tasks': [], 'comments': [], 'files': []}}
+        if since is None:
+            return Response({**data, 'next': changelog.current_token(), 'has_more': False})
+        position = changelog.parse_token(since)
+        if position is None:
+            raise ValidationError({'since': ['Некорректный токен синхронизации.']})
+        try:
+            latest, next_token, has_more = changelog.changes_since(position, settings.TASK_CHANGES_PAGE_SIZE)
+        except changelog.TokenExpired:
+            return Response(
+                {'detail': 'Токен синхронизации устарел, загрузите список заново.'},
+                status=status.HTTP_410_GONE,
+            )
+
+        # Вложенные списки не выводим: их изменения приходят отдельными записями
+        task_serializer = TaskSerializer(context={
+            **self.get_serializer_context(),
+            'fields': [name for name in TaskSerializer().fields if name not in NESTED_ORDERING],
+        })
+        sources = (
+            ('tasks', 'task', Task.objects.for_serializer(task_serializer), task_serializer),
+            ('comments', 'comment', deletion.visible(Comment), CommentSerializer(context=self.get_serializer_context())),
+            ('files', 'file', deletion.visible(File), FileSerializer(context=self.get_serializer_context())),
+        )
+        for key, kind, queryset, serializer in sources:
+            pk = queryset.model._meta.pk
+            actions = {pk.to_python(object_id): action for object_id, action in latest[kind].items()}
+            objects = queryset.in_bulk([object_id for object_id, action in actions.items() if action == ChangeLogEntry.UPSERT])
+            data[key] = [serializer.to_representation(objects[object_id]) for object_id in actions if object_id in objects]
+            data['deleted'][key] = [object_id for object_id, action in actions.items() if action == ChangeLogEntry.DELETE]
+        return Response({**data, 'next': next_token, 'has_more': has_more})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Потоковая выгрузка всех задач (с фильтром ?status=) вместе с
+        комментариями: `?output=ndjson` (по умолчанию) или `?output=csv`.
+        Память не зависит от числа задач, см. tasks/transfer.py.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({'output': [f'Допустимые значения: {", ".join(EXPORT_FORMATS)}.']})
+        lines, content_type = EXPORT_FORMATS[output]
+        # Строки читаются уже после выхода из view, вне replica_reads():
+        # базу (реплику) выбираем сейчас
+        queryset = self.get_queryset()
+        content = lines(queryset.using(queryset.db))
+        if isinstance(request._request, ASGIRequest):
+            content = transfer.aiter_lines(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="tasks.{output}"'
+        return response
+
+class CommentViewSet(ValuesListMixin, BulkModelMixin, viewsets.ModelViewSet):
+    # Без комментариев задач, ждущих фоновой очистки (tasks/deletion.py)
+    queryset = deletion.visible(Comment)
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
+    bulk_task_attr = 'task_id'
+    ordering_fields = ['created_at']
+    ordering = ['-created_at']
+    pagination_class = KeysetPagination
 
 class FileViewSet(viewsets.ModelViewSet):
-    queryset = File.objects.all()
+    queryset = deletion.visible(File)
     serializer_class = FileSerializer
+    # Список файлов отдаётся целиком, как и раньше: keyset-пагинации
+    # по умолчанию нужна колонка created_at, которой у File нет
+    pagination_class = None
     permission_classes = [permissions.IsAuthenticated]
+    # Поиск по тексту, извлечённому фоновой обработкой (tasks/processing.py)
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['extracted_text']
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        Скачивание вложения потоком, с поддержкой заголовка Range.
+        Отдаются только файлы, прошедшие фоновую проверку.
+        """
+        file_obj = self.get_object()
+        if file_obj.processing_status != 'ready':
+            return Response(
+                {'detail': 'Файл ещё не проверен или не прошёл проверку.',
+                 'processing_status': file_obj.processing_status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return file_download_response(file_obj.file, request, file_obj.original_name)
+
+
+class UploadSessionViewSet(mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """
+    Загрузка больших вложений частями (см. tasks/uploads.py).
+    GET сессии возвращает `offset`, с которого нужно продолжить загрузку.
+    """
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        uploads.schedule_expire()
+
+    def perform_destroy(self, instance):
+        uploads.discard(instance)
+        instance.delete()
+
+    @action(detail=True, methods=['put'], parser_classes=[])
+    def chunk(self, request, pk=None):
+        content_range = uploads.parse_content_range(request.headers.get('Content-Range'))
+        if content_range is None:
+            return Response(
+                {'detail': 'Ожидается заголовок Content-Range: bytes <start>-<end>/<size>.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        start, end, total = content_range
+        session = self.get_object()
+        # Тело запроса читается под блокировкой файла, без открытой транзакции
+        with uploads.part_lock(session) as locked:
+            if not locked:
+                return Response(
+                    {'detail': 'Другая часть этой загрузки ещё записывается.', 'offset': session.offset},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            # Смещение могла сдвинуть часть, записанная до получения блокировки
+            session = get_object_or_404(UploadSession, pk=session.pk)
+            if total != session.size or start != session.offset:
+                return Response(
+                    {'detail': 'Часть не совпадает с текущим смещением загрузки.', 'offset': session.offset},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            received = uploads.write_chunk(session, request.stream, start, end - start + 1)
+            session.offset = start + received
+            # Сессию могли удалить, пока принималась часть
+            if not UploadSession.objects.filter(pk=session.pk, offset=start).update(
+                offset=session.offset, updated_at=timezone.now()
+            ):
+                raise NotFound()
+        return Response(self.get_serializer(session).data)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        with uploads.part_lock(session) as locked:
+            if not locked:
+                return Response(
+                    {'detail': 'Часть этой загрузки ещё записывается.', 'offset': session.offset},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            session = get_object_or_404(UploadSession, pk=session.pk)
+            if session.offset != session.size:
+                return Response(
+                    {'detail': 'Загрузка не завершена.', 'offset': session.offset},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            checksum = uploads.file_sha256(uploads.part_path(session))
+            if session.sha256 and checksum != session.sha256:
+                # Данные повреждены: начинаем загрузку заново
+                uploads.discard(session)
+                session.offset = 0
+                session.save(update_fields=['offset', 'updated_at'])
+                return Response(
+                    {'sha256': ['Контрольная сумма не совпадает, загрузите файл заново.']},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            with transaction.atomic():
+                # Параллельный complete мог уже создать файл и удалить сессию
+                session = get_object_or_404(UploadSession.objects.select_for_update(), pk=session.pk)
+                file_obj = uploads.finish(session)
+        data = FileSerializer(file_obj, context=self.get_serializer_context()).data
+        data['sha256'] = checksum
+        return Response(data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,66 @@
+"""
+Настройки подключений к PostgreSQL из переменных окружения: постоянные
+соединения с проверкой перед использованием, необязательный пул внутри
+процесса и реплики для чтения (см. todo_project/routers.py).
+"""
+import django
+
+REPLICA_PREFIX = 'replica_'
+
+
+def env_int(environ, name, default):
+    value = environ.get(name)
+    return default if value in (None, '') else int(value)
+
+
+def env_flag(environ, name, default):
+    value = environ.get(name)
+    return default if value in (None, '') else value.lower() in ('1', 'true', 'yes')
+
+
+def database_settings(environ):
+    """
+    Возвращает (DATABASES, DATABASE_REPLICAS).
+
+    DB_HOST и прочие DB_* задают основную базу; DB_REPLICA_HOSTS — список
+    хостов реплик через запятую (алиасы replica_1, replica_2, ...) с теми же
+    учётными данными. DB_POOL_MAX_SIZE > 0 включает пул соединений psycopg 3
+    (Django 5.1+); с пулом постоянные соединения не используются.
+    """
+    primary = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('DB_NAME', 'todo_db'),
+        'USER': environ.get('DB_USER', 'postgres'),
+        'PASSWORD': environ.get('DB_PASSWORD', 'HvrtibY^8^@&@nyf'),
+        'HOST': environ.get('DB_HOST', 'localhost'),
+        'PORT': environ.get('DB_PORT', '5432'),
+        # Соединение живёт дольше одного запроса; перед повторным
+        # использованием Django проверяет, что оно не разорвано
+        'CONN_MAX_AGE': env_int(environ, 'DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': env_flag(environ, 'DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {},
+    }
+    timeout = env_int(environ, 'DB_CONNECT_TIMEOUT', 5)
+    if timeout:
+        primary['OPTIONS']['connect_timeout'] = timeout
+
+    pool_size = env_int(environ, 'DB_POOL_MAX_SIZE', 0)
+    if pool_size and django.VERSION >= (5, 1):
+        primary['OPTIONS']['pool'] = {
+            'min_size': env_int(environ, 'DB_POOL_MIN_SIZE', 1),
+            'max_size': pool_size,
+            'timeout': env_int(environ, 'DB_POOL_TIMEOUT', 10),
+        }
+        primary['CONN_MAX_AGE'] = 0
+
+    databases = {'default': primary}
+    hosts = [host.strip() for host in environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+    for number, host in enumerate(hosts, start=1):
+        databases[f'{REPLICA_PREFIX}{number}'] = {
+            **primary,
+            'HOST': host,
+            'OPTIONS': dict(primary['OPTIONS']),
+            # В тестах реплика смотрит в тестовую базу основной
+            'TEST': {'MIRROR': 'default'},
+        }
+    return databases, [alias for alias in databases if alias != 'default']
@@ -10,9 +10,14 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import tempfile
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import timedelta
 
+from .db import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,12 +43,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'drf_spectacular',
     'tasks',
+    'account',
 ]
 
 MIDDLEWARE = [
+    "tasks.instrumentation.RequestMetricsMiddleware",
+    "todo_project.throttling.ConcurrencyLimitMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -77,17 +86,37 @@ WSGI_APPLICATION = "todo_project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# Параметры подключения, пул и реплики задаются переменными окружения DB_*
+# (todo_project/db.py). Безопасные запросы к задачам читают из реплик.
+DATABASES, DATABASE_REPLICAS = database_settings(os.environ)
+DATABASE_ROUTERS = ['todo_project.routers.ReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'todo_db',
-        'USER': 'postgres',
-        'PASSWORD': 'HvrtibY^8^@&@nyf',
-        'HOST': 'localhost',
-        'PORT': '5432',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Кэш сериализованных задач (tasks/cache.py). LocMemCache — LRU с TTL
+    # внутри процесса; при заданном REDIS_URL используется общий Redis.
+    'tasks': {
+        'BACKEND': (
+            'django.core.cache.backends.redis.RedisCache' if os.environ.get('REDIS_URL')
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('REDIS_URL', 'tasks'),
+        'TIMEOUT': 300,
+        'OPTIONS': {} if os.environ.get('REDIS_URL') else {'MAX_ENTRIES': 10000},
+    },
 }
 
+# Алиас кэша для ответов TaskViewSet; None отключает кэширование
+TASK_CACHE_ALIAS = 'tasks'
+# Сколько секунд после изменения задачи не заполнять кэш, если чтение идёт
+# с реплик: верхняя оценка их отставания
+TASK_CACHE_REPLICA_LAG = int(os.environ.get('TASK_CACHE_REPLICA_LAG', 5))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -106,6 +135,30 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Хэширование паролей (account/hashing.py). Новые хэши — PASSWORD_HASHER:
+# argon2 (если установлен argon2-cffi) или scrypt. Хэши другим алгоритмом
+# (PBKDF2 со старых версий) или с другими параметрами перехэшируются при
+# следующем успешном входе
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'argon2' if find_spec('argon2') else 'scrypt')
+_PASSWORD_HASHER_CLASSES = {
+    'argon2': 'account.hashing.Argon2PasswordHasher',
+    'scrypt': 'account.hashing.ScryptPasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+# Параметры подобраны под пропускную способность входа: argon2id по
+# рекомендации OWASP (19 МиБ, 2 прохода), scrypt N=2^14 (16 МиБ)
+PASSWORD_ARGON2 = {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1}
+PASSWORD_SCRYPT = {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1, 'maxmem': 0}
+# Потоков хэширования на процесс и вызовов в очереди к ним; сверх очереди
+# вход и регистрация отвечают 503
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+
+AUTHENTICATION_BACKENDS = ['account.backends.PooledModelBackend']
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -124,6 +177,39 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Storages
+# https://docs.djangoproject.com/en/4.2/ref/settings/#storages
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    # Вложения задач: дедупликация по SHA-256 содержимого
+    'attachments': {
+        'BACKEND': 'tasks.storage.ContentAddressedStorage',
+    },
+}
+
+# Блоб вложения без ссылок удаляется не раньше, чем через столько секунд
+ATTACHMENT_GC_GRACE_SECONDS = 300
+
+# Фоновая обработка вложений (tasks/processing.py): антивирус (функция,
+# читающая поток), объём текста для поиска, размер миниатюры
+ATTACHMENT_SCANNER = os.environ.get('ATTACHMENT_SCANNER', 'tasks.processing.scan_test_signature')
+ATTACHMENT_TEXT_MAX_BYTES = 1024 * 1024
+ATTACHMENT_THUMBNAIL_SIZE = (256, 256)
+
+# Фоновая очередь в БД (tasks/jobs.py, команда run_jobs): число попыток,
+# пауза перед повтором (растёт вдвое с каждой попыткой, не больше MAX) и
+# через сколько секунд задача зависшего воркера снова доступна
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 10
+JOB_RETRY_BACKOFF_MAX = 3600
+JOB_LOCK_TIMEOUT = 600
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -138,21 +224,140 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'ALGORITHM': 'HS256',
+    'TOKEN_OBTAIN_SERIALIZER': 'account.serializers.ClaimsTokenObtainPairSerializer',
+    # Ротация и отзыв без token_blacklist (account/blacklist.py)
+    'TOKEN_REFRESH_SERIALIZER': 'account.serializers.BlacklistTokenRefreshSerializer',
+    'TOKEN_USER_CLASS': 'account.authentication.ClaimsUser',
 }
 
+# Кэш состояния пользователей для StatelessJWTAuthentication:
+# деактивация пользователя в другом процессе вступает в силу не позже TTL
+JWT_USER_STATE_CACHE_SIZE = 10000
+JWT_USER_STATE_CACHE_TTL = 30
+
+# Отзыв токенов (account/blacklist.py). Фильтр Блума в памяти процесса на
+# каждый интервал истечения токенов: начальная ёмкость (дальше фильтр растёт
+# сам) и доля ложных срабатываний (ложное срабатывание стоит одного запроса
+# к БД); отзывы других процессов догружаются раз в SYNC_INTERVAL секунд.
+# Истёкшие записи удаляются фоновой задачей не чаще раза в PRUNE_INTERVAL
+# секунд
+TOKEN_BLACKLIST_PARTITION_SECONDS = 86400
+TOKEN_BLACKLIST_BLOOM_CAPACITY = 10000
+TOKEN_BLACKLIST_BLOOM_ERROR_RATE = 0.001
+TOKEN_BLACKLIST_SYNC_INTERVAL = 30
+TOKEN_BLACKLIST_SYNC_OVERLAP = 60
+TOKEN_BLACKLIST_PRUNE_INTERVAL = 3600
+TOKEN_BLACKLIST_PRUNE_CHUNK_SIZE = 5000
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'account.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'rest_framework.filters.OrderingFilter',
         'rest_framework.filters.SearchFilter',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'tasks.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'tasks.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Token bucket по областям и стоимости запроса (todo_project/throttling.py)
+    'DEFAULT_THROTTLE_CLASSES': ['todo_project.throttling.TokenBucketThrottle'],
+    # Сколько прокси перед приложением дописывают X-Forwarded-For. При 0
+    # клиент — REMOTE_ADDR, иначе заголовок подделывался бы клиентом
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
     'EXCEPTION_HANDLER': 'tasks.exceptions.custom_exception_handler',
+    # Keyset-пагинация списков (tasks/pagination.py) и размер страницы по умолчанию
+    'DEFAULT_PAGINATION_CLASS': 'tasks.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
     # Подключаем генератор схемы от drf-spectacular
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Лимиты запросов: область -> (скорость пополнения, ёмкость ведра в токенах).
+# Ведро у каждого пользователя своё, у анонимных клиентов — по IP
+THROTTLE_BUCKETS = {
+    'api': ('1200/min', 300),
+    'auth': ('300/min', 50),
+}
+# Стоимость дорогих запросов в токенах (обычный запрос — 1)
+THROTTLE_COSTS = {
+    'search': 10,
+    'export': 100,
+    'login': 10,
+    'register': 10,
+}
+# Хранилище вёдер: LocalBucketStore (в процессе) или RedisBucketStore (общий
+# Redis из кэша THROTTLE_CACHE_ALIAS, по умолчанию при заданном REDIS_URL)
+THROTTLE_STORE = os.environ.get('THROTTLE_STORE', (
+    'todo_project.throttling.RedisBucketStore' if os.environ.get('REDIS_URL')
+    else 'todo_project.throttling.LocalBucketStore'
+))
+THROTTLE_CACHE_ALIAS = 'tasks'
+THROTTLE_LOCAL_MAXSIZE = 100000
+
+# Одновременные запросы в одном процессе и от одного клиента (0 — без
+# ограничения); сверх лимита — 503 и 429 с Retry-After
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('MAX_CONCURRENT_REQUESTS', 64))
+MAX_CONCURRENT_REQUESTS_PER_CLIENT = int(os.environ.get('MAX_CONCURRENT_REQUESTS_PER_CLIENT', 8))
+CONCURRENCY_RETRY_AFTER = 1
+CONCURRENCY_EXEMPT_PATHS = ['/metrics']
+
+# Сколько последних комментариев и файлов отдавать внутри задачи (None — все)
+TASK_NESTED_LIMIT = 20
+
+# Сколько записей журнала изменений читает один запрос /api/tasks/changes/
+TASK_CHANGES_PAGE_SIZE = 1000
+# Сколько дней хранится журнал изменений; клиент с более старым токеном
+# получает 410 и загружает список заново. Очистку ставит в очередь запись
+# журнала не чаще раза в PRUNE_INTERVAL секунд
+TASK_CHANGES_RETENTION_DAYS = 30
+TASK_CHANGES_PRUNE_INTERVAL = 3600
+TASK_CHANGES_PRUNE_CHUNK_SIZE = 5000
+
+# Повторы перехода статуса без ожидаемого статуса/версии, если задачу
+# параллельно изменили между чтением и условным UPDATE (tasks/transitions.py)
+TASK_TRANSITION_RETRIES = 3
+
+# Массовые операции (/api/tasks/bulk/, /api/comments/bulk/)
+BULK_MAX_ITEMS = 10000
+BULK_BATCH_SIZE = 1000
+
+# Удаление задач (tasks/deletion.py): комментариев/файлов в одном DELETE
+DELETE_CHUNK_SIZE = 5000
+
+# Экспорт и импорт задач (tasks/transfer.py): строк на одну выборку
+# серверного курсора и задач в одной транзакции импорта
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 2000
+
+# Загрузка вложений частями (/api/uploads/)
+TASK_UPLOAD_TEMP_DIR = os.environ.get(
+    'TASK_UPLOAD_TEMP_DIR', os.path.join(tempfile.gettempdir(), 'todo-uploads')
+)
+TASK_UPLOAD_MAX_SIZE = 2 * 1024 ** 3
+# Сессия без новых частей дольше EXPIRE_SECONDS удаляется вместе с
+# временным файлом; проверку ставит в очередь создание сессии не чаще
+# раза в EXPIRE_INTERVAL секунд
+TASK_UPLOAD_EXPIRE_SECONDS = 24 * 3600
+TASK_UPLOAD_EXPIRE_INTERVAL = 3600
+
+# Отдача вложений через nginx (X-Accel-Redirect); None — отдаёт сам Django
+SENDFILE_URL_PREFIX = os.environ.get('SENDFILE_URL_PREFIX')
+
+# Метрики запросов (tasks.instrumentation): доля запросов в выборке,
+# заголовок Server-Timing, порог повторных SQL-запросов для предупреждения
+# в логе и токен для доступа к /metrics (без токена /metrics закрыт)
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', '0.1'))
+REQUEST_METRICS_SERVER_TIMING = os.environ.get('REQUEST_METRICS_SERVER_TIMING', '0') == '1'
+REQUEST_METRICS_DUPLICATE_THRESHOLD = 10
+METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN')
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'ToDo List API',
     'DESCRIPTION': 'API для управления списком задач с возможностью аутентификации, комментариями, прикреплением файлов, сортировкой и поиском.',
@@ -0,0 +1,346 @@
+"""
+Ограничение частоты и одновременности запросов.
+
+TokenBucketThrottle — throttle DRF на token bucket: у каждого клиента
+(пользователь, для анонимных — IP) в каждой области (`throttle_scope` view)
+есть ведро на `burst` токенов, которое пополняется со скоростью `rate`.
+Запрос тратит `cost` токенов: поиск, экспорт и вход дороже обычного
+чтения (settings.THROTTLE_COSTS). Области и лимиты — settings.THROTTLE_BUCKETS.
+
+Состояние вёдер хранится в хранилище settings.THROTTLE_STORE:
+LocalBucketStore — в памяти процесса (каждый воркер считает сам),
+RedisBucketStore — общий Redis, ведро обновляется атомарно Lua-скриптом.
+Любой объект с методами take() и clear() подходит как хранилище.
+
+ConcurrencyLimitMiddleware сбрасывает нагрузку до насыщения воркеров:
+при превышении одновременных запросов одного клиента отвечает 429, при
+исчерпании слотов процесса — 503, в обоих случаях с Retry-After.
+
+IP клиента берётся из X-Forwarded-For только за доверенными прокси
+(NUM_PROXIES в REST_FRAMEWORK), иначе — REMOTE_ADDR.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from tasks.instrumentation import registry
+
+DURATIONS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """
+    '600/min' -> токенов в секунду.
+    """
+    count, _, period = rate.partition('/')
+    return int(count) / DURATIONS[period]
+
+
+def client_ip(request):
+    """
+    IP клиента с учётом NUM_PROXIES, как у throttle DRF.
+    """
+    return BaseThrottle().get_ident(request)
+
+
+def token_user_id(request):
+    """
+    id пользователя из access-токена заголовка Authorization после проверки
+    подписи и срока (без запроса к БД); None без токена или с недействительным.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    try:
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return authentication.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+    except AuthenticationFailed:
+        return None
+
+
+def take_tokens(state, now, rate, capacity, cost):
+    """
+    Пополняет ведро `state` = (токены, время) на момент `now` и пытается
+    списать `cost`. Возвращает новое состояние, признак успеха и сколько
+    секунд ждать до нужного числа токенов.
+    """
+    tokens, updated = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return (tokens - cost, now), True, 0.0
+    return (tokens, now), False, (cost - tokens) / rate
+
+
+class LocalBucketStore:
+    """
+    Вёдра в памяти процесса. Число ключей ограничено: вытесненный клиент
+    начинает с полного ведра.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize or settings.THROTTLE_LOCAL_MAXSIZE
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity, cost):
+        now = time.monotonic()
+        with self._lock:
+            state, allowed, wait = take_tokens(self._buckets.get(key), now, rate, capacity, cost)
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# Та же логика, что take_tokens(), но атомарно в Redis. Время берётся из
+# Redis, чтобы расхождение часов воркеров не влияло на пополнение.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class RedisBucketStore:
+    """
+    Общие для всех воркеров вёдра в Redis. `client` — клиент redis-py (или
+    объект с тем же методом eval); по умолчанию берётся из кэша
+    settings.THROTTLE_CACHE_ALIAS (django.core.cache.backends.redis.RedisCache).
+    """
+    prefix = 'throttle:'
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            cache = caches[settings.THROTTLE_CACHE_ALIAS]
+            if not hasattr(cache, '_cache') or not hasattr(cache._cache, 'get_client'):
+                raise ImproperlyConfigured('RedisBucketStore требует RedisCache в THROTTLE_CACHE_ALIAS.')
+            self._client = cache._cache.get_client(write=True)
+        return self._client
+
+    def take(self, key, rate, capacity, cost):
+        allowed, wait = self.client.eval(TOKEN_BUCKET_SCRIPT, 1, self.prefix + key, rate, capacity, cost)
+        return bool(int(allowed)), float(wait)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.THROTTLE_STORE)()
+    return _store
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    global _store
+    if setting.startswith('THROTTLE_'):
+        _store = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Область берётся из атрибута view `throttle_scope` (по умолчанию 'api'),
+    стоимость — из метода view `get_throttle_cost(request)` или атрибута
+    `throttle_cost`. Области без записи в THROTTLE_BUCKETS не ограничиваются.
+    """
+    default_scope = 'api'
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_cache_key(self, request, view, scope):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = f'user:{user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'{scope}:{ident}'
+
+    def get_cost(self, request, view):
+        if hasattr(view, 'get_throttle_cost'):
+            return view.get_throttle_cost(request)
+        return getattr(view, 'throttle_cost', 1)
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None) or self.default_scope
+        if scope not in settings.THROTTLE_BUCKETS:
+            return True
+        rate, burst = settings.THROTTLE_BUCKETS[scope]
+        rate = parse_rate(rate)
+        # Запрос дороже всего ведра иначе не прошёл бы никогда
+        cost = min(self.get_cost(request, view), burst)
+        allowed, self.retry_after = get_store().take(self.get_cache_key(request, view, scope), rate, burst, cost)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+def release_after(content, release):
+    """
+    Отдаёт потоковый ответ и освобождает слот, когда он отдан или закрыт:
+    Django закрывает итератор ответа в response.close().
+    """
+    try:
+        yield from content
+    finally:
+        release()
+
+
+async def arelease_after(content, release):
+    """
+    То же для асинхронного потокового ответа; при обрыве соединения слот
+    освобождается, когда итератор закрывается сборщиком мусора.
+    """
+    try:
+        async for part in content:
+            yield part
+    finally:
+        release()
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Ограничивает число одновременно обрабатываемых запросов в процессе
+    (MAX_CONCURRENT_REQUESTS, 503) и одного клиента
+    (MAX_CONCURRENT_REQUESTS_PER_CLIENT, 429). Лишние запросы отклоняются
+    сразу, без ожидания в очереди. Слот потокового ответа освобождается,
+    когда ответ отдан целиком.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.limit = settings.MAX_CONCURRENT_REQUESTS
+        self.client_limit = settings.MAX_CONCURRENT_REQUESTS_PER_CLIENT
+        self.active = 0
+        self.clients = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        release, rejected = self.admit(request)
+        if rejected is not None:
+            return rejected
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            release()
+            raise
+        return self.finish(response, release)
+
+    async def __acall__(self, request):
+        release, rejected = self.admit(request)
+        if rejected is not None:
+            return rejected
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            release()
+            raise
+        return self.finish(response, release)
+
+    def client_key(self, request):
+        # Аутентификация DRF ещё не прошла: пользователя берём из проверенного
+        # access-токена, иначе клиент — IP. Случайный заголовок Authorization
+        # не даёт нового ключа
+        user_id = token_user_id(request)
+        if user_id is not None:
+            return f'user:{user_id}'
+        return f'ip:{client_ip(request)}'
+
+    def admit(self, request):
+        if request.path in settings.CONCURRENCY_EXEMPT_PATHS:
+            return (lambda: None), None
+        client = self.client_key(request)
+        with self.lock:
+            if self.client_limit and self.clients[client] >= self.client_limit:
+                return None, self.reject(429, 'Слишком много одновременных запросов от клиента.')
+            if self.limit and self.active >= self.limit:
+                return None, self.reject(503, 'Сервер перегружен, повторите запрос позже.')
+            self.active += 1
+            self.clients[client] += 1
+
+        released = False
+
+        def release():
+            nonlocal released
+            with self.lock:
+                if released:
+                    return
+                released = True
+                self.active -= 1
+                self.clients[client] -= 1
+                if not self.clients[client]:
+                    del self.clients[client]
+        return release, None
+
+    def finish(self, response, release):
+        if not response.streaming:
+            release()
+        elif response.is_async:
+            response.streaming_content = arelease_after(response.streaming_content, release)
+        else:
+            response.streaming_content = release_after(response.streaming_content, release)
+        return response
+
+    def reject(self, status_code, detail):
+        registry.inc(
+            'http_requests_shed_total', {'status': str(status_code)},
+            'Запросы, отклонённые ограничением одновременности.',
+        )
+        response = JsonResponse({'detail': detail}, status=status_code)
+        response['Retry-After'] = str(settings.CONCURRENCY_RETRY_AFTER)
+        return response
@@ -16,10 +16,9 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView
+from account.views import LoginView, LogoutView
+from tasks.instrumentation import metrics_view
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
@@ -29,12 +28,16 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path('api/', include('tasks.urls')),
     # Эндпоинты для получения и обновления JWT токенов:
-    path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('auth/login/', LoginView.as_view(), name='token_obtain_pair'),
     path('auth/login/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/logout/', LogoutView.as_view(), name='token_revoke'),
     path('auth/', include('account.urls')),
 
     # Эндпоинт для получения схемы OpenAPI (в формате JSON)
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
     # Эндпоинт для Swagger UI
     path('swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+
+    # Метрики запросов в формате Prometheus
+    path('metrics', metrics_view, name='metrics'),
 ]